@@ -0,0 +1,199 @@
+# account_cache.py
+# Account summaries served from memory and invalidated by writes, never by
+# a timer:
+#
+#   AccountCache      bank_chatbot.db, per user: balance and loan status
+#   CoreAccountCache  bank_professional.db, per account: balance, status,
+#                     loans and the last RECENT_TRANSACTIONS transactions;
+#                     per customer: repository.customer_summary
+#
+# Every write to a table a summary reads bumps a row in account_versions
+# through a trigger, whichever process or connection made it:
+#   bank_chatbot.db       accounts                         (db_setup.create_account_versions)
+#   bank_professional.db  accounts, transactions, loans,
+#                         fund_transfers (both accounts)   (create_professional_db.create_account_versions)
+# A bank_professional.db version row names the account and its customer,
+# so entries kept per account and per customer can both be dropped. Bulk
+# loads that switch the triggers off must bump the versions of the accounts
+# they touched when they finish (create_professional_db.bump_account_versions).
+#
+# Before each read the cache asks SQLite for PRAGMA data_version on its own
+# connection - an in-memory check that only changes when some other
+# connection has committed. Only then does it fetch the rows whose version
+# moved and drop exactly those entries. A read right after a transfer
+# therefore always reloads that account, and every other read is a
+# dictionary lookup.
+
+import os
+import sqlite3
+import threading
+
+from account_queries import RECENT_TRANSACTIONS, fetch_account_summary, fetch_balance, fetch_loan_status
+from connections import get_connection
+from create_professional_db import create_account_versions as create_core_account_versions
+from db_setup import create_account_versions
+
+# --- Configuration ---
+MAX_ENTRIES = 10000   # entries kept; the cache is cleared when it grows past this
+
+
+class AccountCache:
+    # Keyed by user_id
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._entries = {}       # key -> summary dict
+        self._generation = {}    # key -> bumped on invalidate (guards racing loads)
+        self._last_seq = 0
+        self._data_version = None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+        conn = get_connection(db_path)
+        self._create_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+        # Dedicated connection: data_version is tracked per connection
+        self._watch = sqlite3.connect(db_path, check_same_thread=False)
+        self._last_seq = self._watch.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM account_versions"
+        ).fetchone()[0]
+        self._data_version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def _create_schema(self, cursor):
+        create_account_versions(cursor)
+
+    def _changed(self):
+        # [(keys to drop, seq)] for the version rows written since _last_seq
+        rows = self._watch.execute(
+            "SELECT user_id, seq FROM account_versions WHERE seq > ?", (self._last_seq,)
+        ).fetchall()
+        return [((user_id,), seq) for user_id, seq in rows]
+
+    def _sync(self):
+        # Caller holds self._lock
+        version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        for keys, seq in self._changed():
+            for key in keys:
+                self._drop(key)
+            self._last_seq = max(self._last_seq, seq)
+
+    def _drop(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.stats["invalidations"] += 1
+        self._generation[key] = self._generation.get(key, 0) + 1
+
+    def invalidate(self, key):
+        # For writers that want the change visible before their next read
+        with self._lock:
+            self._drop(key)
+
+    def _load(self, user_id):
+        conn = get_connection(self.db_path, readonly=True)
+        try:
+            return {
+                "balance": fetch_balance(conn, user_id),
+                "loan_status": fetch_loan_status(conn, user_id),
+            }
+        finally:
+            conn.close()
+
+    def get(self, key):
+        # The summary for key (AccountCache: {"balance", "loan_status"} for a user_id)
+        with self._lock:
+            self._sync()
+            summary = self._entries.get(key)
+            if summary is not None:
+                self.stats["hits"] += 1
+                return summary
+            self.stats["misses"] += 1
+            generation = self._generation.get(key, 0)
+
+        summary = self._load(key)
+
+        with self._lock:
+            self._sync()
+            # Only keep it if no write to this key landed while loading
+            if summary is not None and self._generation.get(key, 0) == generation:
+                if len(self._entries) >= MAX_ENTRIES:
+                    self._entries.clear()
+                self._entries[key] = summary
+        return summary
+
+
+class CoreAccountCache(AccountCache):
+    # Keyed by ("account", account_id) and ("customer", customer_id); a write
+    # to an account drops both
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self._sessions = None
+
+    def _create_schema(self, cursor):
+        create_core_account_versions(cursor)
+
+    def _changed(self):
+        rows = self._watch.execute(
+            "SELECT account_id, customer_id, seq FROM account_versions WHERE seq > ?", (self._last_seq,)
+        ).fetchall()
+        return [((("account", account_id), ("customer", customer_id)), seq)
+                for account_id, customer_id, seq in rows]
+
+    def _load(self, key):
+        kind, key_id = key
+        if kind == "customer":
+            # SQLAlchemy is only loaded once a customer overview is asked for
+            from repository import customer_summary
+            with self._session() as session:
+                return customer_summary(session, key_id, RECENT_TRANSACTIONS)
+        if kind != "account":
+            raise KeyError(key)
+        conn = get_connection(self.db_path, readonly=True)
+        try:
+            return fetch_account_summary(conn, key_id, RECENT_TRANSACTIONS)
+        finally:
+            conn.close()
+
+    def _session(self):
+        with self._lock:
+            if self._sessions is None:
+                from database import create_session_factory
+                self._sessions = create_session_factory(self.db_path)
+        return self._sessions()
+
+    def account(self, account_id):
+        # {"account_no", "customer_id", "balance", "status", "loans", "recent"}, or None for an unknown account
+        return self.get(("account", account_id))
+
+    def customer(self, customer_id):
+        # repository.customer_summary: every account of the customer with its
+        # type, branch, loans and recent transactions; None for an unknown customer
+        return self.get(("customer", customer_id))
+
+
+def database_path(conn):
+    # File behind a connection, for code that is handed a connection but caches per database
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(cls, db_path):
+    # One cache per database per process (Streamlit keeps imported modules across reruns)
+    key = (cls, os.path.abspath(db_path))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = cls(db_path)
+        return _caches[key]
+
+
+def get_account_cache(db_path):
+    return _get_cache(AccountCache, db_path)
+
+
+def get_core_account_cache(db_path):
+    return _get_cache(CoreAccountCache, db_path)
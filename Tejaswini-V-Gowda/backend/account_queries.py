@@ -0,0 +1,48 @@
+# account_queries.py
+# Account lookups shared by the Banking Activities views and the chat router,
+# so the chatbot answers from exactly the data the dashboard shows.
+
+from transaction_history import fetch_history, format_history
+
+RECENT_TRANSACTIONS = 5
+
+def fetch_balance(conn, user_id):
+    row = conn.execute("SELECT balance FROM accounts WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else None
+
+def fetch_loan_status(conn, user_id):
+    row = conn.execute("SELECT loan_status FROM accounts WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else None
+
+def has_table(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+def fetch_recent_transactions(conn, account_id, limit=RECENT_TRANSACTIONS):
+    # Latest transactions of a core-banking account (bank_professional.db),
+    # as {"Date", "Description", "Amount", "Balance"} rows
+    page, _ = fetch_history(conn, account_id, limit=limit)
+    return format_history(page)
+
+def fetch_account_summary(conn, account_id, limit=RECENT_TRANSACTIONS):
+    # One core-banking account: balance (paise), status, loans and the last
+    # `limit` transactions; None if the account does not exist
+    row = conn.execute(
+        "SELECT account_no, customer_id, balance, status FROM accounts WHERE account_id = ?", (account_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    loans = conn.execute(
+        "SELECT status, remaining_amount FROM loans WHERE account_id = ? ORDER BY issued_on DESC",
+        (account_id,)
+    ).fetchall()
+    return {
+        "account_no": row[0],
+        "customer_id": row[1],
+        "balance": row[2],
+        "status": row[3],
+        "loans": [{"status": status, "remaining": remaining} for status, remaining in loans],
+        "recent": fetch_recent_transactions(conn, account_id, limit),
+    }
@@ -0,0 +1,426 @@
+# aggregates.py
+# Per-account daily and monthly totals for bank_professional.db, kept up to
+# date as transactions are posted, so "how much did I spend on groceries
+# last month?" is a few primary-key lookups instead of a scan of the
+# account's transactions.
+#
+#   daily_totals      (account_id, day)    credits, debits, counts, end-of-day balance
+#   monthly_totals    (account_id, month)  the same per calendar month
+#   category_totals   (account_id, month, category)  debits per spending category
+#
+# One AFTER INSERT trigger on transactions maintains all three, whichever
+# code path inserted the row (ledger.py, plain SQL). bulk_import.py switches
+# it off while loading and then rebuilds just the accounts it touched.
+# Narrations are mapped to categories by the LIKE patterns in
+# spending_categories (seeded from CATEGORIES). Transactions are append-only
+# here; after editing or deleting rows by hand, or changing the category
+# patterns, rebuild from scratch:
+#
+#   python aggregates.py rebuild [--db bank_professional.db]
+
+import argparse
+import calendar
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from ledger import format_minor
+
+# --- Configuration ---
+# (category, narration LIKE patterns, words customers use for it); the first
+# matching category wins, anything unmatched is "Other"
+CATEGORIES = [
+    ("Groceries", ["grocer%", "%grocery%", "%bigbasket%", "%supermarket%"], ["grocery", "groceries", "supermarket"]),
+    ("Food & Dining", ["%swiggy%", "%zomato%", "%restaurant%", "%cafe%"], ["food", "dining", "restaurant", "restaurants", "swiggy", "zomato", "eating out"]),
+    ("Shopping", ["shopping%", "%amazon%", "%flipkart%", "%mall%"], ["shopping", "amazon", "flipkart"]),
+    ("Fuel", ["fuel%", "%petrol%", "%hpcl%", "%bpcl%"], ["fuel", "petrol", "diesel"]),
+    ("Bills & Utilities", ["%electricity%", "%bill%", "%recharge%", "%broadband%"], ["bill", "bills", "utilities", "electricity", "recharge"]),
+    ("Rent", ["rent%", "% rent%"], ["rent"]),
+    ("Cash", ["atm%", "%cash withdrawal%"], ["cash", "atm"]),
+    ("Health", ["medical%", "%pharmacy%", "%hospital%"], ["medical", "health", "pharmacy", "medicine", "medicines"]),
+    ("Travel", ["travel%", "%irctc%", "%uber%", "%ola %"], ["travel", "trains", "uber", "cab", "cabs"]),
+    ("Transfers", ["transfer to%"], ["transfer", "transfers"]),
+    ("Loan EMI", ["emi%", "% emi%", "loan%"], ["emi", "emis"]),
+]
+OTHER_CATEGORY = "Other"
+
+# Category of one narration, as SQL (used by the trigger, the rebuild and the fallback query)
+_CATEGORY_SQL = (
+    "COALESCE((SELECT category FROM spending_categories "
+    "WHERE lower({narration}) LIKE pattern ORDER BY priority LIMIT 1), '" + OTHER_CATEGORY + "')"
+)
+
+
+# --- Schema ---
+
+def create_aggregate_tables(cursor):
+    for table, period in (("daily_totals", "day"), ("monthly_totals", "month")):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                account_id INTEGER NOT NULL,
+                {period} TEXT NOT NULL,
+                credits INTEGER NOT NULL DEFAULT 0, -- paise
+                debits INTEGER NOT NULL DEFAULT 0, -- paise
+                credit_count INTEGER NOT NULL DEFAULT 0,
+                debit_count INTEGER NOT NULL DEFAULT 0,
+                end_balance INTEGER, -- balance_after of the period's last transaction
+                last_at TEXT, -- created_at / txn_id of that transaction
+                last_txn_id INTEGER,
+                PRIMARY KEY (account_id, {period})
+            ) WITHOUT ROWID
+        ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_totals (
+            account_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            spent INTEGER NOT NULL DEFAULT 0, -- paise
+            txn_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, month, category)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS spending_categories (
+            pattern TEXT PRIMARY KEY, -- LIKE pattern on lower(narration)
+            category TEXT NOT NULL,
+            priority INTEGER NOT NULL
+        )
+    ''')
+    cursor.executemany(
+        "INSERT OR IGNORE INTO spending_categories (pattern, category, priority) VALUES (?, ?, ?)",
+        [(pattern, category, priority)
+         for priority, (category, patterns, _) in enumerate(CATEGORIES) for pattern in patterns]
+    )
+    create_aggregate_trigger(cursor)
+
+
+def _upsert_period(table, period, length):
+    # The latest transaction (by created_at, txn_id) carrying a balance_after sets end_balance
+    later = "excluded.last_at IS NOT NULL AND (last_at IS NULL OR (excluded.last_at, excluded.last_txn_id) > (last_at, last_txn_id))"
+    return f'''
+        INSERT INTO {table} (account_id, {period}, credits, debits, credit_count, debit_count, end_balance, last_at, last_txn_id)
+        VALUES (
+            NEW.account_id, substr(NEW.created_at, 1, {length}),
+            CASE WHEN NEW.txn_type = 'credit' THEN NEW.amount ELSE 0 END,
+            CASE WHEN NEW.txn_type = 'debit' THEN NEW.amount ELSE 0 END,
+            NEW.txn_type = 'credit', NEW.txn_type = 'debit',
+            NEW.balance_after,
+            CASE WHEN NEW.balance_after IS NOT NULL THEN NEW.created_at END,
+            CASE WHEN NEW.balance_after IS NOT NULL THEN NEW.txn_id END
+        )
+        ON CONFLICT (account_id, {period}) DO UPDATE SET
+            credits = credits + excluded.credits,
+            debits = debits + excluded.debits,
+            credit_count = credit_count + excluded.credit_count,
+            debit_count = debit_count + excluded.debit_count,
+            end_balance = CASE WHEN {later} THEN excluded.end_balance ELSE end_balance END,
+            last_at = CASE WHEN {later} THEN excluded.last_at ELSE last_at END,
+            last_txn_id = CASE WHEN {later} THEN excluded.last_txn_id ELSE last_txn_id END;
+    '''
+
+
+def create_aggregate_trigger(cursor):
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_aggregate AFTER INSERT ON transactions
+        BEGIN
+            {_upsert_period("daily_totals", "day", 10)}
+            {_upsert_period("monthly_totals", "month", 7)}
+            INSERT INTO category_totals (account_id, month, category, spent, txn_count)
+            SELECT NEW.account_id, substr(NEW.created_at, 1, 7), {_CATEGORY_SQL.format(narration="NEW.narration")}, NEW.amount, 1
+            WHERE NEW.txn_type = 'debit'
+            ON CONFLICT (account_id, month, category) DO UPDATE SET
+                spent = spent + excluded.spent,
+                txn_count = txn_count + 1;
+        END
+    ''')
+
+
+def drop_aggregate_trigger(cursor):
+    # For bulk loads that rebuild() afterwards (generate_data.py; bulk_import.py
+    # drops it by name and calls rebuild_accounts)
+    cursor.execute("DROP TRIGGER IF EXISTS transactions_aggregate")
+
+
+# --- Rebuild ---
+# One sequential pass over transactions (NOT INDEXED: reading the table in
+# rowid order beats walking an index and looking every row up). In each
+# GROUP BY the single MAX() makes SQLite take the bare columns
+# (balance_after, created_at, txn_id) from the period's latest row that has
+# a balance_after - the same row the trigger keeps.
+
+_REBUILD_DAILY = """
+    INSERT INTO daily_totals (account_id, day, credits, debits, credit_count, debit_count, end_balance, last_at, last_txn_id)
+    SELECT account_id, day, credits, debits, credit_count, debit_count,
+           CASE WHEN latest IS NOT NULL THEN balance_after END,
+           CASE WHEN latest IS NOT NULL THEN created_at END,
+           CASE WHEN latest IS NOT NULL THEN txn_id END
+    FROM (
+        SELECT account_id, substr(created_at, 1, 10) AS day,
+               SUM(CASE WHEN txn_type = 'credit' THEN amount ELSE 0 END) AS credits,
+               SUM(CASE WHEN txn_type = 'debit' THEN amount ELSE 0 END) AS debits,
+               SUM(txn_type = 'credit') AS credit_count, SUM(txn_type = 'debit') AS debit_count,
+               balance_after, created_at, txn_id,
+               MAX(CASE WHEN balance_after IS NOT NULL THEN printf('%s#%020d', created_at, txn_id) END) AS latest
+        FROM {transactions}
+        GROUP BY account_id, day
+    )
+"""
+
+# Months are summed from the (far fewer) daily rows
+_REBUILD_MONTHLY = """
+    INSERT INTO monthly_totals (account_id, month, credits, debits, credit_count, debit_count, end_balance, last_at, last_txn_id)
+    SELECT account_id, month, credits, debits, credit_count, debit_count,
+           CASE WHEN latest IS NOT NULL THEN end_balance END,
+           CASE WHEN latest IS NOT NULL THEN last_at END,
+           CASE WHEN latest IS NOT NULL THEN last_txn_id END
+    FROM (
+        SELECT account_id, substr(day, 1, 7) AS month,
+               SUM(credits) AS credits, SUM(debits) AS debits,
+               SUM(credit_count) AS credit_count, SUM(debit_count) AS debit_count,
+               end_balance, last_at, last_txn_id,
+               MAX(CASE WHEN end_balance IS NOT NULL THEN day END) AS latest
+        FROM daily_totals {where}
+        GROUP BY account_id, month
+    )
+"""
+
+_REBUILD_CATEGORIES = """
+    INSERT INTO category_totals (account_id, month, category, spent, txn_count)
+    SELECT t.account_id, substr(t.created_at, 1, 7) AS month, COALESCE(n.category, '""" + OTHER_CATEGORY + """'),
+           SUM(t.amount), COUNT(*)
+    FROM transactions AS t {index}
+    LEFT JOIN temp.narration_categories AS n ON n.narration = t.narration
+    WHERE t.txn_type = 'debit' {and_t}
+    GROUP BY t.account_id, month, 3
+"""
+
+
+# Restricts a rebuild to the accounts in temp.rebuild_accounts
+_ONLY_ACCOUNTS = "account_id IN (SELECT account_id FROM temp.rebuild_accounts)"
+
+
+def _fill(cursor, only_accounts):
+    # Inserts the aggregates of every account, or only of those in
+    # temp.rebuild_accounts (read through idx_txn_account_time)
+    if only_accounts:
+        source, index = f"transactions WHERE {_ONLY_ACCOUNTS}", ""
+        where, and_, and_t = f"WHERE {_ONLY_ACCOUNTS}", f"AND {_ONLY_ACCOUNTS}", f"AND t.{_ONLY_ACCOUNTS}"
+    else:
+        source, index = "transactions NOT INDEXED", "NOT INDEXED"
+        where = and_ = and_t = ""
+    cursor.execute(_REBUILD_DAILY.format(transactions=source))
+    cursor.execute(_REBUILD_MONTHLY.format(where=where))
+    # Each distinct narration is matched against the patterns once, not once per row
+    cursor.execute("DROP TABLE IF EXISTS temp.narration_categories")
+    cursor.execute(
+        "CREATE TEMP TABLE narration_categories (narration TEXT PRIMARY KEY, category TEXT NOT NULL)"
+    )
+    cursor.execute(
+        "INSERT INTO temp.narration_categories (narration, category) "
+        f"SELECT narration, {_CATEGORY_SQL.format(narration='narration')} "
+        "FROM (SELECT DISTINCT narration FROM transactions "
+        f"WHERE txn_type = 'debit' AND narration IS NOT NULL {and_})"
+    )
+    cursor.execute(_REBUILD_CATEGORIES.format(index=index, and_t=and_t))
+    cursor.execute("DROP TABLE temp.narration_categories")
+
+
+def rebuild(conn):
+    # Recompute every aggregate from transactions in one transaction
+    if conn.in_transaction:
+        raise sqlite3.OperationalError("rebuild needs a connection with no open transaction.")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        create_aggregate_tables(cursor)
+        for table in ("daily_totals", "monthly_totals", "category_totals"):
+            cursor.execute(f"DELETE FROM {table}")
+        _fill(cursor, only_accounts=False)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def rebuild_accounts(conn, account_ids):
+    # Recompute the aggregates of account_ids only, inside the caller's
+    # transaction (bulk_import.py, after loading rows with the trigger off)
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS temp.rebuild_accounts")
+    cursor.execute("CREATE TEMP TABLE rebuild_accounts (account_id INTEGER PRIMARY KEY)")
+    cursor.executemany("INSERT INTO temp.rebuild_accounts (account_id) VALUES (?)",
+                       [(account_id,) for account_id in account_ids])
+    for table in ("daily_totals", "monthly_totals", "category_totals"):
+        cursor.execute(f"DELETE FROM {table} WHERE {_ONLY_ACCOUNTS}")
+    _fill(cursor, only_accounts=True)
+    cursor.execute("DROP TABLE temp.rebuild_accounts")
+
+
+# --- Periods ---
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+
+_LAST_DAYS_RE = re.compile(r"\b(?:last|past)\s+(\d{1,3})\s+days?\b")
+_MONTH_RE = re.compile(r"\b(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\b(?:\s+(\d{4}))?")
+_YEAR_RE = re.compile(r"\b(?:in\s+)?(20\d{2})\b")
+
+
+def _month_start(day, months_back=0):
+    month = day.month - months_back
+    year = day.year + (month - 1) // 12
+    return date(year, (month - 1) % 12 + 1, 1)
+
+
+def parse_period(text, today=None):
+    # (start, end, phrase) with end exclusive, or None when no period is named;
+    # the phrase reads as "... you spent" / "you spent ... <phrase>"
+    today = today or date.today()
+    text = text.lower()
+    if "today" in text:
+        return today, today + timedelta(days=1), "today"
+    if "yesterday" in text:
+        return today - timedelta(days=1), today, "yesterday"
+    match = _LAST_DAYS_RE.search(text)
+    if match:
+        days = int(match.group(1))
+        return today - timedelta(days=days - 1), today + timedelta(days=1), f"in the last {days} days"
+    if "this week" in text:
+        start = today - timedelta(days=today.weekday())
+        return start, today + timedelta(days=1), "this week"
+    if "last week" in text or "previous week" in text:
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=7), "last week"
+    if "this month" in text:
+        return _month_start(today), _month_start(today, -1), "this month"
+    if "last month" in text or "previous month" in text:
+        return _month_start(today, 1), _month_start(today), "last month"
+    if "this year" in text:
+        return date(today.year, 1, 1), date(today.year + 1, 1, 1), "this year"
+    if "last year" in text or "previous year" in text:
+        return date(today.year - 1, 1, 1), date(today.year, 1, 1), "last year"
+    match = _MONTH_RE.search(text)
+    if match and not (match.group(1) == "may" and not match.group(2)):
+        month = MONTHS[match.group(1)]
+        year = int(match.group(2)) if match.group(2) else (today.year if month <= today.month else today.year - 1)
+        start = date(year, month, 1)
+        return start, _month_start(start, -1), f"in {calendar.month_name[month]} {year}"
+    match = _YEAR_RE.search(text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year + 1, 1, 1), f"in {year}"
+    return None
+
+
+def parse_category(text):
+    text = text.lower()
+    for category, _, words in CATEGORIES:
+        if any(re.search(r"\b" + re.escape(word) + r"\b", text) for word in words):
+            return category
+    return None
+
+
+# --- Queries ---
+
+def _whole_months(start, end):
+    return start.day == 1 and end.day == 1
+
+
+def period_totals(conn, account_id, start, end):
+    # {"credits", "debits", "debit_count"} in paise; whole months read monthly rows, else daily rows
+    if _whole_months(start, end):
+        row = conn.execute(
+            "SELECT COALESCE(SUM(credits), 0), COALESCE(SUM(debits), 0), COALESCE(SUM(debit_count), 0) "
+            "FROM monthly_totals WHERE account_id = ? AND month >= ? AND month < ?",
+            (account_id, start.isoformat()[:7], end.isoformat()[:7])
+        ).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT COALESCE(SUM(credits), 0), COALESCE(SUM(debits), 0), COALESCE(SUM(debit_count), 0) "
+            "FROM daily_totals WHERE account_id = ? AND day >= ? AND day < ?",
+            (account_id, start.isoformat(), end.isoformat())
+        ).fetchone()
+    return {"credits": row[0], "debits": row[1], "debit_count": row[2]}
+
+
+def category_spending(conn, account_id, start, end):
+    # [(category, spent, txn_count)] biggest first
+    if _whole_months(start, end):
+        return conn.execute(
+            "SELECT category, SUM(spent), SUM(txn_count) FROM category_totals "
+            "WHERE account_id = ? AND month >= ? AND month < ? GROUP BY category ORDER BY 2 DESC",
+            (account_id, start.isoformat()[:7], end.isoformat()[:7])
+        ).fetchall()
+    # Part-month periods: a range scan of the account's transactions for those days only
+    return conn.execute(
+        f"SELECT {_CATEGORY_SQL.format(narration='narration')} AS category, SUM(amount), COUNT(*) "
+        "FROM transactions WHERE account_id = ? AND created_at >= ? AND created_at < ? AND txn_type = 'debit' "
+        "GROUP BY category ORDER BY 2 DESC",
+        (account_id, start.isoformat(), end.isoformat())
+    ).fetchall()
+
+
+def end_balance(conn, account_id, before):
+    # Balance at the end of the last day with activity before `before`
+    row = conn.execute(
+        "SELECT end_balance FROM daily_totals WHERE account_id = ? AND day < ? AND end_balance IS NOT NULL "
+        "ORDER BY day DESC LIMIT 1",
+        (account_id, before.isoformat())
+    ).fetchone()
+    return row[0] if row else None
+
+
+def latest_months(conn, account_id, count=2):
+    # [{"month", "credits", "debits", "end_balance"}] newest first
+    rows = conn.execute(
+        "SELECT month, credits, debits, end_balance FROM monthly_totals WHERE account_id = ? "
+        "ORDER BY month DESC LIMIT ?",
+        (account_id, count)
+    ).fetchall()
+    return [{"month": r[0], "credits": r[1], "debits": r[2], "end_balance": r[3]} for r in rows]
+
+
+def answer_spending(conn, account_id, text, today=None):
+    # Chat answer for a spending question about one account
+    start, end, phrase = parse_period(text, today) or parse_period("this month", today)
+    category = parse_category(text)
+    if category is not None:
+        spent = {c: (amount, count) for c, amount, count in category_spending(conn, account_id, start, end)}
+        amount, count = spent.get(category, (0, 0))
+        if not count:
+            return f"You had no {category} spending {phrase}."
+        return (f"You spent **₹{format_minor(amount)}** on {category} {phrase} "
+                f"across {count} transaction{'s' if count != 1 else ''}.")
+
+    totals = period_totals(conn, account_id, start, end)
+    if not totals["debit_count"] and not totals["credits"]:
+        return f"There was no activity on your account {phrase}."
+    lines = [f"{phrase[0].upper() + phrase[1:]} you spent **₹{format_minor(totals['debits'])}** "
+             f"and received **₹{format_minor(totals['credits'])}**."]
+    top = [c for c in category_spending(conn, account_id, start, end) if c[1]][:3]
+    if top:
+        lines.append("Top spending: " + ", ".join(f"{c} ₹{format_minor(amount)}" for c, amount, _ in top) + ".")
+    balance = end_balance(conn, account_id, min(end, (today or date.today()) + timedelta(days=1)))
+    if balance is not None:
+        lines.append(f"Balance at the end of the period: ₹{format_minor(balance)}.")
+    return "\n\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the spending aggregates of bank_professional.db")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--db", default="bank_professional.db") # create_professional_db.DB
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    rebuild(conn)
+    days, months = (conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("daily_totals", "monthly_totals"))
+    conn.close()
+    print(f"Rebuilt {days:,} daily and {months:,} monthly rows in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
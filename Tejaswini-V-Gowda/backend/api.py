@@ -0,0 +1,390 @@
+# api.py
+# FastAPI serving tier: login, chat (plain and streaming), account data,
+# transaction history, customer overview and chat-history CRUD over the same databases and chat
+# pipeline as main.py.
+#
+#   cd backend && uvicorn api:app --workers 4
+#
+# Every piece of state lives in SQLite (users, login tokens, conversations)
+# or in per-process caches that are safe to duplicate, so any worker can
+# serve any request. SQLite work runs in a thread via asyncio.to_thread;
+# Ollama is called through the async client, so a streaming chat never ties
+# up a worker thread. Model calls are admitted by llm_scheduler.py; when it
+# is saturated /chat answers 503 with Retry-After.
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import chat_store
+from account_cache import get_account_cache, get_core_account_cache
+from chat_service import (
+    OLLAMA_HOST, OLLAMA_MODEL, SYSTEM_PROMPT, astream_cached_response, context_messages, direct_answer,
+)
+from connections import get_connection
+from context_window import load_summary_state, new_summary_state
+from create_professional_db import DB as PROFESSIONAL_DB
+from transaction_history import HISTORY_PAGE_SIZE, TXN_TYPES, PinLocked, fetch_history, unlock_account
+from llm_scheduler import RETRY_AFTER_SECONDS, get_scheduler
+from warmup import start_warmup, warmup_stats
+from auth import (
+    AuthBusy, TOKEN_TTL_SECONDS, get_password_hasher, issue_token, lookup_token, revoke_token,
+)
+from auth import ensure_schema as ensure_auth_schema
+
+# --- Configuration ---
+DB_NAME = 'bank_chatbot.db'
+HISTORY_DB = PROFESSIONAL_DB   # transaction history comes from the core-banking schema
+SESSION_PAGE_SIZE = 20
+MAX_HISTORY_PAGE = 200
+# Transaction and spending questions asked without an account in the request
+API_UNLOCK_HINT = "send account_no and pin with the chat request"
+DEFAULT_TOPIC = "New Banking Chat"
+
+
+# --- Database Helpers ---
+
+def _db_work(fn, args, readonly, db):
+    conn = get_connection(db, readonly)
+    try:
+        result = fn(conn, *args)
+        if not readonly:
+            conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+async def run_db(fn, *args, readonly=False, db=DB_NAME):
+    # Runs fn(conn, *args) on a pooled connection in a worker thread
+    return await asyncio.to_thread(_db_work, fn, args, readonly, db)
+
+
+def ensure_schema(conn):
+    chat_store.ensure_schema(conn)
+    ensure_auth_schema(conn)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_db(ensure_schema)
+    # Loads the model and prefills the system prompt in the background
+    start_warmup(OLLAMA_MODEL, SYSTEM_PROMPT, OLLAMA_HOST)
+    yield
+
+
+app = FastAPI(title="Bank Chatbot API", lifespan=lifespan)
+
+
+# --- Request Bodies ---
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[int] = None   # continue a saved conversation
+    topic: Optional[str] = None        # title for a new conversation
+    account_no: Optional[str] = None   # with pin: answer transaction and
+    pin: Optional[str] = None          # spending questions for this account
+
+
+class SessionCreate(BaseModel):
+    topic: str = DEFAULT_TOPIC
+
+
+class SessionUpdate(BaseModel):
+    topic: str
+
+
+# --- Authentication ---
+
+def fetch_user(conn, username):
+    return conn.execute(
+        "SELECT id, password_hash FROM users WHERE username = ?", (username,)
+    ).fetchone()
+
+
+def bearer_token(authorization):
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token.")
+    return token
+
+
+async def current_user(authorization: Optional[str] = Header(None)):
+    user_id = await run_db(lookup_token, bearer_token(authorization), readonly=True)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token.")
+    return user_id
+
+
+@app.post("/login")
+async def login(body: LoginRequest):
+    user = await run_db(fetch_user, body.username, readonly=True)
+    try:
+        # bcrypt runs on the bounded pool in auth.py, off the event loop
+        valid = user is not None and await get_password_hasher().averify(body.password, user[1])
+    except AuthBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    if not valid:
+        raise HTTPException(status_code=401, detail="Incorrect username or password.")
+
+    token = await run_db(issue_token, user[0])
+    return {"token": token, "user_id": user[0], "expires_in": TOKEN_TTL_SECONDS}
+
+
+@app.post("/logout", status_code=204)
+async def logout(authorization: Optional[str] = Header(None)):
+    await run_db(revoke_token, bearer_token(authorization))
+
+
+# --- Accounts ---
+
+@app.get("/balance")
+async def balance(user_id: int = Depends(current_user)):
+    # Memory lookup until this user's account is written to (account_cache.py)
+    value = (await asyncio.to_thread(lambda: get_account_cache(DB_NAME).get(user_id)))["balance"]
+    if value is None:
+        raise HTTPException(status_code=404, detail="No account found.")
+    return {"balance": value}
+
+
+@app.get("/loans")
+async def loans(user_id: int = Depends(current_user)):
+    status = (await asyncio.to_thread(lambda: get_account_cache(DB_NAME).get(user_id)))["loan_status"]
+    if status is None:
+        raise HTTPException(status_code=404, detail="No account found.")
+    return {"loan_status": status}
+
+
+# --- Transaction History ---
+
+async def unlocked_account(account_no, pin, user_id):
+    # account_id for a matching number and PIN, with the same attempt limits as the Streamlit apps
+    if not os.path.exists(HISTORY_DB):
+        raise HTTPException(status_code=404, detail="No core-banking data.")
+    try:
+        account = await run_db(unlock_account, account_no, pin, user_id, readonly=True, db=HISTORY_DB)
+    except PinLocked as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if account is None:
+        raise HTTPException(status_code=403, detail="Incorrect account number or PIN.")
+    return account[0]
+
+
+@app.get("/transactions")
+async def transactions(
+    account_no: str,
+    x_account_pin: str = Header(...),    # a header, so the PIN stays out of URLs and access logs
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    txn_type: Optional[str] = Query(None, pattern="^(" + "|".join(TXN_TYPES) + ")$"),
+    min_amount: Optional[int] = Query(None, ge=0),    # paise
+    max_amount: Optional[int] = Query(None, ge=0),
+    before_timestamp: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE),
+    user_id: int = Depends(current_user),
+):
+    # Newest first, amounts in paise. Keyset pagination like /sessions: pass
+    # back the "next" cursor to get the following page
+    account_id = await unlocked_account(account_no, x_account_pin, user_id)
+    filters = {"date_from": date_from, "date_to": date_to, "txn_type": txn_type,
+               "min_amount": min_amount, "max_amount": max_amount}
+    before = (before_timestamp, before_id) if before_timestamp and before_id else None
+    rows, cursor = await run_db(fetch_history, account_id, filters, before, limit, readonly=True, db=HISTORY_DB)
+    next_page = {"before_timestamp": cursor[0], "before_id": cursor[1]} if cursor else None
+    return {"transactions": rows, "next": next_page}
+
+
+@app.get("/customer")
+async def customer_overview(
+    account_no: str,
+    x_account_pin: str = Header(...),
+    user_id: int = Depends(current_user),
+):
+    # Every account of the unlocked account's holder, with loans and recent
+    # transactions (amounts in paise); cached until one of them is written
+    account_id = await unlocked_account(account_no, x_account_pin, user_id)
+    cache = get_core_account_cache(HISTORY_DB)
+    account = await asyncio.to_thread(cache.account, account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail="Account not found.")
+    return await asyncio.to_thread(cache.customer, account["customer_id"])
+
+
+# --- Chat History ---
+
+async def owned_session(session_id, user_id):
+    session = await run_db(chat_store.get_session, session_id, readonly=True)
+    if session is None or session['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found.")
+    return session
+
+
+@app.get("/sessions")
+async def list_sessions(
+    before_timestamp: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=100),
+    user_id: int = Depends(current_user),
+):
+    # Keyset pagination: pass back the "next" cursor to get the following page
+    before = (before_timestamp, before_id) if before_timestamp and before_id else None
+    sessions, cursor = await run_db(chat_store.list_sessions, user_id, before, limit, readonly=True)
+    next_page = {"before_timestamp": cursor[0], "before_id": cursor[1]} if cursor else None
+    return {"sessions": sessions, "next": next_page}
+
+
+@app.post("/sessions", status_code=201)
+async def create_session(body: SessionCreate, user_id: int = Depends(current_user)):
+    session_id = await run_db(chat_store.create_session, user_id, body.topic)
+    return {"id": session_id, "topic": body.topic}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: int, user_id: int = Depends(current_user)):
+    session = await owned_session(session_id, user_id)
+    # load_messages may migrate an old JSON blob, so it needs a writable connection
+    session['messages'] = await run_db(chat_store.load_messages, session_id)
+    del session['user_id']
+    return session
+
+
+@app.patch("/sessions/{session_id}")
+async def rename_session(session_id: int, body: SessionUpdate, user_id: int = Depends(current_user)):
+    await owned_session(session_id, user_id)
+    await run_db(chat_store.rename_session, session_id, body.topic)
+    return {"id": session_id, "topic": body.topic}
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: int, user_id: int = Depends(current_user)):
+    await owned_session(session_id, user_id)
+    await run_db(chat_store.delete_session, session_id)
+
+
+# --- Chat ---
+
+def open_session(conn, user_id, session_id, topic):
+    # Returns (session_id, topic, stored messages, summary state); session_id
+    # stays None for a new conversation, which save_turn() creates
+    if session_id is None:
+        return None, topic or DEFAULT_TOPIC, [], new_summary_state()
+    session = chat_store.get_session(conn, session_id)
+    if session is None or session['user_id'] != user_id:
+        return None
+    messages = chat_store.load_messages(conn, session_id)
+    return session_id, topic or session['topic'], messages, load_summary_state(conn, session_id)
+
+
+def save_turn(conn, session_id, user_id, topic, prompt, response, summary_state):
+    # One write transaction: the session (if new), the turn's seq numbers and
+    # the metadata. Concurrent turns on one session queue on the write lock
+    # instead of colliding on UNIQUE (session_id, seq). Returns the session id.
+    turn = [{"role": "user", "content": prompt}, {"role": "assistant", "content": response}]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if session_id is None:
+            session_id = chat_store.create_session(conn, user_id, topic, summary_state)
+        chat_store.append_turn(conn, session_id, turn)
+        chat_store.touch_session(conn, session_id, topic, summary_state)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return session_id
+
+
+def direct_answer_for(conn, message, user_id, account_id):
+    # direct_answer with the account unlocked by the request, if any, for
+    # transaction and spending questions
+    if account_id is None:
+        return direct_answer(message, conn, user_id, unlock_hint=API_UNLOCK_HINT)
+    history_conn = get_connection(HISTORY_DB, readonly=True)
+    try:
+        return direct_answer(message, conn, user_id, (history_conn, account_id))
+    finally:
+        history_conn.close()
+
+
+async def prepare_chat(body, user_id):
+    opened = await run_db(open_session, user_id, body.session_id, body.topic)
+    if opened is None:
+        raise HTTPException(status_code=404, detail="Conversation not found.")
+    session_id, topic, history, summary_state = opened
+
+    account_id = None
+    if body.account_no and body.pin:
+        account_id = await unlocked_account(body.account_no, body.pin, user_id)
+    direct, source = await run_db(direct_answer_for, body.message, user_id, account_id, readonly=True)
+    if direct is None:
+        # Bounded context from the stored turns; may call the summarizer
+        context, summary_state = await asyncio.to_thread(context_messages, history, summary_state, user_id)
+    else:
+        context = []
+    return session_id, topic, summary_state, context, direct, source
+
+
+@app.post("/chat")
+async def chat(body: ChatRequest, user_id: int = Depends(current_user)):
+    session_id, topic, summary_state, context, direct, source = await prepare_chat(body, user_id)
+    timings = {}
+    if direct is not None:
+        response = direct
+    else:
+        response = "".join([token async for token in astream_cached_response(body.message, context, timings, user_id)])
+        source = "llm"
+        if timings.get("busy"):
+            # Not saved: the question can simply be sent again
+            raise HTTPException(status_code=503, detail=response,
+                                headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    session_id = await run_db(save_turn, session_id, user_id, topic, body.message, response, summary_state)
+    return {"session_id": session_id, "response": response, "source": source, "timings": timings}
+
+
+@app.post("/chat/stream")
+async def chat_stream(body: ChatRequest, user_id: int = Depends(current_user)):
+    # NDJSON: {"session_id"} first (null for a new conversation), then {"token"}
+    # lines, then {"done": true, "session_id"} once the turn is saved
+    session_id, topic, summary_state, context, direct, source = await prepare_chat(body, user_id)
+
+    async def lines():
+        yield json.dumps({"session_id": session_id}) + "\n"
+        timings = {}
+        if direct is not None:
+            parts = [direct]
+            yield json.dumps({"token": direct}) + "\n"
+        else:
+            parts = []
+            async for token in astream_cached_response(body.message, context, timings, user_id):
+                parts.append(token)
+                yield json.dumps({"token": token}) + "\n"
+        if timings.get("busy"):
+            yield json.dumps({"done": True, "busy": True, "retry_after": RETRY_AFTER_SECONDS}) + "\n"
+            return
+        # Reached only if the client stayed connected for the whole answer, so a
+        # new conversation is never created for a client that went away
+        saved_id = await run_db(save_turn, session_id, user_id, topic, body.message, "".join(parts), summary_state)
+        yield json.dumps({"done": True, "session_id": saved_id, "source": source or "llm", "timings": timings}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# --- Metrics ---
+
+@app.get("/metrics/llm")
+async def llm_metrics(user_id: int = Depends(current_user)):
+    # Queue depth, admissions, rejections and wait times of this worker's
+    # scheduler, and its cold vs warm model latency from warmup.py
+    return {**get_scheduler().metrics(), "warmup": warmup_stats()}
@@ -0,0 +1,234 @@
+# auth.py
+# Password hashing off the request thread, and reusable login tokens.
+#
+# bcrypt is deliberately slow (~0.25s per check at the default cost), so a
+# burst of logins run inline would occupy every Streamlit script thread and
+# oversubscribe the CPU. Hash and verify work goes to a small, bounded pool
+# sized to the CPU count; callers wait on a future, and once MAX_QUEUED
+# requests are waiting new ones are refused with AuthBusy instead of piling up.
+#
+# A successful login issues "<id>.<hmac>" tokens. The HMAC lets forged or
+# mangled tokens be rejected without touching the database; the sha256 of a
+# valid token is stored in api_sessions with an expiry, so tokens can be
+# revoked and are honoured by every API worker. Only API clients get tokens:
+# they present one on each request instead of the password, which skips
+# bcrypt. The Streamlit apps keep a login in session state and ask for the
+# password again after a page reload.
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import bcrypt
+
+from db_setup import create_api_sessions_table
+
+# --- Configuration ---
+BCRYPT_WORKERS = min(4, os.cpu_count() or 1)  # bcrypt releases the GIL: one per core
+MAX_QUEUED = 64                  # waiting hash/verify jobs before AuthBusy
+VERIFY_TIMEOUT_SECONDS = 10
+TIMEOUT_MESSAGE = "Sign-in is taking too long right now. Please try again in a moment."
+TOKEN_TTL_SECONDS = 8 * 3600
+SECRET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.auth_secret')
+
+
+class AuthBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers=BCRYPT_WORKERS, max_queued=MAX_QUEUED):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {
+            "workers": workers,
+            "completed": 0,
+            "rejected": 0,
+            "timed_out": 0,        # waited longer than VERIFY_TIMEOUT_SECONDS
+            "max_pending": 0,
+            "wait_seconds": 0.0,   # time spent queued before a worker picked the job up
+            "work_seconds": 0.0,   # time spent inside bcrypt
+        }
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise AuthBusy("Too many sign-ins in progress. Please try again in a moment.")
+            self._pending += 1
+            self.stats["max_pending"] = max(self.stats["max_pending"], self._pending)
+        return self._executor.submit(self._timed, time.perf_counter(), fn, *args)
+
+    def _timed(self, queued_at, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._pending -= 1
+                self.stats["completed"] += 1
+                self.stats["wait_seconds"] += started - queued_at
+                self.stats["work_seconds"] += finished - started
+
+    def _result(self, future):
+        # A pool too slow to answer in time is busy, not broken
+        try:
+            return future.result(VERIFY_TIMEOUT_SECONDS)
+        except FutureTimeout:
+            self._count_timeout()
+            raise AuthBusy(TIMEOUT_MESSAGE)
+
+    def _count_timeout(self):
+        with self._lock:
+            self.stats["timed_out"] += 1
+
+    def hash(self, password):
+        return self._result(self._submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()))
+
+    def verify(self, password, hashed):
+        return self._result(self._submit(bcrypt.checkpw, password.encode('utf-8'), hashed))
+
+    async def averify(self, password, hashed):
+        future = self._submit(bcrypt.checkpw, password.encode('utf-8'), hashed)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), VERIFY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._count_timeout()
+            raise AuthBusy(TIMEOUT_MESSAGE)
+
+    def summary(self):
+        with self._lock:
+            done = self.stats["completed"] or 1
+            return {
+                **self.stats,
+                "pending": self._pending,
+                "avg_wait_ms": self.stats["wait_seconds"] / done * 1000,
+                "avg_work_ms": self.stats["work_seconds"] / done * 1000,
+            }
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    # One pool per process (Streamlit keeps imported modules across reruns)
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
+
+
+# --- Session tokens ---
+
+def _load_secret():
+    # Every process on the host must sign with the same key
+    secret = os.environ.get("BANK_AUTH_SECRET")
+    if secret:
+        return secret.encode('utf-8')
+    try:
+        with open(SECRET_FILE, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32).encode('ascii')
+    try:
+        # O_EXCL: if another worker created it first, use theirs
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(SECRET_FILE, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+    return secret
+
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret():
+    # Loaded (and the file created) on first use, not at import
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            _secret = _load_secret()
+        return _secret
+
+
+def _sign(token_id):
+    return hmac.new(_get_secret(), token_id.encode('ascii'), hashlib.sha256).hexdigest()
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+_schema_ready = set()
+
+
+def ensure_schema(conn):
+    # api_sessions is created by init_db; older databases get it here, once per process
+    db = conn.execute("PRAGMA database_list").fetchone()[2]
+    if db in _schema_ready:
+        return
+    create_api_sessions_table(conn.cursor())
+    conn.commit()
+    _schema_ready.add(db)
+
+
+def issue_token(conn, user_id, ttl=TOKEN_TTL_SECONDS):
+    # Caller commits; returns the token to hand to the client
+    ensure_schema(conn)
+    token_id = secrets.token_urlsafe(24)
+    token = f"{token_id}.{_sign(token_id)}"
+    conn.execute("DELETE FROM api_sessions WHERE expires_at < ?", (time.time(),))
+    conn.execute(
+        "INSERT INTO api_sessions (token_hash, user_id, expires_at) VALUES (?, ?, ?)",
+        (hash_token(token), user_id, time.time() + ttl)
+    )
+    return token
+
+
+def token_signature_ok(token):
+    token_id, _, signature = (token or "").partition(".")
+    return bool(token_id) and hmac.compare_digest(signature, _sign(token_id))
+
+
+def lookup_token(conn, token):
+    # Returns the user id for a valid, unexpired token, else None
+    if not token_signature_ok(token):
+        return None
+    row = conn.execute(
+        "SELECT user_id FROM api_sessions WHERE token_hash = ? AND expires_at >= ?",
+        (hash_token(token), time.time())
+    ).fetchone()
+    return row[0] if row else None
+
+
+def resume_session(conn, token):
+    # Streamlit reconnect: (user_id, username) for a valid token, else None
+    user_id = lookup_token(conn, token)
+    if user_id is None:
+        return None
+    row = conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+    return (user_id, row[0]) if row else None
+
+
+def revoke_token(conn, token):
+    # Caller commits
+    conn.execute("DELETE FROM api_sessions WHERE token_hash = ?", (hash_token(token),))
@@ -1,10 +1,13 @@
 import os
 import sys
+import time
 from sqlalchemy import create_engine, text
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain_ollama import ChatOllama
 from langchain_community.agent_toolkits import create_sql_agent
+from sql_fast_path import SQLFastPath, agent_sql
+from sql_sandbox import query_tool
 # --- Configuration ---
 # You confirmed that 'llama3' is installed.
 LLM_MODEL = "llama3" 
@@ -67,7 +70,15 @@ try:
     db = SQLDatabase(engine=engine)
 
     # 3. Create the Toolkit (provides the LLM tools like 'query_sql_db')
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+    # Its sql_db_query runs any SQL read-write and returns every row; the
+    # sandboxed one (sql_sandbox.py) is read-only, refuses large full scans
+    # and returns a capped summary.
+    class SandboxedSQLToolkit(SQLDatabaseToolkit):
+        def get_tools(self):
+            return [query_tool(DB_FILE) if tool.name == "sql_db_query" else tool
+                    for tool in super().get_tools()]
+
+    toolkit = SandboxedSQLToolkit(db=db, llm=llm)
 
     # --- STEP 3: Create the Text-to-SQL Agent ---
     agent_executor = create_sql_agent(
@@ -75,9 +86,16 @@ try:
         toolkit=toolkit,
         verbose=True, # Shows the LLM's thought process
         agent_type="openai-tools", 
-        handle_parsing_errors=True
+        handle_parsing_errors=True,
+        # The SQL the agent ran is read back from its steps to build templates
+        agent_executor_kwargs={"return_intermediate_steps": True},
     )
 
+    # 4. Template fast path in front of the agent (sql_fast_path.py)
+    start = time.perf_counter()
+    fast_path = SQLFastPath(DB_FILE)
+    print(f"Compact schema built in {(time.perf_counter() - start) * 1000:.1f} ms:\n{fast_path.schema}")
+
 except Exception as e:
     print(f"\n--- ERROR ---")
     print(f"Failed to initialize LLM or Agent. Is 'ollama serve' running?")
@@ -91,14 +109,27 @@ print("\n" + "="*50)
 print(f"Starting Agent Queries using model: {LLM_MODEL}")
 print("="*50)
 
-# Query 1: Find a specific balance
-question1 = "What is the current balance for Alice Smith's account?"
-print(f"User Query 1: {question1}")
-response1 = agent_executor.invoke({"input": question1})
-print(f"\nFinal Answer: {response1['output']}\n")
-
-# Query 2: Perform an aggregation/calculation
-question2 = "What is the total balance across all Checking accounts?"
-print(f"User Query 2: {question2}")
-response2 = agent_executor.invoke({"input": question2})
-print(f"\nFinal Answer: {response2['output']}\n")
\ No newline at end of file
+def run_agent(agent_input):
+    result = agent_executor.invoke({"input": agent_input})
+    return result["output"], agent_sql(result)
+
+# Cold: the agent writes the SQL; warm: the same shapes again, answered from templates
+questions = [
+    "What is the current balance for Alice Smith's account?",
+    "What is the total balance across all Checking accounts?",
+    "What is the current balance for Alice Smith's account?",
+    "What is the current balance for Bob Johnson's account?",
+    "What is the total balance across all Savings accounts?",
+]
+timings = []
+for number, question in enumerate(questions, start=1):
+    print(f"User Query {number}: {question}")
+    result = fast_path.answer(question, run_agent)
+    timings.append((question, result["source"], result["seconds"]))
+    print(f"\nFinal Answer ({result['source']}): {result['answer']}\n")
+
+print("="*50)
+print("Latency (agent = cold, template = warm)")
+for question, source, seconds in timings:
+    print(f"  {seconds * 1000:9.1f} ms  {source:8}  {question}")
+print(f"Fast path: {fast_path.stats}")
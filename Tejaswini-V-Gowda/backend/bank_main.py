@@ -1,25 +1,62 @@
 # bank_app.py (Final Corrected Version)
 
+import os
 import streamlit as st
 import sqlite3
-import bcrypt
-import json
 from datetime import datetime
 import re 
+from functools import lru_cache
+import requests
+from ollama_client import OllamaError
+from llm_scheduler import LLMBusy, scheduled_client
+from context_window import build_context, llm_summarizer, new_summary_state, load_summary_state
+from faq import get_faq_index
+from intents import classify, is_banking
+from account_cache import get_account_cache
+from router import route
+import chat_store
+from connections import get_connection
+from create_professional_db import DB as PROFESSIONAL_DB
+from account_queries import has_table
+from aggregates import latest_months
+from ledger import LedgerError, format_minor, to_minor
+from transaction_history import HISTORY_PAGE_SIZE, PinLocked, fetch_history, format_history, unlock_account
+from auth import AuthBusy, get_password_hasher
+from warmup import start_warmup
 LLM_MODEL = "gemma3:4b"
 # --- Configuration ---
 DB_NAME = 'bank_chatbot.db'
+OLLAMA_HOST = 'http://localhost:11434'
+# Banking questions the rules below cannot answer are sent to LLM_MODEL
+USE_LLM = True
+SIDEBAR_PAGE_SIZE = 20 # past conversations listed per "Load more"
+# Identical on every call so the model server can reuse its prefix (see warmup.py)
+LLM_SYSTEM_PROMPT = (
+    "You are a helpful and secure bank chatbot. "
+    "Answer only questions about banking: accounts, transactions, loans, fees and ATMs. "
+    "Never invent account numbers or balances; direct users to the Banking Activities buttons for their own data."
+)
+HISTORY_DB = PROFESSIONAL_DB # transaction history comes from the core-banking schema
 
 # --- Database Helpers ---
-def get_db_connection():
-    return sqlite3.connect(DB_NAME)
+def get_db_connection(readonly=False):
+    # Pooled, WAL-mode connection (see connections.py); conn.close() returns it to the pool
+    return get_connection(DB_NAME, readonly)
 
 def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt)
+    # bcrypt runs on the shared bounded pool in auth.py, not the script thread
+    return get_password_hasher().hash(password)
 
 def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    return get_password_hasher().verify(password, hashed)
+
+# --- Login Sessions ---
+# A login lasts as long as this session's server-side state: a websocket
+# reconnect keeps it, a full page reload asks for the password again.
+# Reusable bearer tokens (auth.issue_token) are only handed to API clients.
+
+def logout():
+    st.session_state.clear()
 
 # --- Chat History Management ---
 
@@ -28,51 +65,48 @@ def save_chat_session(user_id, topic, messages):
         return
 
     conn = get_db_connection()
-    cursor = conn.cursor()
-    messages_json = json.dumps(messages)
+    chat_store.ensure_schema(conn)
+    summary_state = st.session_state.get("context_summary") or new_summary_state()
     
+    # Only messages not yet stored are inserted; the row itself gets a
+    # constant-size metadata update, so a turn costs the same at any length
     if 'session_id' in st.session_state and st.session_state["session_id"] is not None:
-        cursor.execute(
-            "UPDATE chat_history SET topic = ?, messages = ?, timestamp = CURRENT_TIMESTAMP WHERE id = ?",
-            (topic, messages_json, st.session_state["session_id"])
-        )
+        chat_store.touch_session(conn, st.session_state["session_id"], topic, summary_state)
     else:
-        cursor.execute(
-            "INSERT INTO chat_history (user_id, topic, messages) VALUES (?, ?, ?)",
-            (user_id, topic, messages_json)
-        )
-        st.session_state["session_id"] = cursor.lastrowid
+        st.session_state["session_id"] = chat_store.create_session(conn, user_id, topic, summary_state)
+        st.session_state["persisted_count"] = 0
+
+    st.session_state["persisted_count"] = chat_store.append_messages(
+        conn, st.session_state["session_id"], messages, st.session_state.get("persisted_count", 0)
+    )
 
     conn.commit()
     conn.close()
 
-def load_chat_sessions(user_id):
+def load_chat_session_list(user_id, pages):
+    # Sidebar listing: id/topic/timestamp only, one keyset page at a time
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, topic, messages, timestamp FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC", 
-        (user_id,)
-    )
-    sessions = []
-    for row in cursor.fetchall():
-        try:
-            messages = json.loads(row[2])
-        except (json.JSONDecodeError, TypeError):
-            messages = []
-            
-        sessions.append({
-            'id': row[0],
-            'topic': row[1],
-            'messages': messages,
-            'timestamp': row[3]
-        })
+    chat_store.ensure_schema(conn)
+    sessions, has_more = chat_store.list_sessions_pages(conn, user_id, pages, SIDEBAR_PAGE_SIZE)
+    conn.close()
+    return sessions, has_more
+
+def open_chat_session(session_id):
+    # Message bodies and the rolling summary are only read when a chat is opened
+    conn = get_db_connection()
+    messages = chat_store.load_messages(conn, session_id)
+    summary_state = load_summary_state(conn, session_id)
     conn.close()
-    return sessions
+    return messages, summary_state
+
+@lru_cache(maxsize=1024)
+def format_session_time(timestamp):
+    dt_obj = datetime.strptime(timestamp.split('.')[0], '%Y-%m-%d %H:%M:%S')
+    return dt_obj.strftime("%d %b, %I:%M %p")
 
 def delete_chat_session(session_id):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM chat_history WHERE id = ?", (session_id,))
+    chat_store.delete_session(conn, session_id)
     conn.commit()
     conn.close()
     
@@ -80,6 +114,8 @@ def delete_chat_session(session_id):
         st.session_state["messages"] = []
         st.session_state["current_chat_topic"] = "New Banking Chat"
         st.session_state["session_id"] = None
+        st.session_state["persisted_count"] = 0
+        st.session_state["context_summary"] = new_summary_state()
         
     st.success(f"Chat session deleted.")
     st.rerun()
@@ -87,33 +123,79 @@ def delete_chat_session(session_id):
 # --- MOCK AI / Guardrail Logic (STRICTLY ENFORCED) ---
 
 def generate_ollama_response(user_prompt, chat_history):
-    user_prompt_lower = user_prompt.lower()
-    
-    banking_keywords = ["balance", "money", "loan", "interest", "atm", "limit", "fee", "overdraft", "account", "transaction", "bank", "deposit", "withdraw"]
+    # One compiled, word-boundary scan ranks every intent in the prompt
+    ranked = classify(user_prompt)
+    intent = ranked[0][0] if ranked else None
 
-    if any(word in user_prompt_lower for word in ["hello", "hi", "hey"]):
+    if intent == "greeting":
         return "Hello! I am your Bank Chatbot AI. I can assist you with banking inquiries regarding accounts, loans, and services. How can I help you?"
     
-    if any(keyword in user_prompt_lower for keyword in banking_keywords):
+    # Questions about the customer's own balance, loan or transactions are
+    # answered from the same queries the Banking Activities views run
+    conn = get_db_connection(readonly=True)
+    spending_source = open_spending_source()
+    routed_answer = route(user_prompt, conn, st.session_state.get("user_id"), spending_source)
+    conn.close()
+    if spending_source is not None:
+        spending_source[0].close()
+    if routed_answer is not None:
+        return routed_answer
+    
+    # High-confidence FAQ matches are answered from the precompiled index
+    faq = get_faq_index()
+    faq_answer = faq.answer(user_prompt)
+    if faq_answer is not None:
+        return faq_answer
+    
+    if is_banking(ranked):
         
-        if "balance" in user_prompt_lower or "account" in user_prompt_lower:
+        if intent == "balance":
             return "For your real-time balance, please use the **'Balance' button** under Banking Activities, as I cannot access specific account numbers directly for security reasons."
-        elif "loan" in user_prompt_lower or "interest" in user_prompt_lower:
-            return "Our current standard loan interest rates start at 4.5%. For a personalized quote, please click the **'Loan Information'** button."
-        elif "fee" in user_prompt_lower or "overdraft" in user_prompt_lower:
-            return "A standard transaction fee is $1.00, and the overdraft fee is $35."
-        elif "atm" in user_prompt_lower or "limit" in user_prompt_lower:
-            return "The maximum daily ATM withdrawal limit is $500. You can find nearest locations under **'ATM Information'**."
+        elif intent == "loan":
+            return faq.answer_for("loan_interest")
+        elif intent == "fees":
+            return faq.answer_for("fees")
+        elif intent == "atm":
+            return faq.answer_for("atm_limit")
         else:
-            return "Thank you for your banking query. Please be more specific about the service you are looking for (e.g., balance, loan details, fees)."
+            return generate_llm_response(user_prompt, chat_history)
     
     return "I can only assist with bank-related inquiries, such as transactions, accounts, and loan information. I cannot answer general questions."
 
+def generate_llm_response(user_prompt, chat_history):
+    fallback = "Thank you for your banking query. Please be more specific about the service you are looking for (e.g., balance, loan details, fees)."
+    if not USE_LLM:
+        return fallback
+
+    # Admitted by the shared model queue (llm_scheduler.py) under this user's id
+    client = scheduled_client(st.session_state.get("user_id"), OLLAMA_HOST)
+    # Last few turns verbatim, older ones folded into a cached rolling summary
+    context, st.session_state["context_summary"] = build_context(
+        chat_history, st.session_state["context_summary"], llm_summarizer(client, LLM_MODEL)
+    )
+    messages = [
+        {"role": "system", "content": LLM_SYSTEM_PROMPT},
+        *context,
+        {"role": "user", "content": user_prompt},
+    ]
+
+    try:
+        return client.chat(LLM_MODEL, messages)
+    except LLMBusy as e:
+        return str(e)
+    except (requests.exceptions.RequestException, OllamaError):
+        # The rule-based answer is still useful when the model server is down
+        return fallback
+
 def generate_topic_name(prompt):
     words = prompt.split()[:5]
     topic = " ".join(words).replace('.', '').replace('?', '').strip()
     return topic if len(topic) > 0 else "Untitled Chat"
 
+# Model load and prompt prefill happen once per process, before the first question
+if USE_LLM:
+    start_warmup(LLM_MODEL, LLM_SYSTEM_PROMPT, OLLAMA_HOST)
+
 # --- Session State Initialization ---
 if "logged_in" not in st.session_state: st.session_state["logged_in"] = False
 if "username" not in st.session_state: st.session_state["username"] = None
@@ -121,27 +203,26 @@ if "user_id" not in st.session_state: st.session_state["user_id"] = None
 if "messages" not in st.session_state: st.session_state["messages"] = []
 if "current_chat_topic" not in st.session_state: st.session_state["current_chat_topic"] = "New Banking Chat"
 if "session_id" not in st.session_state: st.session_state["session_id"] = None
+if "persisted_count" not in st.session_state: st.session_state["persisted_count"] = 0 # messages already in chat_messages
+if "sidebar_pages" not in st.session_state: st.session_state["sidebar_pages"] = 1
+if "context_summary" not in st.session_state: st.session_state["context_summary"] = new_summary_state()
 if "current_view" not in st.session_state: st.session_state["current_view"] = "Chatbot" # Default view is Chatbot
+if "history_account" not in st.session_state: st.session_state["history_account"] = None # (account_id, account_no) once unlocked
+if "history_filters" not in st.session_state: st.session_state["history_filters"] = {}
+if "history_cursors" not in st.session_state: st.session_state["history_cursors"] = [None] # keyset cursor per page shown
 
 # --- Banking Activities Pages ---
 
 def show_balance():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT balance FROM accounts WHERE user_id = ?", (st.session_state["user_id"],))
-    balance = cursor.fetchone()[0]
-    conn.close()
+    # Memory lookup; reloaded only after a write to this user's account (account_cache.py)
+    balance = get_account_cache(DB_NAME).get(st.session_state["user_id"])["balance"]
     
     st.header("💰 Account Balance")
     st.info("This section shows your real-time account data.")
     st.metric(label="Current Available Balance", value=f"${balance:,.2f}", delta="Up-to-Date")
     
 def show_loan_info():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT loan_status FROM accounts WHERE user_id = ?", (st.session_state["user_id"],))
-    loan_status = cursor.fetchone()[0]
-    conn.close()
+    loan_status = get_account_cache(DB_NAME).get(st.session_state["user_id"])["loan_status"]
     
     st.header("🏦 Loan Information")
     st.info("Manage your existing loans or inquire about new applications.")
@@ -155,17 +236,116 @@ def show_atm_info():
     st.write("Nearest Branch: **456 Elm Ave, Downtown**")
     st.caption("Daily ATM withdrawal limit: **$500**.")
 
+def load_history_page(account_id, filters, before):
+    conn = get_connection(HISTORY_DB, readonly=True)
+    page = fetch_history(conn, account_id, filters, before, HISTORY_PAGE_SIZE)
+    conn.close()
+    return page
+
+def unlock_history_account():
+    with st.form("history_account_form"):
+        account_no = st.text_input("Account Number")
+        pin = st.text_input("PIN", type="password")
+        if st.form_submit_button("Show Transactions"):
+            conn = get_connection(HISTORY_DB, readonly=True)
+            try:
+                account = unlock_account(conn, account_no, pin, st.session_state["user_id"])
+            except PinLocked as e:
+                st.error(str(e))
+                return
+            finally:
+                conn.close()
+            if account is None:
+                st.error("Incorrect account number or PIN.")
+                return
+            st.session_state["history_account"] = account
+            st.session_state["history_cursors"] = [None]
+            st.rerun()
+
+def history_filters():
+    # Amounts are typed in rupees and compared in paise
+    col1, col2, col3, col4, col5 = st.columns(5)
+    date_from = col1.date_input("From", value=None)
+    date_to = col2.date_input("To", value=None)
+    txn_type = col3.selectbox("Type", ["All", "credit", "debit"])
+    min_amount = col4.text_input("Min amount")
+    max_amount = col5.text_input("Max amount")
+    filters = {"date_from": date_from, "date_to": date_to,
+               "txn_type": txn_type if txn_type != "All" else None}
+    try:
+        filters["min_amount"] = to_minor(min_amount) if min_amount.strip() else None
+        filters["max_amount"] = to_minor(max_amount) if max_amount.strip() else None
+    except LedgerError as e:
+        st.error(str(e))
+        return None
+    return filters
+
+def load_month_summary(account_id):
+    # Latest two months from the aggregates (aggregates.py): two primary-key rows
+    conn = get_connection(HISTORY_DB, readonly=True)
+    months = latest_months(conn, account_id, 2) if has_table(conn, "monthly_totals") else []
+    conn.close()
+    return months
+
+def open_spending_source():
+    # (connection, account_id) for the account unlocked under Transactions, else None
+    account = st.session_state["history_account"]
+    if account is None:
+        return None
+    return get_connection(HISTORY_DB, readonly=True), account[0]
+
+def show_month_summary(account_id):
+    months = load_month_summary(account_id)
+    if not months:
+        return
+    latest, previous = months[0], (months[1] if len(months) > 1 else None)
+    col1, col2, col3 = st.columns(3)
+    col1.metric(f"Spent in {latest['month']}", f"₹{format_minor(latest['debits'])}",
+                delta=f"₹{format_minor(latest['debits'] - previous['debits'])}" if previous else None,
+                delta_color="inverse")
+    col2.metric(f"Received in {latest['month']}", f"₹{format_minor(latest['credits'])}")
+    if latest["end_balance"] is not None:
+        col3.metric("Balance at month end", f"₹{format_minor(latest['end_balance'])}")
+
 def show_transaction():
     st.header("💸 Transaction History")
-    st.info("Review your recent account activity.")
-    st.dataframe(
-        [
-            {"Date": "2024-12-05", "Description": "Salary Deposit", "Amount": "+$2,500.00"},
-            {"Date": "2024-12-04", "Description": "Online Purchase (Amazon)", "Amount": "-$45.99"},
-            {"Date": "2024-12-03", "Description": "ATM Withdrawal", "Amount": "-$100.00"},
-        ], 
-        use_container_width=True
-    )
+    if not os.path.exists(HISTORY_DB):
+        st.info(f"No core-banking data yet; run create_professional_db.py to create {HISTORY_DB}.")
+        return
+    if st.session_state["history_account"] is None:
+        st.info("Enter your account number and PIN to review your account activity.")
+        unlock_history_account()
+        return
+    account_id, account_no = st.session_state["history_account"]
+    st.info(f"Review the activity on account {account_no}.")
+    show_month_summary(account_id)
+
+    filters = history_filters()
+    if filters is None:
+        return
+    if filters != st.session_state["history_filters"]:
+        # New filters start again from the newest page
+        st.session_state["history_filters"] = filters
+        st.session_state["history_cursors"] = [None]
+
+    cursors = st.session_state["history_cursors"]
+    rows, next_cursor = load_history_page(account_id, filters, cursors[-1])
+    if rows:
+        st.dataframe(format_history(rows), use_container_width=True)
+    else:
+        st.info("No transactions match these filters.")
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button("⬅️ Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)}")
+    if col3.button("Older ➡️", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    if st.button("Use another account"):
+        st.session_state["history_account"] = None
+        st.rerun()
 
 # --- Main Chatbot Interface ---
 def chatbot_interface():
@@ -180,6 +360,8 @@ def chatbot_interface():
         if st.session_state["current_chat_topic"] == "New Banking Chat":
             st.session_state["current_chat_topic"] = generate_topic_name(prompt)
         
+        # History before this prompt; the prompt itself is sent once
+        history = list(st.session_state["messages"])
         st.session_state["messages"].append({"role": "user", "content": prompt})
         
         with st.chat_message("user"):
@@ -187,8 +369,7 @@ def chatbot_interface():
 
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                full_history = st.session_state["messages"] 
-                response = generate_ollama_response(prompt, full_history) 
+                response = generate_ollama_response(prompt, history) 
             
             st.markdown(response)
             
@@ -209,7 +390,7 @@ def main_dashboard():
     
     with st.sidebar:
         st.title(f"💳 Welcome, {st.session_state['username']}")
-        st.button("Exit / Logout", on_click=lambda: st.session_state.clear() or st.rerun(), type="primary")
+        st.button("Exit / Logout", on_click=logout, type="primary")
         
         st.markdown("---")
         
@@ -265,19 +446,22 @@ def main_dashboard():
             st.session_state["messages"] = []
             st.session_state["current_chat_topic"] = "New Banking Chat"
             st.session_state["session_id"] = None
+            st.session_state["persisted_count"] = 0
+            st.session_state["context_summary"] = new_summary_state()
             st.session_state["current_view"] = "Chatbot" 
             st.rerun()
 
         st.subheader("Past Conversations")
         
-        chat_sessions = load_chat_sessions(st.session_state["user_id"])
+        chat_sessions, has_more = load_chat_session_list(
+            st.session_state["user_id"], st.session_state["sidebar_pages"]
+        )
         
         if chat_sessions:
             for session in chat_sessions:
                 col1, col2 = st.columns([4, 1])
                 
-                dt_obj = datetime.strptime(session['timestamp'].split('.')[0], '%Y-%m-%d %H:%M:%S')
-                display_time = dt_obj.strftime("%d %b, %I:%M %p")
+                display_time = format_session_time(session['timestamp'])
                 
                 # Highlight the conversation if it is the current one
                 is_current_session = st.session_state.get("session_id") == session['id'] and st.session_state["current_view"] == "Chatbot"
@@ -298,9 +482,12 @@ def main_dashboard():
                     )
 
                 if button_clicked:
-                    st.session_state["messages"] = session['messages']
+                    messages, summary_state = open_chat_session(session['id'])
+                    st.session_state["messages"] = messages
                     st.session_state["current_chat_topic"] = session['topic']
                     st.session_state["session_id"] = session['id']
+                    st.session_state["persisted_count"] = len(messages)
+                    st.session_state["context_summary"] = summary_state
                     st.session_state["current_view"] = "Chatbot" 
                     st.rerun()
                 
@@ -313,6 +500,10 @@ def main_dashboard():
                     args=(session['id'],)
                 )
 
+            if has_more and st.button("Load more", use_container_width=True, key="load_more_sessions"):
+                st.session_state["sidebar_pages"] += 1
+                st.rerun()
+
     # --- Main Content Area (Unified View) ---
     
     if st.session_state["current_view"] in activity_map:
@@ -353,7 +544,12 @@ def login_page():
 
             if user_data:
                 user_id, hashed_pw = user_data
-                if check_password(password, hashed_pw):
+                try:
+                    valid = check_password(password, hashed_pw)
+                except AuthBusy as e:
+                    st.error(str(e))
+                    return
+                if valid:
                     st.session_state["logged_in"] = True
                     st.session_state["username"] = username
                     st.session_state["user_id"] = user_id
@@ -391,6 +587,8 @@ def register_page():
                     st.success("Registration successful! Please log in.")
                 except sqlite3.IntegrityError:
                     st.error("Username already exists.")
+                except AuthBusy as e:
+                    st.error(str(e))
                 finally:
                     conn.close()
 
@@ -0,0 +1,129 @@
+# bench_auth.py
+# Benchmark: a login burst from many concurrent sessions.
+#
+# Compares bcrypt run inline on every session thread (the old login_page)
+# with the bounded pool in auth.py, and measures how long a light "other
+# session" request (a balance lookup) is delayed while the burst runs.
+# Finally measures reconnects that present a session token instead of a
+# password.
+#
+#   python bench_auth.py [concurrent_logins] [bcrypt_cost]
+
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import bcrypt
+
+from auth import PasswordHasher, ensure_schema, issue_token, resume_session
+
+PASSWORD = "correct horse battery staple"
+
+
+def create_database(path, users, cost):
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(cost))
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE NOT NULL, password_hash BLOB NOT NULL)")
+    conn.execute("CREATE TABLE accounts (user_id INTEGER PRIMARY KEY, balance REAL NOT NULL, loan_status TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)", [(i, f"user{i}", hashed) for i in range(1, users + 1)])
+    conn.executemany("INSERT INTO accounts VALUES (?, ?, ?)", [(i, 100.0, "None") for i in range(1, users + 1)])
+    ensure_schema(conn)
+    conn.commit()
+    conn.close()
+
+
+def login(path, user_id, verify):
+    conn = sqlite3.connect(path, timeout=10)
+    row = conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()
+    ok = verify(PASSWORD, row[0])
+    if ok:
+        token = issue_token(conn, user_id)
+        conn.commit()
+    conn.close()
+    return token if ok else None
+
+
+def other_session(path, stop, latencies):
+    # A session that only reads its balance, every 10 ms
+    conn = sqlite3.connect(path)
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("SELECT balance FROM accounts WHERE user_id = 1").fetchone()
+        sum(i * i for i in range(2000))   # a little Python work, like a page render
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    conn.close()
+
+
+def percentile(values, p):
+    if len(values) < 2:
+        return (values[0] if values else float('nan')) * 1000
+    return statistics.quantiles(values, n=100)[p - 1] * 1000
+
+
+def burst(name, path, logins, verify):
+    stop = threading.Event()
+    other = []
+    watcher = threading.Thread(target=other_session, args=(path, stop, other))
+    watcher.start()
+
+    login_times = []
+    tokens = []
+
+    def one(user_id):
+        start = time.perf_counter()
+        tokens.append(login(path, user_id, verify))
+        login_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=one, args=(i % 100 + 1,)) for i in range(logins)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    watcher.join()
+
+    print(f"  {name}")
+    print(f"    {logins / elapsed:8.1f} logins/s   login p50 {percentile(login_times, 50):7.0f} ms  p95 {percentile(login_times, 95):7.0f} ms")
+    print(f"    other session request p50 {percentile(other, 50):6.1f} ms  p95 {percentile(other, 95):6.1f} ms")
+    return [t for t in tokens if t]
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    cost = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "auth.db")
+        create_database(path, 100, cost)
+        print(f"{logins} concurrent logins, bcrypt cost {cost}, {os.cpu_count()} CPUs")
+
+        inline = lambda password, hashed: bcrypt.checkpw(password.encode('utf-8'), hashed)
+        burst("bcrypt inline on each session thread", path, logins, inline)
+
+        hasher = PasswordHasher()
+        tokens = burst(f"bounded pool ({hasher.stats['workers']} workers)", path, logins, hasher.verify)
+        stats = hasher.summary()
+        print(f"    pool: max waiting {stats['max_pending']}, avg queue wait {stats['avg_wait_ms']:.0f} ms, "
+              f"avg bcrypt {stats['avg_work_ms']:.0f} ms, rejected {stats['rejected']}")
+
+        conn = sqlite3.connect(path)
+        rounds = 20
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for token in tokens:
+                assert resume_session(conn, token) is not None
+        elapsed = time.perf_counter() - start
+        conn.close()
+        print(f"  token reconnects: {rounds * len(tokens) / elapsed:,.0f}/s (no bcrypt)")
+
+
+if __name__ == '__main__':
+    main()
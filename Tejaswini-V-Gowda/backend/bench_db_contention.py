@@ -0,0 +1,137 @@
+# bench_db_contention.py
+# Benchmark: many concurrent chat sessions against one SQLite file, comparing
+# a new connection per query (the old get_db_connection, rollback journal)
+# with the pooled WAL connections from connections.py.
+#
+# Each simulated session loops over a Streamlit-like workload: read the
+# balance, list past conversations, and every few turns save two chat
+# messages. Reports throughput, read/write latency percentiles and
+# "database is locked" errors.
+#
+#   python bench_db_contention.py [sessions] [seconds]
+
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import chat_store
+import connections
+from account_queries import fetch_balance
+
+USERS = 50
+SESSIONS_PER_USER = 30
+WRITE_EVERY = 4   # one chat save per this many turns
+
+
+def create_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE NOT NULL, password_hash BLOB NOT NULL)")
+    conn.execute("CREATE TABLE accounts (user_id INTEGER PRIMARY KEY, balance REAL NOT NULL, loan_status TEXT)")
+    conn.execute(
+        "CREATE TABLE chat_history (id INTEGER PRIMARY KEY, user_id INTEGER, topic TEXT NOT NULL, messages TEXT, "
+        "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, summary TEXT, summary_upto INTEGER DEFAULT 0)"
+    )
+    chat_store.ensure_schema(conn)
+    for user_id in range(1, USERS + 1):
+        conn.execute("INSERT INTO users VALUES (?, ?, ?)", (user_id, f"user{user_id}", b"x"))
+        conn.execute("INSERT INTO accounts VALUES (?, ?, ?)", (user_id, 1000.0 * user_id, "None"))
+        for n in range(SESSIONS_PER_USER):
+            session_id = chat_store.create_session(conn, user_id, f"Chat {n}")
+            chat_store.append_messages(conn, session_id, [
+                {"role": "user", "content": "What is my balance?"},
+                {"role": "assistant", "content": "Your balance is $1,000.00."},
+            ], 0)
+    conn.commit()
+    conn.close()
+
+
+def connect_per_query(path):
+    def open_conn(readonly=False):
+        return sqlite3.connect(path)
+    return open_conn
+
+
+def pooled(path):
+    def open_conn(readonly=False):
+        return connections.get_connection(path, readonly)
+    return open_conn
+
+
+def session_loop(open_conn, seed, deadline, stats):
+    rng = random.Random(seed)
+    user_id = rng.randint(1, USERS)
+    session_id = None
+    saved = 0
+    turn = 0
+    while time.perf_counter() < deadline:
+        turn += 1
+        try:
+            start = time.perf_counter()
+            conn = open_conn(readonly=True)
+            fetch_balance(conn, user_id)
+            chat_store.list_sessions(conn, user_id, limit=20)
+            conn.close()
+            stats['read'].append(time.perf_counter() - start)
+
+            if turn % WRITE_EVERY == 0:
+                start = time.perf_counter()
+                conn = open_conn()
+                if session_id is None:
+                    session_id = chat_store.create_session(conn, user_id, "Benchmark chat")
+                messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}] * (saved // 2 + 1)
+                saved = chat_store.append_messages(conn, session_id, messages, saved)
+                chat_store.touch_session(conn, session_id, "Benchmark chat")
+                conn.commit()
+                conn.close()
+                stats['write'].append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            # The failed connection is dropped rather than returned to a pool
+            stats['errors'].append(str(e))
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    return statistics.quantiles(values, n=100)[p - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+
+def run(name, open_conn, sessions, seconds):
+    stats = {'read': [], 'write': [], 'errors': []}
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=session_loop, args=(open_conn, i, deadline, stats)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    reads, writes = stats['read'], stats['write']
+    print(f"  {name}")
+    print(f"    turns/s {len(reads) / seconds:10,.0f}   saves/s {len(writes) / seconds:8,.0f}   locked errors {len(stats['errors'])}")
+    print(f"    read  p50 {percentile(reads, 50):7.2f} ms  p95 {percentile(reads, 95):7.2f} ms")
+    print(f"    write p50 {percentile(writes, 50):7.2f} ms  p95 {percentile(writes, 95):7.2f} ms")
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{sessions} concurrent sessions, {seconds:.0f}s per run, {USERS * SESSIONS_PER_USER:,} stored conversations")
+
+        path = os.path.join(tmp, "per_query.db")
+        create_database(path)
+        run("new connection per query (rollback journal)", connect_per_query(path), sessions, seconds)
+
+        path = os.path.join(tmp, "pooled.db")
+        create_database(path)
+        run("pooled connections (WAL, read-only path)", pooled(path), sessions, seconds)
+        connections.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# bench_intents.py
+# Microbenchmark: compiled intent matcher (intents.py) vs. the substring
+# scans it replaced in bank_main.py and frontend/app.py.
+#
+#   python bench_intents.py [number_of_prompts]
+
+import random
+import sys
+import time
+
+from intents import INTENT_KEYWORDS, classify_many, top_intent
+
+# --- The previous implementation (kept here for comparison only) ---
+
+BANKING_KEYWORDS = ["balance", "money", "loan", "interest", "atm", "limit", "fee", "overdraft",
+                    "account", "transaction", "bank", "deposit", "withdraw"]
+
+
+def legacy_intent(prompt):
+    text = prompt.lower()
+    if any(word in text for word in ["hello", "hi", "hey"]):
+        return "greeting"
+    if any(keyword in text for keyword in BANKING_KEYWORDS):
+        if "balance" in text or "account" in text:
+            return "balance"
+        elif "loan" in text or "interest" in text:
+            return "loan"
+        elif "fee" in text or "overdraft" in text:
+            return "fees"
+        elif "atm" in text or "limit" in text:
+            return "atm"
+        return "banking"
+    return None
+
+
+def legacy_rank(prompt):
+    # Substring version of a *ranked* answer: every keyword list is scanned
+    # in full (no early exit), which is what classify() has to provide
+    text = prompt.lower()
+    scores = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        hits = sum(text.count(keyword) for keyword in keywords)
+        if hits:
+            scores[intent] = hits
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+# --- Corpus ---
+
+TEMPLATES = [
+    "what is my {kw} right now",
+    "can you tell me about the {kw} on this card",
+    "I think there is something wrong with the {kw} history of this month",
+    "hello, I want to know the {kw}",
+    "please explain the {kw} policy in detail, this is urgent",
+    "{kw}",
+]
+KEYWORDS = ["balance", "loan", "overdraft fee", "atm limit", "transaction", "interest rate",
+            "statement", "deposit", "weather", "football score", "recipe"]
+FILLER = ("the customer said that this thing happened yesterday while they were "
+          "travelling and now they want someone to look into it carefully").split()
+
+
+def make_corpus(n, seed=42):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        prompt = rng.choice(TEMPLATES).format(kw=rng.choice(KEYWORDS))
+        # Long prompts are where O(keywords x length) scans hurt most
+        padding = " ".join(rng.choice(FILLER) for _ in range(rng.randint(0, 60)))
+        corpus.append(f"{padding} {prompt}" if padding else prompt)
+    return corpus
+
+
+def timed(fn, corpus):
+    start = time.perf_counter()
+    result = fn(corpus)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    corpus = make_corpus(n)
+
+    legacy_seconds, legacy = timed(lambda c: [legacy_intent(p) for p in c], corpus)
+    rank_seconds, _ = timed(lambda c: [legacy_rank(p) for p in c], corpus)
+    compiled_seconds, ranked = timed(classify_many, corpus)
+
+    print(f"{n:,} prompts, avg {sum(len(p) for p in corpus) / n:.0f} chars")
+    print(f"  substring if/elif chain : {legacy_seconds:7.3f}s  ({n / legacy_seconds:12,.0f} prompts/s)")
+    print(f"  substring full ranking  : {rank_seconds:7.3f}s  ({n / rank_seconds:12,.0f} prompts/s)")
+    print(f"  compiled regex ranking  : {compiled_seconds:7.3f}s  ({n / compiled_seconds:12,.0f} prompts/s)")
+    print("  (the if/elif chain is fast mostly because 'hi' matches inside almost")
+    print("   every long prompt and returns 'greeting' before any other check)")
+
+    misfires = sum(1 for old, new in zip(legacy, ranked)
+                   if old == "greeting" and not any(intent == "greeting" for intent, _ in new))
+    disagree = sum(1 for old, new in zip(legacy, ranked) if old != (new[0][0] if new else None))
+    print(f"  false 'greeting' from substring matching: {misfires:,} of {n:,}")
+    print(f"  prompts classified differently: {disagree:,}")
+
+    for example in ["this is about my card", "show my history", "think about the weather"]:
+        print(f"  {example!r}: substring={legacy_intent(example)!r} compiled={top_intent(example)!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# bench_ledger.py
+# Benchmark: transfer postings per second on the professional schema.
+#
+# Compares one transaction per transfer (post_transfer in a loop) with
+# batched posting (post_transfers, BATCH transfers per transaction), then
+# checks that every account balance equals its last balance_after.
+#
+#   python bench_ledger.py [transfers] [batch_size]
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from create_professional_db import create_tables
+from ledger import InsufficientFunds, check_balances, post_transfer, post_transfers, to_minor
+
+ACCOUNTS = 1000
+
+
+def create_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    create_tables(conn)
+    conn.execute("INSERT INTO customers (full_name) VALUES ('Benchmark')")
+    conn.executemany(
+        "INSERT INTO accounts (customer_id, account_no, balance) VALUES (1, ?, ?)",
+        [(f"BENCH{i:06d}", to_minor("100000")) for i in range(ACCOUNTS)]
+    )
+    conn.commit()
+    return conn
+
+
+def make_transfers(n, seed=7):
+    rng = random.Random(seed)
+    transfers = []
+    for _ in range(n):
+        a, b = rng.sample(range(1, ACCOUNTS + 1), 2)
+        transfers.append({"from_account": a, "to_account": b, "amount": rng.randint(100, 500000)})
+    return transfers
+
+
+def report(name, conn, posted, seconds):
+    print(f"  {name}")
+    print(f"    {posted / seconds:10,.0f} transfers/s  ({2 * posted / seconds:10,.0f} ledger postings/s)")
+    mismatched = check_balances(conn)
+    print(f"    balances consistent with balance_after: {'yes' if not mismatched else f'NO ({len(mismatched)})'}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    transfers = make_transfers(n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{n:,} transfers between {ACCOUNTS:,} accounts")
+
+        # One transfer per transaction; fewer of them, it is much slower
+        single = transfers[:max(1, n // 10)]
+        conn = create_database(os.path.join(tmp, "single.db"))
+        start = time.perf_counter()
+        posted = 0
+        for t in single:
+            try:
+                posted += post_transfer(conn, t["from_account"], t["to_account"], t["amount"])
+            except InsufficientFunds:
+                pass
+        report(f"one transaction per transfer ({len(single):,} transfers)", conn, posted, time.perf_counter() - start)
+        conn.close()
+
+        conn = create_database(os.path.join(tmp, "batch.db"))
+        start = time.perf_counter()
+        posted = 0
+        for i in range(0, n, batch):
+            count, _ = post_transfers(conn, transfers[i:i + batch])
+            posted += count
+        report(f"batched, {batch:,} transfers per transaction", conn, posted, time.perf_counter() - start)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+# bulk_import.py
+# Streaming bulk import of core-banking exports into bank_professional.db.
+#
+#   python bulk_import.py transactions export.csv
+#   python bulk_import.py fund_transfers transfers.ndjson --drop-indexes
+#
+# The input is read one row at a time (CSV with a header row, or NDJSON),
+# validated, and inserted with executemany in CHUNK_ROWS chunks, each in its
+# own explicit transaction. Memory use is one chunk whatever the file size.
+# After every chunk the number of input rows consumed is committed to
+# import_checkpoints in the same transaction, so re-running the same command
+# after a crash skips exactly the rows that were already imported.
+#
+# Amounts in the export are rupees ("1250.50") and are stored as integer
+# paise (ledger.py). Imported rows are history: account balances are not
+# changed. Rows that fail validation are written to <input>.rejects.ndjson.
+#
+# The table's per-row insert triggers (spending aggregates, account versions)
+# are dropped for the import, like indexes with --drop-indexes, and recorded
+# in the checkpoint. At the end, one transaction does their work once for
+# every account with rows past the recorded id: aggregates.rebuild_accounts
+# and bump_account_versions. Then it recreates the triggers.
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from aggregates import rebuild_accounts
+from create_professional_db import DB, VERSIONED_TABLES, bump_account_versions, create_tables
+from ledger import LedgerError, to_minor
+
+# --- Configuration ---
+CHUNK_ROWS = 50_000
+CACHE_SIZE_KIB = 64 * 1024   # page cache while importing (PRAGMA cache_size is in KiB when negative)
+# Per-row insert triggers switched off while importing; restore_triggers() does their work afterwards
+IMPORT_TRIGGERS = {
+    "transactions": ["transactions_aggregate", "trg_transactions_insert_version"],
+    "fund_transfers": ["trg_fund_transfers_insert_version"],
+}
+
+
+class RowError(Exception):
+    pass
+
+
+# --- Readers (generators: one row at a time) ---
+
+def read_csv(path, skip):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for number, row in enumerate(reader, start=1):
+            if number > skip:
+                yield number, row
+
+
+def read_ndjson(path, skip):
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            # Skipped lines are not even parsed
+            if number <= skip or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, RowError(f"invalid JSON: {e}")
+
+
+def read_rows(path, fmt, skip):
+    return (read_ndjson if fmt == "ndjson" else read_csv)(path, skip)
+
+
+# --- Validation ---
+
+def _int(row, field):
+    try:
+        return int(row[field])
+    except (KeyError, TypeError, ValueError):
+        raise RowError(f"{field} must be an integer")
+
+
+def _amount(row, field, required=True):
+    value = row.get(field)
+    if value in (None, ""):
+        if required:
+            raise RowError(f"{field} is required")
+        return None
+    try:
+        minor = to_minor(value)
+    except LedgerError:
+        raise RowError(f"{field} is not an amount")
+    return minor
+
+
+def _timestamp(row, field):
+    value = row.get(field)
+    try:
+        return datetime.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise RowError(f"{field} must be an ISO date/time")
+
+
+def transaction_row(row, accounts):
+    account_id = _int(row, "account_id")
+    if account_id not in accounts:
+        raise RowError(f"unknown account {account_id}")
+    txn_type = str(row.get("txn_type", "")).lower()
+    if txn_type not in ("credit", "debit"):
+        raise RowError("txn_type must be credit or debit")
+    amount = _amount(row, "amount")
+    if amount <= 0:
+        raise RowError("amount must be positive")
+    return (account_id, txn_type, amount, _amount(row, "balance_after", required=False),
+            row.get("narration") or None, _timestamp(row, "created_at"))
+
+
+def transfer_row(row, accounts):
+    from_account, to_account = _int(row, "from_account"), _int(row, "to_account")
+    for account_id in (from_account, to_account):
+        if account_id not in accounts:
+            raise RowError(f"unknown account {account_id}")
+    if from_account == to_account:
+        raise RowError("from_account and to_account are the same")
+    amount = _amount(row, "amount")
+    if amount <= 0:
+        raise RowError("amount must be positive")
+    return (from_account, to_account, amount, _timestamp(row, "created_at"),
+            row.get("status") or "Completed", row.get("remark") or None)
+
+
+TABLES = {
+    "transactions": (
+        transaction_row,
+        "INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+    ),
+    "fund_transfers": (
+        transfer_row,
+        "INSERT INTO fund_transfers (from_account, to_account, amount, created_at, status, remark) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+    ),
+}
+
+
+# --- Checkpoints ---
+
+def create_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT PRIMARY KEY,       -- "<table>:<absolute input path>"
+            file_size INTEGER NOT NULL,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            dropped_indexes TEXT,          -- JSON [[name, CREATE INDEX ...], ...] to restore
+            dropped_triggers TEXT,         -- JSON [[name, CREATE TRIGGER ...], ...] to restore
+            id_before INTEGER,             -- largest row id before the triggers were dropped
+            finished INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    # Checkpoint tables written before triggers were dropped
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(import_checkpoints)")}
+    for column, kind in (("dropped_triggers", "TEXT"), ("id_before", "INTEGER")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE import_checkpoints ADD COLUMN {column} {kind}")
+    conn.commit()
+
+
+def load_checkpoint(conn, source, file_size, restart):
+    row = conn.execute(
+        "SELECT file_size, rows_done, inserted, rejected, dropped_indexes, finished, dropped_triggers, id_before "
+        "FROM import_checkpoints WHERE source = ?", (source,)
+    ).fetchone()
+    if row is None or restart:
+        if row is not None and row[4]:
+            # A restarted import must still restore indexes an earlier run dropped
+            restore_indexes(conn, json.loads(row[4]))
+        # Triggers an earlier run dropped stay off: the rows it imported are
+        # still past id_before and are caught up when this run finishes
+        dropped_triggers, id_before = (row[6], row[7]) if row is not None and row[6] else (None, None)
+        conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+        conn.execute(
+            "INSERT INTO import_checkpoints (source, file_size, dropped_triggers, id_before, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (source, file_size, dropped_triggers, id_before, datetime.now().isoformat())
+        )
+        conn.commit()
+        return {"rows_done": 0, "inserted": 0, "rejected": 0, "dropped_indexes": [],
+                "dropped_triggers": json.loads(dropped_triggers) if dropped_triggers else [],
+                "id_before": id_before, "finished": False}
+    if row[0] != file_size:
+        raise SystemExit(f"{source} changed size since the last run; use --restart to import it again.")
+    return {"rows_done": row[1], "inserted": row[2], "rejected": row[3],
+            "dropped_indexes": json.loads(row[4]) if row[4] else [], "finished": bool(row[5]),
+            "dropped_triggers": json.loads(row[6]) if row[6] else [], "id_before": row[7]}
+
+
+def save_checkpoint(conn, source, state):
+    # Runs inside the chunk's transaction: the rows and the checkpoint commit together
+    conn.execute(
+        "UPDATE import_checkpoints SET rows_done = ?, inserted = ?, rejected = ?, dropped_indexes = ?, "
+        "dropped_triggers = ?, id_before = ?, finished = ?, updated_at = ? WHERE source = ?",
+        (state["rows_done"], state["inserted"], state["rejected"], json.dumps(state["dropped_indexes"]),
+         json.dumps(state["dropped_triggers"]), state["id_before"], int(state["finished"]),
+         datetime.now().isoformat(), source)
+    )
+
+
+# --- Indexes ---
+
+def drop_indexes(conn, table):
+    # Returns [name, CREATE INDEX statement] for each dropped index
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return [[name, sql] for name, sql in rows]
+
+
+def restore_indexes(conn, indexes):
+    for name, sql in indexes:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+        ).fetchone()
+        if not exists:
+            conn.execute(sql)
+    conn.commit()
+
+
+# --- Triggers ---
+
+def drop_triggers(conn, names):
+    # Returns [name, CREATE TRIGGER statement] for each of names that existed
+    rows = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(names))})",
+        names
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    return [[name, sql] for name, sql in rows]
+
+
+def restore_triggers(conn, table, triggers, id_before):
+    # Does the dropped triggers' work for the rows after id_before, then
+    # recreates them; runs inside the caller's transaction
+    names = {name for name, _ in triggers}
+    account_ids = set()
+    for column in VERSIONED_TABLES[table]:
+        account_ids.update(r[0] for r in conn.execute(
+            f"SELECT DISTINCT {column} FROM {table} WHERE rowid > ?", (id_before or 0,)
+        ))
+    if "transactions_aggregate" in names:
+        rebuild_accounts(conn, account_ids)
+    if f"trg_{table}_insert_version" in names:
+        bump_account_versions(conn, sorted(account_ids))
+    for name, sql in triggers:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+        ).fetchone()
+        if not exists:
+            conn.execute(sql)
+    return len(account_ids)
+
+
+# --- Import ---
+
+def import_file(conn, table, path, fmt=None, chunk_rows=CHUNK_ROWS, drop=False, restart=False, log=print):
+    validate, insert_sql = TABLES[table]
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    source = f"{table}:{os.path.abspath(path)}"
+
+    create_checkpoint_table(conn)
+    state = load_checkpoint(conn, source, os.path.getsize(path), restart)
+    if state["finished"]:
+        log(f"{path} was already imported ({state['inserted']:,} rows); use --restart to import it again.")
+        return state
+    if state["rows_done"]:
+        log(f"Resuming {path} after row {state['rows_done']:,}.")
+
+    if drop and not state["dropped_indexes"]:
+        # One transaction: an index is never gone without the checkpoint
+        # holding the statement that rebuilds it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state["dropped_indexes"] = drop_indexes(conn, table)
+            save_checkpoint(conn, source, state)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            state["dropped_indexes"] = []
+            raise
+        log(f"Dropped {len(state['dropped_indexes'])} indexes on {table}; they are rebuilt at the end.")
+    elif state["dropped_indexes"]:
+        # Resuming a run that dropped them: create_tables() may have put
+        # them back, and they stay off until the import finishes
+        for name, _ in state["dropped_indexes"]:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    if not state["dropped_triggers"]:
+        # Same transaction rule as the indexes; id_before marks the first imported row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state["id_before"] = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+            state["dropped_triggers"] = drop_triggers(conn, IMPORT_TRIGGERS[table])
+            save_checkpoint(conn, source, state)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            state["dropped_triggers"], state["id_before"] = [], None
+            raise
+        log(f"Dropped {len(state['dropped_triggers'])} triggers on {table}; their work is done once at the end.")
+    else:
+        for name, _ in state["dropped_triggers"]:
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+    # Account ids are checked against this set, so per-row foreign key checks can be skipped
+    accounts = {r[0] for r in conn.execute("SELECT account_id FROM accounts")}
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+
+    start = time.perf_counter()
+    imported_now = 0
+    with open(path + ".rejects.ndjson", "a", encoding="utf-8") as rejects:
+        chunk = []
+        last_row = state["rows_done"]
+
+        def flush():
+            nonlocal imported_now
+            # Rejects reach the file before the checkpoint says their rows are done
+            rejects.flush()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(insert_sql, chunk)
+                state["inserted"] += len(chunk)
+                state["rows_done"] = last_row
+                save_checkpoint(conn, source, state)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            imported_now += len(chunk)
+            chunk.clear()
+            rate = imported_now / max(time.perf_counter() - start, 1e-9)
+            log(f"  {state['rows_done']:,} rows read, {state['inserted']:,} inserted, "
+                f"{state['rejected']:,} rejected ({rate:,.0f} rows/s)")
+
+        for number, raw in read_rows(path, fmt, state["rows_done"]):
+            last_row = number
+            try:
+                if isinstance(raw, RowError):
+                    raise raw
+                chunk.append(validate(raw, accounts))
+            except RowError as e:
+                state["rejected"] += 1
+                rejects.write(json.dumps({"row": number, "error": str(e), "data": raw if isinstance(raw, dict) else None}) + "\n")
+            if len(chunk) >= chunk_rows:
+                flush()
+        if chunk:
+            flush()
+
+    if state["dropped_indexes"]:
+        log(f"Rebuilding {len(state['dropped_indexes'])} indexes on {table}...")
+        restore_indexes(conn, state["dropped_indexes"])
+        state["dropped_indexes"] = []
+    conn.execute("PRAGMA foreign_keys = ON")
+    # Rows rejected after the last chunk count as done too
+    state["rows_done"] = last_row
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if state["dropped_triggers"]:
+            log(f"Updating aggregates and account versions, restoring {len(state['dropped_triggers'])} triggers...")
+            accounts = restore_triggers(conn, table, state["dropped_triggers"], state["id_before"])
+            log(f"  {accounts:,} accounts updated.")
+            state["dropped_triggers"] = []
+        state["finished"] = True
+        save_checkpoint(conn, source, state)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        state["finished"] = False
+        raise
+    log(f"Imported {state['inserted']:,} rows into {table} ({state['rejected']:,} rejected) "
+        f"in {time.perf_counter() - start:.1f}s.")
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import transactions or fund transfers into bank_professional.db")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    parser.add_argument("--db", default=DB)
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--drop-indexes", action="store_true", help="drop the table's indexes during the import")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start from the first row")
+    args = parser.parse_args(argv)
+
+    # isolation_level=None: transactions are opened explicitly per chunk
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    create_tables(conn)
+    try:
+        import_file(conn, args.table, args.path, args.format, args.chunk, args.drop_indexes, args.restart)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,226 @@
+# chat_service.py
+# Chat pipeline shared by the Streamlit app (main.py) and the API (api.py).
+#
+# Nothing here touches st.session_state: callers pass the conversation and
+# its rolling summary in, so the same code runs inside a Streamlit rerun or
+# behind any number of uvicorn workers.
+#
+# Every model call goes through the per-process scheduler (llm_scheduler.py)
+# under the asking user's id; when it is saturated the answer is its busy
+# message, which is never cached.
+
+import asyncio
+import time
+
+import requests
+
+from ollama_client import OllamaError
+from llm_scheduler import LLMBusy, async_scheduled_client, scheduled_client
+from context_window import build_context, llm_summarizer
+from response_cache import get_response_cache, cache_key, knowledge_version
+from faq import get_faq_index
+from retrieval import get_retrieval_index
+from router import UNLOCK_HINT, route
+
+# --- Configuration ---
+OLLAMA_HOST = 'http://localhost:11434'
+OLLAMA_MODEL = 'llama3' # Change this to your model name
+
+# Banking knowledge is retrieved per question from the policy documents in
+# data/policies (BM25 + vector index, see retrieval.py), so the prompt only
+# carries the chunks relevant to the question.
+RETRIEVAL_TOP_K = 3
+# Part of every cache key: editing the policy corpus invalidates cached answers
+KNOWLEDGE_VERSION = knowledge_version(get_retrieval_index().version)
+
+
+# The same bytes on every turn, so the model server can reuse the prefilled
+# prefix (warmup.py prefills it at startup). Anything that changes per
+# question - the retrieved policy passages - goes in the user turn instead.
+SYSTEM_PROMPT = (
+    "You are a helpful and secure bank chatbot. "
+    "Each question comes with passages from the bank's policy documents. "
+    "Answer the user's question based on those passages, your banking knowledge and previous conversation. "
+    "If the question is completely unrelated to banking, respond strictly with: 'I can only assist with bank-related inquiries, such as transactions, accounts, and loan information.' "
+)
+
+
+def build_chat_messages(user_prompt, chat_history):
+    # This acts as your RAG/Guardrail logic
+    banking_knowledge = get_retrieval_index().context_for(user_prompt, RETRIEVAL_TOP_K)
+
+    # Simple history formatting (Ollama expects a list of messages)
+    history_messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        # Add past messages
+        *[{"role": msg['role'], "content": msg['content']} for msg in chat_history],
+        {"role": "user", "content": f"Policy passages:\n{banking_knowledge}\n\nQuestion: {user_prompt}"}
+    ]
+    return history_messages
+
+
+def direct_answer(user_prompt, conn, user_id, spending_source=None, unlock_hint=UNLOCK_HINT):
+    # Account questions are answered from the database and routine FAQ
+    # questions from the precompiled index; neither needs the LLM.
+    # spending_source and unlock_hint are passed to router.route for
+    # transaction and spending questions.
+    # Returns (answer, "routed" | "faq") or (None, None).
+    routed_answer = route(user_prompt, conn, user_id, spending_source, unlock_hint)
+    if routed_answer is not None:
+        return routed_answer, "routed"
+    faq_answer = get_faq_index().answer(user_prompt)
+    if faq_answer is not None:
+        return faq_answer, "faq"
+    return None, None
+
+
+def context_messages(history, summary_state, user=None):
+    # Last few turns verbatim + a cached rolling summary of everything older,
+    # so prompt size stays bounded however long the chat gets.
+    # Returns (messages, updated summary_state).
+    summarizer = llm_summarizer(scheduled_client(user, OLLAMA_HOST), OLLAMA_MODEL)
+    return build_context(history, summary_state, summarizer)
+
+
+# --- Blocking (Streamlit) ---
+
+def generate_ollama_response(user_prompt, chat_history, user=None):
+    messages = build_chat_messages(user_prompt, chat_history)
+    # Pooled keep-alive client with timeouts and bounded retries, behind the scheduler
+    generate = lambda: scheduled_client(user, OLLAMA_HOST).chat(OLLAMA_MODEL, messages)
+    try:
+        # Follow-up questions depend on the conversation, so only
+        # standalone questions are answered from the cache
+        if chat_history:
+            return generate()
+        key = cache_key(user_prompt, OLLAMA_MODEL, KNOWLEDGE_VERSION)
+        return get_response_cache().get_or_generate(key, generate)
+    except LLMBusy as e:
+        return str(e)
+    except (requests.exceptions.RequestException, OllamaError) as e:
+        return f"Sorry, the AI service is unavailable. Error: {e}"
+
+
+def stream_ollama_response(user_prompt, chat_history, timings=None, user=None):
+    # Yields the answer token by token from Ollama's NDJSON stream.
+    # If a `timings` dict is passed, it is filled with time-to-first-token
+    # and total time (seconds) so the UI can record latency per turn;
+    # timings["busy"] is set when the scheduler turned the call away.
+    messages = build_chat_messages(user_prompt, chat_history)
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+
+    try:
+        for token in scheduled_client(user, OLLAMA_HOST).chat_stream(OLLAMA_MODEL, messages):
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield token
+    except LLMBusy as e:
+        timings["error"] = str(e)
+        timings["busy"] = True
+        yield str(e)
+    except OllamaError as e:
+        timings["error"] = str(e)
+        yield f"Sorry, the AI service returned an error: {e}"
+    except requests.exceptions.RequestException as e:
+        timings["error"] = str(e)
+        yield f"Sorry, the AI service is unavailable. Error: {e}"
+    finally:
+        timings.setdefault("ttft", time.perf_counter() - start)
+        timings["total"] = time.perf_counter() - start
+
+
+def stream_cached_response(user_prompt, chat_history, timings, user=None):
+    # Streams from the response cache when possible; identical questions that
+    # are already being generated wait for that answer instead of a new one
+    if chat_history:
+        yield from stream_ollama_response(user_prompt, chat_history, timings, user)
+        return
+
+    cache = get_response_cache()
+    key = cache_key(user_prompt, OLLAMA_MODEL, KNOWLEDGE_VERSION)
+    start = time.perf_counter()
+    cached, leader = cache.claim(key)
+    if cached is not None:
+        timings["ttft"] = timings["total"] = time.perf_counter() - start
+        timings["cache_hit"] = True
+        yield cached
+        return
+
+    parts = []
+    complete = False
+    try:
+        for token in stream_ollama_response(user_prompt, chat_history, timings, user):
+            parts.append(token)
+            yield token
+        complete = "error" not in timings
+    finally:
+        # Never cache errors or answers cut off by a rerun
+        response = "".join(parts) if complete else None
+        if leader:
+            cache.release(key, response, timings.get("total", 0.0))
+        elif response:
+            cache.put(key, response, timings.get("total", 0.0))
+
+
+# --- Async (API) ---
+
+async def astream_ollama_response(user_prompt, chat_history, timings, user=None):
+    # Async twin of stream_ollama_response; retrieval is CPU-bound and the
+    # prompt is built in a worker thread to keep the event loop free
+    messages = await asyncio.to_thread(build_chat_messages, user_prompt, chat_history)
+    start = time.perf_counter()
+
+    try:
+        async for token in async_scheduled_client(user, OLLAMA_HOST).chat_stream(OLLAMA_MODEL, messages):
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield token
+    except LLMBusy as e:
+        timings["error"] = str(e)
+        timings["busy"] = True
+        yield str(e)
+    except OllamaError as e:
+        timings["error"] = str(e)
+        yield f"Sorry, the AI service returned an error: {e}"
+    except Exception as e:
+        # httpx transport errors after retries are exhausted
+        timings["error"] = str(e)
+        yield f"Sorry, the AI service is unavailable. Error: {e}"
+    finally:
+        timings.setdefault("ttft", time.perf_counter() - start)
+        timings["total"] = time.perf_counter() - start
+
+
+async def astream_cached_response(user_prompt, chat_history, timings, user=None):
+    if chat_history:
+        async for token in astream_ollama_response(user_prompt, chat_history, timings, user):
+            yield token
+        return
+
+    cache = get_response_cache()
+    key = cache_key(user_prompt, OLLAMA_MODEL, KNOWLEDGE_VERSION)
+    start = time.perf_counter()
+    # claim() may block while another request generates the same answer
+    cached, leader = await asyncio.to_thread(cache.claim, key)
+    if cached is not None:
+        timings["ttft"] = timings["total"] = time.perf_counter() - start
+        timings["cache_hit"] = True
+        yield cached
+        return
+
+    parts = []
+    complete = False
+    try:
+        async for token in astream_ollama_response(user_prompt, chat_history, timings, user):
+            parts.append(token)
+            yield token
+        complete = "error" not in timings
+    finally:
+        # Never cache errors or answers cut off by a client disconnect
+        response = "".join(parts) if complete else None
+        if leader:
+            cache.release(key, response, timings.get("total", 0.0))
+        elif response:
+            cache.put(key, response, timings.get("total", 0.0))
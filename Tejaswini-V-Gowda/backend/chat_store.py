@@ -0,0 +1,142 @@
+# chat_store.py
+# Chat history storage shared by main.py and bank_main.py.
+#
+# chat_history holds one row of metadata per conversation (topic, timestamp,
+# rolling summary); the messages themselves are rows in chat_messages keyed
+# by (session_id, seq). Saving a turn inserts only the new messages, instead
+# of re-serializing and rewriting the whole conversation.
+
+from db_setup import (
+    create_chat_history_index,
+    create_chat_messages_table,
+    migrate_chat_history,
+    migrate_chat_session_blob,
+)
+
+_schema_ready = set()
+
+
+def ensure_schema(conn):
+    # Cheap IF NOT EXISTS checks, done once per database per process
+    db = conn.execute("PRAGMA database_list").fetchone()[2]
+    if db in _schema_ready:
+        return
+    cursor = conn.cursor()
+    migrate_chat_history(cursor)
+    create_chat_history_index(cursor)
+    create_chat_messages_table(cursor)
+    conn.commit()
+    _schema_ready.add(db)
+
+
+def create_session(conn, user_id, topic, summary_state=None):
+    summary_state = summary_state or {"summary": "", "upto": 0}
+    cursor = conn.execute(
+        "INSERT INTO chat_history (user_id, topic, summary, summary_upto) VALUES (?, ?, ?, ?)",
+        (user_id, topic, summary_state["summary"], summary_state["upto"])
+    )
+    return cursor.lastrowid
+
+
+def append_messages(conn, session_id, messages, start_seq):
+    # Inserts messages[start_seq:]; returns the new persisted count
+    new = messages[start_seq:]
+    conn.executemany(
+        "INSERT INTO chat_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+        [(session_id, start_seq + i, m['role'], m['content']) for i, m in enumerate(new)]
+    )
+    return start_seq + len(new)
+
+
+def append_turn(conn, session_id, messages):
+    # Appends messages after whatever the session already holds; returns the new count.
+    # Run it inside BEGIN IMMEDIATE: the next seq is read under the write lock, so
+    # two turns saved at once on the same session cannot both take it.
+    start_seq = conn.execute(
+        "SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_messages WHERE session_id = ?", (session_id,)
+    ).fetchone()[0]
+    conn.executemany(
+        "INSERT INTO chat_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+        [(session_id, start_seq + i, m['role'], m['content']) for i, m in enumerate(messages)]
+    )
+    return start_seq + len(messages)
+
+
+def touch_session(conn, session_id, topic, summary_state=None):
+    # Constant-size metadata update; never rewrites the messages
+    summary_state = summary_state or {"summary": "", "upto": 0}
+    conn.execute(
+        "UPDATE chat_history SET topic = ?, summary = ?, summary_upto = ?, timestamp = CURRENT_TIMESTAMP WHERE id = ?",
+        (topic, summary_state["summary"], summary_state["upto"], session_id)
+    )
+
+
+def get_session(conn, session_id):
+    # Metadata only; None if the session does not exist
+    row = conn.execute(
+        "SELECT id, user_id, topic, timestamp FROM chat_history WHERE id = ?", (session_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {'id': row[0], 'user_id': row[1], 'topic': row[2], 'timestamp': row[3]}
+
+
+def rename_session(conn, session_id, topic):
+    conn.execute("UPDATE chat_history SET topic = ? WHERE id = ?", (topic, session_id))
+
+
+def load_messages(conn, session_id):
+    rows = conn.execute(
+        "SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY seq",
+        (session_id,)
+    ).fetchall()
+    if rows:
+        return [{"role": role, "content": content} for role, content in rows]
+
+    # Conversation saved before chat_messages existed: migrate it on first open
+    row = conn.execute("SELECT messages FROM chat_history WHERE id = ?", (session_id,)).fetchone()
+    if row is None or row[0] is None:
+        return []
+    messages = migrate_chat_session_blob(conn.cursor(), session_id, row[0])
+    conn.commit()
+    return messages
+
+
+def list_sessions(conn, user_id, before=None, limit=20):
+    # One page of session metadata (no message bodies), newest first.
+    # Keyset pagination: `before` is the (timestamp, id) of the last row of
+    # the previous page, so every page is a short range scan of
+    # idx_chat_history_user_ts however many sessions the user has.
+    # Returns (sessions, cursor for the next page or None).
+    if before is None:
+        rows = conn.execute(
+            "SELECT id, topic, timestamp FROM chat_history WHERE user_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, limit + 1)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT id, topic, timestamp FROM chat_history WHERE user_id = ? "
+            "AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, before[0], before[1], limit + 1)
+        ).fetchall()
+
+    sessions = [{'id': r[0], 'topic': r[1], 'timestamp': r[2]} for r in rows[:limit]]
+    cursor = (rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+    return sessions, cursor
+
+
+def list_sessions_pages(conn, user_id, pages, limit=20):
+    # The first `pages` pages, walked with keyset cursors; returns (sessions, has_more)
+    sessions, cursor = [], None
+    for _ in range(pages):
+        page, cursor = list_sessions(conn, user_id, cursor, limit)
+        sessions.extend(page)
+        if cursor is None:
+            break
+    return sessions, cursor is not None
+
+
+def delete_session(conn, session_id):
+    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM chat_history WHERE id = ?", (session_id,))
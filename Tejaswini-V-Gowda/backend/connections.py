@@ -0,0 +1,114 @@
+# connections.py
+# Long-lived SQLite connections shared by main.py and bank_main.py.
+#
+# Opening a connection per query costs a file open, schema parse and a cold
+# statement cache every time. Here each connection is opened once, tuned
+# (WAL journal, synchronous=NORMAL, busy timeout, bigger statement cache) and
+# reused. A thread gets a connection from get_connection() and owns it until
+# it calls conn.close(), which hands it back to a small idle pool instead of
+# closing it (Streamlit runs every rerun on a fresh thread, so keeping
+# connections only in thread-locals would reopen them on every rerun).
+#
+# WAL lets the dashboard keep reading while a chat save is writing; the
+# read-only path (readonly=True) opens the file with mode=ro so dashboard
+# queries can never take the write lock.
+
+import atexit
+import sqlite3
+import threading
+from urllib.parse import quote
+
+# --- Configuration ---
+BUSY_TIMEOUT_SECONDS = 5.0   # wait this long for a write lock before "database is locked"
+CACHED_STATEMENTS = 256      # prepared statements kept per connection (default 128)
+MAX_IDLE_CONNECTIONS = 8     # per database and mode; extra connections are really closed
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",   # safe with WAL; fsync at checkpoints only
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    # close() returns the connection to its pool; discard() really closes it
+
+    def close(self):
+        if self.in_transaction:
+            # Never hand out a connection holding a half-finished write
+            self.rollback()
+        if not _release(self):
+            self.discard()
+
+    def discard(self):
+        super().close()
+
+
+_idle = {}          # (path, readonly) -> [PooledConnection, ...]
+_wal_ready = set()
+_lock = threading.Lock()
+
+
+def _enable_wal(path):
+    # journal_mode=WAL is stored in the database file, so this runs once
+    # per path and needs a writable connection
+    if path in _wal_ready:
+        return
+    with _lock:
+        if path in _wal_ready:
+            return
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        _wal_ready.add(path)
+
+
+def _open(path, readonly):
+    if readonly:
+        target, uri = f"file:{quote(path)}?mode=ro", True
+    else:
+        target, uri = path, False
+    conn = sqlite3.connect(
+        target,
+        uri=uri,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        cached_statements=CACHED_STATEMENTS,
+        # Pooled connections move between threads, but only one uses it at a time
+        check_same_thread=False,
+        factory=PooledConnection,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn._pool_key = (path, readonly)
+    return conn
+
+
+def _release(conn):
+    with _lock:
+        idle = _idle.setdefault(conn._pool_key, [])
+        if len(idle) >= MAX_IDLE_CONNECTIONS:
+            return False
+        idle.append(conn)
+        return True
+
+
+def get_connection(path, readonly=False):
+    # A tuned connection for the calling thread; call conn.close() when done
+    _enable_wal(path)
+    with _lock:
+        idle = _idle.get((path, readonly))
+        if idle:
+            return idle.pop()
+    return _open(path, readonly)
+
+
+def close_all():
+    with _lock:
+        pools = list(_idle.values())
+        _idle.clear()
+    for idle in pools:
+        for conn in idle:
+            conn.discard()
+
+
+atexit.register(close_all)
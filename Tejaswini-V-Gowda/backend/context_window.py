@@ -0,0 +1,123 @@
+# context_window.py
+# Token-budgeted chat context for the Ollama prompt.
+#
+# The last RECENT_TURNS exchanges are sent verbatim; everything older is folded
+# into one rolling summary. The summary state is {"summary": str, "upto": int},
+# where "upto" is how many leading messages the summary already covers. It only
+# changes when messages fall out of the verbatim window, so the summary is
+# computed once per eviction (not every turn) and is stored on the
+# chat_history row next to the conversation it belongs to.
+
+import math
+import re
+
+# --- Configuration ---
+MAX_HISTORY_TOKENS = 1200   # verbatim history budget (system prompt and new question excluded)
+RECENT_TURNS = 4            # user/assistant exchanges kept word for word
+SUMMARY_MAX_TOKENS = 200
+MESSAGE_OVERHEAD_TOKENS = 4 # role markers / separators added by the chat template
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    # No tokenizer ships with Ollama's HTTP API; word pieces * 4/3 tracks
+    # BPE counts for English closely enough for budgeting.
+    return math.ceil(len(_TOKEN_RE.findall(text or "")) * 4 / 3)
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens, keep_end=False):
+    words = text.split()
+    while words and count_tokens(" ".join(words)) > max_tokens:
+        cut = max(1, len(words) // 10)
+        words = words[cut:] if keep_end else words[:-cut]
+    return " ".join(words)
+
+
+def new_summary_state():
+    return {"summary": "", "upto": 0}
+
+
+# --- Summarizers ---
+
+def extractive_summary(previous_summary, messages):
+    # Cheap fallback: keep what the customer asked, drop the long answers
+    asked = [m["content"].strip().split("\n")[0] for m in messages if m["role"] == "user"]
+    parts = [previous_summary] if previous_summary else []
+    if asked:
+        parts.append("Customer asked about: " + "; ".join(asked) + ".")
+    # Oldest questions are dropped first once the summary hits its budget
+    return truncate_to_tokens(" ".join(parts), SUMMARY_MAX_TOKENS, keep_end=True)
+
+
+def llm_summarizer(client, model):
+    # Returns a summarize(previous_summary, messages) function backed by the model
+    def summarize(previous_summary, messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            "Update the summary of a banking support chat. Keep facts the customer "
+            "stated, amounts, account or loan details and open requests. "
+            f"Answer in at most {SUMMARY_MAX_TOKENS} words.\n\n"
+            f"Current summary: {previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        try:
+            text = client.chat(
+                model,
+                [{"role": "user", "content": prompt}],
+                options={"temperature": 0, "num_predict": SUMMARY_MAX_TOKENS * 2},
+            )
+        except Exception:
+            return extractive_summary(previous_summary, messages)
+        return truncate_to_tokens(text.strip(), SUMMARY_MAX_TOKENS)
+    return summarize
+
+
+# --- Window construction ---
+
+def build_context(history, state, summarize=extractive_summary):
+    # history: messages before the new question. Returns (messages, state);
+    # state is a new dict when the summary was updated, else the same object.
+    state = state or new_summary_state()
+    upto = min(state.get("upto", 0), len(history))
+
+    start = max(upto, len(history) - 2 * RECENT_TURNS)
+    window_tokens = sum(message_tokens(m) for m in history[start:])
+    while start < len(history) and window_tokens > MAX_HISTORY_TOKENS:
+        window_tokens -= message_tokens(history[start])
+        start += 1
+
+    if start > upto:
+        evicted = [{"role": m["role"], "content": m["content"]} for m in history[upto:start]]
+        state = {"summary": summarize(state.get("summary", ""), evicted), "upto": start}
+
+    messages = []
+    if state.get("summary"):
+        messages.append({
+            "role": "system",
+            "content": "Summary of the earlier conversation: " + state["summary"],
+        })
+    messages.extend({"role": m["role"], "content": m["content"]} for m in history[start:])
+    return messages, state
+
+
+# --- Persistence (chat_history.summary / chat_history.summary_upto) ---
+
+def load_summary_state(conn, session_id):
+    row = conn.execute(
+        "SELECT summary, summary_upto FROM chat_history WHERE id = ?", (session_id,)
+    ).fetchone()
+    if not row or not row[0]:
+        return new_summary_state()
+    return {"summary": row[0], "upto": row[1] or 0}
+
+
+def save_summary_state(conn, session_id, state):
+    conn.execute(
+        "UPDATE chat_history SET summary = ?, summary_upto = ? WHERE id = ?",
+        (state.get("summary", ""), state.get("upto", 0), session_id),
+    )
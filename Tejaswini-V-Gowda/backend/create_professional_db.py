@@ -1,8 +1,20 @@
 # create_professional_db.py
 import sqlite3
-from datetime import datetime
+
+from aggregates import create_aggregate_tables, rebuild as rebuild_aggregates
+from ledger import post_entry, post_transfer, to_minor
 
 DB = "bank_professional.db"
+# user_version: 1 = money columns hold integer paise (ledger.py),
+# 2 = spending aggregates (aggregates.py) are maintained
+SCHEMA_VERSION = 2
+MONEY_COLUMNS = {
+    "accounts": ("balance",),
+    "account_types": ("min_balance",),
+    "loans": ("loan_amount", "remaining_amount"),
+    "transactions": ("amount", "balance_after"),
+    "fund_transfers": ("amount",),
+}
 
 def connect():
     conn = sqlite3.connect(DB)
@@ -39,7 +51,7 @@ def create_tables(conn):
     CREATE TABLE IF NOT EXISTS account_types (
         type_id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
-        min_balance REAL DEFAULT 0,
+        min_balance INTEGER DEFAULT 0, -- paise
         interest_rate REAL DEFAULT 0
     );
     """)
@@ -52,7 +64,7 @@ def create_tables(conn):
         branch_id INTEGER,
         account_type_id INTEGER,
         account_no TEXT UNIQUE,
-        balance REAL DEFAULT 0,
+        balance INTEGER DEFAULT 0, -- paise
         opened_on TEXT DEFAULT CURRENT_TIMESTAMP,
         status TEXT DEFAULT 'Active',
         pin TEXT, -- simple PIN for demo only (hash in production)
@@ -81,10 +93,10 @@ def create_tables(conn):
     CREATE TABLE IF NOT EXISTS loans (
         loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
         account_id INTEGER NOT NULL,
-        loan_amount REAL NOT NULL,
+        loan_amount INTEGER NOT NULL, -- paise
         interest_rate REAL,
         term_months INTEGER,
-        remaining_amount REAL,
+        remaining_amount INTEGER, -- paise
         status TEXT DEFAULT 'Active',
         issued_on TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(account_id) REFERENCES accounts(account_id)
@@ -97,8 +109,8 @@ def create_tables(conn):
         txn_id INTEGER PRIMARY KEY AUTOINCREMENT,
         account_id INTEGER NOT NULL,
         txn_type TEXT NOT NULL, -- 'credit' or 'debit'
-        amount REAL NOT NULL,
-        balance_after REAL,
+        amount INTEGER NOT NULL, -- paise
+        balance_after INTEGER, -- paise
         narration TEXT,
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY(account_id) REFERENCES accounts(account_id)
@@ -111,7 +123,7 @@ def create_tables(conn):
         transfer_id INTEGER PRIMARY KEY AUTOINCREMENT,
         from_account INTEGER NOT NULL,
         to_account INTEGER NOT NULL,
-        amount REAL NOT NULL,
+        amount INTEGER NOT NULL, -- paise
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
         status TEXT DEFAULT 'Completed',
         remark TEXT,
@@ -122,8 +134,85 @@ def create_tables(conn):
 
     # Indexes for performance
     cur.execute("CREATE INDEX IF NOT EXISTS idx_accounts_customer ON accounts(customer_id);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_txn_account ON transactions(account_id);")
+    # History pages are keyset scans of (account_id, created_at, txn_id)
+    # (transaction_history.py); it also covers lookups by account_id alone
+    cur.execute("DROP INDEX IF EXISTS idx_txn_account;")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_txn_account_time ON transactions(account_id, created_at, txn_id);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_loans_account ON loans(account_id);")
+
+    # Daily / monthly / category totals, kept current by a trigger on transactions
+    create_aggregate_tables(cur)
+    # Per-account change counter for the summary cache (account_cache.py)
+    create_account_versions(cur)
+    conn.commit()
+    migrate_schema(conn)
+
+# Writes to these tables change an account's cached summary; fund_transfers
+# rows name two accounts
+VERSIONED_TABLES = {
+    "accounts": ("account_id",),
+    "transactions": ("account_id",),
+    "loans": ("account_id",),
+    "fund_transfers": ("from_account", "to_account"),
+}
+
+def create_account_versions(cursor):
+    # One row per account with its customer; seq comes from a global counter,
+    # so a reader asks "which accounts changed since seq N" with one range scan
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS account_versions (
+        account_id INTEGER PRIMARY KEY,
+        customer_id INTEGER,
+        seq INTEGER NOT NULL
+    );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_versions_seq ON account_versions (seq);")
+    bump = """
+        INSERT INTO account_versions (account_id, customer_id, seq)
+        VALUES ({account}, (SELECT customer_id FROM accounts WHERE account_id = {account}),
+                (SELECT COALESCE(MAX(seq), 0) + 1 FROM account_versions))
+        ON CONFLICT (account_id) DO UPDATE SET customer_id = excluded.customer_id, seq = excluded.seq;
+    """
+    for table, columns in VERSIONED_TABLES.items():
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            body = "".join(bump.format(account=f"{row}.{column}") for column in columns)
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version "
+                f"AFTER {event} ON {table} BEGIN {body} END"
+            )
+
+def drop_version_triggers(cursor, tables=VERSIONED_TABLES):
+    # For bulk loads; they bump the accounts they touched and recreate the triggers afterwards
+    for table in tables:
+        for event in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_version")
+
+def bump_account_versions(conn, account_ids):
+    # What the triggers would have done for each of account_ids
+    conn.executemany("""
+        INSERT INTO account_versions (account_id, customer_id, seq)
+        VALUES (?, (SELECT customer_id FROM accounts WHERE account_id = ?),
+                (SELECT COALESCE(MAX(seq), 0) + 1 FROM account_versions))
+        ON CONFLICT (account_id) DO UPDATE SET customer_id = excluded.customer_id, seq = excluded.seq
+    """, [(account_id, account_id) for account_id in account_ids])
+
+def migrate_schema(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    has_rows = conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] > 0
+    if has_rows and version == 0:
+        # Databases created before the ledger stored rupees as REAL
+        for table, columns in MONEY_COLUMNS.items():
+            assignments = ", ".join(f"{c} = CAST(ROUND({c} * 100) AS INTEGER)" for c in columns)
+            conn.execute(f"UPDATE {table} SET {assignments}")
+        conn.commit()
+        print("Converted money columns to integer paise.")
+    if has_rows and version < 2:
+        # Transactions posted before the aggregates existed
+        rebuild_aggregates(conn)
+        print("Built spending aggregates.")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
 
 def seed_demo(conn):
@@ -142,10 +231,10 @@ def seed_demo(conn):
 
     # 2) Account types
     cur.execute("INSERT INTO account_types (name, min_balance, interest_rate) VALUES (?, ?, ?)",
-                ("Savings", 1000.0, 3.5))
+                ("Savings", to_minor("1000"), 3.5))
     savings_type = cur.lastrowid
     cur.execute("INSERT INTO account_types (name, min_balance, interest_rate) VALUES (?, ?, ?)",
-                ("Current", 0.0, 0.0))
+                ("Current", 0, 0.0))
     current_type = cur.lastrowid
 
     # 3) Customers
@@ -157,14 +246,14 @@ def seed_demo(conn):
                 ("Arjun K", "arjun@example.com", "9888888888", "1994-07-20"))
     cust2 = cur.lastrowid
 
-    # 4) Accounts for customers
+    # 4) Accounts for customers, with their opening balances
     # Account numbers are simple demo strings — in real systems use secure generation
     cur.execute("INSERT INTO accounts (customer_id, branch_id, account_type_id, account_no, balance, pin) VALUES (?, ?, ?, ?, ?, ?)",
-                (cust1, branch_id, savings_type, "INFY0001001", 75000.0, "4321"))
+                (cust1, branch_id, savings_type, "INFY0001001", to_minor("25000"), "4321"))
     acc1 = cur.lastrowid
 
     cur.execute("INSERT INTO accounts (customer_id, branch_id, account_type_id, account_no, balance, pin) VALUES (?, ?, ?, ?, ?, ?)",
-                (cust2, branch_id, savings_type, "INFY0001002", 25000.0, "1111"))
+                (cust2, branch_id, savings_type, "INFY0001002", to_minor("5000"), "1111"))
     acc2 = cur.lastrowid
 
     # 5) ATM card for acc1
@@ -173,31 +262,18 @@ def seed_demo(conn):
 
     # 6) Loan for acc1
     cur.execute("INSERT INTO loans (account_id, loan_amount, interest_rate, term_months, remaining_amount, status) VALUES (?, ?, ?, ?, ?, ?)",
-                (acc1, 200000.0, 9.5, 60, 200000.0, "Active"))
-
-    # 7) Transactions for accounts
-    now = datetime.now().isoformat()
-    txns = [
-        (acc1, "credit", 50000.0, 75000.0, "Salary credited", now),
-        (acc1, "debit", 2500.0, 72500.0, "Shopping - Mall", now),
-        (acc2, "credit", 20000.0, 25000.0, "Salary credited", now),
-        (acc2, "debit", 1500.0, 23500.0, "Grocery", now)
-    ]
-    cur.executemany("INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                    txns)
-
-    # 8) Example fund transfer (acc1 -> acc2)
-    cur.execute("INSERT INTO fund_transfers (from_account, to_account, amount, remark) VALUES (?, ?, ?, ?)",
-                (acc1, acc2, 5000.0, "Transfer to Arjun for rent"))
-    # Update balances and insert transactions for the transfer
-    # debit acc1
-    cur.execute("UPDATE accounts SET balance = balance - ? WHERE account_id = ?", (5000.0, acc1))
-    cur.execute("INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                (acc1, "debit", 5000.0, 67500.0, "Transfer to INFY0001002", now))
-    # credit acc2
-    cur.execute("UPDATE accounts SET balance = balance + ? WHERE account_id = ?", (5000.0, acc2))
-    cur.execute("INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                (acc2, "credit", 5000.0, 28500.0, "Transfer from INFY0001001", now))
+                (acc1, to_minor("200000"), 9.5, 60, to_minor("200000"), "Active"))
+    conn.commit()
+
+    # 7) Transactions for accounts (the ledger computes balance_after)
+    post_entry(conn, acc1, "credit", to_minor("50000"), "Salary credited")
+    post_entry(conn, acc1, "debit", to_minor("2500"), "Shopping - Mall")
+    post_entry(conn, acc2, "credit", to_minor("20000"), "Salary credited")
+    post_entry(conn, acc2, "debit", to_minor("1500"), "Grocery")
+
+    # 8) Example fund transfer (acc1 -> acc2): both legs and the
+    # fund_transfers row are posted as one atomic unit
+    post_transfer(conn, acc1, acc2, to_minor("5000"), remark="Transfer to Arjun for rent")
 
     conn.commit()
     print("Seeded demo data.")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -8,18 +8,47 @@ DB_PATH = os.path.join(BASE_DIR, "bank_professional.db")
 
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-# Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Pool tuning: a handful of long-lived connections per process (one per
+# concurrently running request thread) instead of a connect per session
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30        # seconds to wait for a free connection
+BUSY_TIMEOUT_SECONDS = 5  # SQLite lock wait
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Runs once per pooled connection, not per session
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_session_factory(db_path):
+    # Pooled engine + sessionmaker for one database file
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT_SECONDS},
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        # A local file cannot drop the connection, so no ping per checkout
+        pool_pre_ping=False,
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        # Objects stay readable after commit without a reload query each
+        expire_on_commit=False,
+        bind=engine
+    )
+
 
 # Session
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine
-)
+SessionLocal = create_session_factory(DB_PATH)
+engine = SessionLocal.kw["bind"]
 
 # Base class for models
 Base = declarative_base()
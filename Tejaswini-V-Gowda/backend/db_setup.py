@@ -1,4 +1,5 @@
 import sqlite3
+import json
 import bcrypt
 
 def init_db():
@@ -32,13 +33,124 @@ def init_db():
             topic TEXT NOT NULL,
             messages TEXT,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            summary TEXT,
+            summary_upto INTEGER DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
 
+    migrate_chat_history(cursor)
+    create_chat_history_index(cursor)
+
+    # 4. Chat Messages Table (one row per message, appended as the chat grows)
+    create_chat_messages_table(cursor)
+    migrated = migrate_chat_blobs(cursor)
+
+    # 5. API Sessions Table (login tokens shared by every API worker)
+    create_api_sessions_table(cursor)
+
+    # 6. Account Versions (bumped by triggers on every account write; see account_cache.py)
+    create_account_versions(cursor)
+
     conn.commit()
     conn.close()
+    if migrated:
+        print(f"Moved {migrated} saved conversations to chat_messages.")
     print("Database initialized successfully.")
 
+def migrate_chat_history(cursor):
+    # Databases created before rolling summaries were added lack these columns
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(chat_history)")}
+    if 'summary' not in columns:
+        cursor.execute("ALTER TABLE chat_history ADD COLUMN summary TEXT")
+    if 'summary_upto' not in columns:
+        cursor.execute("ALTER TABLE chat_history ADD COLUMN summary_upto INTEGER DEFAULT 0")
+
+def create_chat_history_index(cursor):
+    # Serves the sidebar's "newest conversations first" pages for one user
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_ts ON chat_history (user_id, timestamp, id)"
+    )
+
+def create_chat_messages_table(cursor):
+    # Each turn is an INSERT of the new messages only, so saving a turn costs
+    # the same however long the conversation already is
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY,
+            session_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES chat_history (id)
+        )
+    ''')
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_session_seq ON chat_messages (session_id, seq)"
+    )
+
+def create_api_sessions_table(cursor):
+    # Only a hash of each token is stored; expired rows are deleted on login
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_sessions (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+# Tables whose writes change what the account summary shows; a trigger is
+# added for each one that exists and is keyed by user_id
+ACCOUNT_TABLES = ('accounts', 'transactions', 'loans', 'fund_transfers')
+
+def create_account_versions(cursor):
+    # One row per user; seq comes from a global counter so a reader can ask
+    # "which users changed since seq N" with one index range scan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS account_versions (
+            user_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_versions_seq ON account_versions (seq)")
+    bump = '''
+        INSERT INTO account_versions (user_id, seq)
+        VALUES ({row}.user_id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM account_versions))
+        ON CONFLICT (user_id) DO UPDATE SET seq = excluded.seq;
+    '''
+    for table in ACCOUNT_TABLES:
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if 'user_id' not in columns:
+            continue
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version "
+                f"AFTER {event} ON {table} BEGIN {bump.format(row=row)} END"
+            )
+
+def migrate_chat_session_blob(cursor, session_id, messages_json):
+    # Copies one JSON blob into chat_messages and clears it; returns the messages
+    try:
+        messages = json.loads(messages_json) if messages_json else []
+    except (json.JSONDecodeError, TypeError):
+        messages = []
+    cursor.executemany(
+        "INSERT OR IGNORE INTO chat_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+        [(session_id, seq, m['role'], m['content']) for seq, m in enumerate(messages)]
+    )
+    cursor.execute("UPDATE chat_history SET messages = NULL WHERE id = ?", (session_id,))
+    return messages
+
+def migrate_chat_blobs(cursor):
+    # Conversations saved before chat_messages existed live in chat_history.messages
+    rows = cursor.execute(
+        "SELECT id, messages FROM chat_history WHERE messages IS NOT NULL"
+    ).fetchall()
+    for session_id, messages_json in rows:
+        migrate_chat_session_blob(cursor, session_id, messages_json)
+    return len(rows)
+
 if __name__ == '__main__':
     init_db()
\ No newline at end of file
@@ -0,0 +1,126 @@
+# faq.py
+# Precompiled FAQ index that answers routine questions before any model call.
+#
+# data/faq.json is the single source of truth for the bank's FAQ answers,
+# used by main.py, bank_main.py, chat_service.py and the frontend (the
+# model's own context comes from the policy documents in retrieval.py).
+# At load time every question variant becomes an L2-normalized TF-IDF
+# vector stored in an inverted index, so a lookup only touches the postings of
+# the words in the prompt and finishes in microseconds.
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+# --- Configuration ---
+FAQ_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'faq.json')
+CONFIDENCE_THRESHOLD = 0.75  # cosine similarity; below this the question goes to the LLM
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "how", "much", "do",
+    "does", "you", "your", "i", "my", "me", "can", "to", "of", "for", "on",
+    "in", "at", "there", "any", "please", "tell", "about", "s", "it", "from",
+    "per", "if", "and", "or", "with", "we", "our", "be",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9$%.]+")
+
+
+def tokenize(text):
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        word = word.strip(".")
+        if not word or word in STOPWORDS:
+            continue
+        # Light stemming so "fees"/"fee" and "charges"/"charge" meet
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def normalize_question(text):
+    return " ".join(tokenize(text))
+
+
+class FaqIndex:
+    def __init__(self, entries, threshold=CONFIDENCE_THRESHOLD):
+        self.entries = entries
+        self.threshold = threshold
+        self.by_id = {entry["id"]: entry for entry in entries}
+        self.stats = {"hits": 0, "fallthrough": 0}
+
+        variants = []   # (entry index, tokens)
+        for idx, entry in enumerate(entries):
+            for question in entry["questions"]:
+                variants.append((idx, tokenize(question)))
+
+        # IDF over question variants; words unseen at query time get the max IDF
+        doc_freq = Counter(token for _, tokens in variants for token in set(tokens))
+        n = len(variants)
+        self.idf = {token: math.log((n + 1) / (df + 1)) + 1.0 for token, df in doc_freq.items()}
+        self.unknown_idf = math.log(n + 1) + 1.0
+
+        self.exact = {}                      # normalized question -> entry index
+        self.postings = defaultdict(list)    # token -> [(variant id, weight)]
+        self.variant_entry = []
+        for vid, (idx, tokens) in enumerate(variants):
+            self.variant_entry.append(idx)
+            self.exact.setdefault(" ".join(tokens), idx)
+            weights = {t: c * self.idf[t] for t, c in Counter(tokens).items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for token, weight in weights.items():
+                self.postings[token].append((vid, weight / norm))
+
+    def match(self, text):
+        # Returns (entry, confidence) for the best entry, or (None, 0.0)
+        tokens = tokenize(text)
+        if not tokens:
+            return None, 0.0
+        exact = self.exact.get(" ".join(tokens))
+        if exact is not None:
+            return self.entries[exact], 1.0
+
+        weights = {t: c * self.idf.get(t, self.unknown_idf) for t, c in Counter(tokens).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        scores = defaultdict(float)
+        for token, weight in weights.items():
+            for vid, variant_weight in self.postings.get(token, ()):
+                scores[vid] += weight * variant_weight
+        if not scores:
+            return None, 0.0
+        vid, score = max(scores.items(), key=lambda item: item[1])
+        return self.entries[self.variant_entry[vid]], score / norm
+
+    def answer(self, text):
+        # The FAQ answer if the match is confident enough, else None (ask the LLM)
+        entry, confidence = self.match(text)
+        if entry is None or confidence < self.threshold:
+            self.stats["fallthrough"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry["answer"]
+
+    def answer_for(self, faq_id):
+        return self.by_id[faq_id]["answer"]
+
+
+def load_faq(path=FAQ_FILE, threshold=CONFIDENCE_THRESHOLD):
+    with open(path, encoding='utf-8') as f:
+        return FaqIndex(json.load(f), threshold)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_faq_index():
+    # Built once per process (Streamlit keeps imported modules across reruns)
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_faq()
+        return _index
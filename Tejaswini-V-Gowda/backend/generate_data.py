@@ -0,0 +1,303 @@
+# generate_data.py
+# Deterministic synthetic data for the professional schema (create_professional_db.py).
+#
+#   python generate_data.py --scale 1            # ~1M transactions
+#   python generate_data.py --scale 10 --seed 7  # ~10M transactions
+#
+# Scale 1 is SCALE_CUSTOMERS customers with one to three accounts each and
+# SCALE_TRANSACTIONS transaction rows spread over HISTORY_DAYS days; every
+# count grows linearly with --scale (fractions work, e.g. --scale 0.01).
+# The same --seed and --scale always produce the same database.
+#
+# The transaction stream is generated in time order: salary credits, card /
+# UPI spending, cash deposits and transfers between accounts (both legs plus
+# the fund_transfers row). Busy accounts get more activity than quiet ones.
+# Running balances are tracked in memory, so every balance_after is right,
+# no account goes negative and check_balances() finds nothing.
+#
+# Loading is tuned for speed on a fresh file: no journal, synchronous off,
+# a large page cache, indexes and the aggregates trigger dropped during the
+# load (the aggregates are rebuilt in one pass at the end), executemany in
+# CHUNK_ROWS chunks. The finished file is switched to WAL and ANALYZEd like
+# any other bank_professional.db.
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from aggregates import drop_aggregate_trigger, rebuild as rebuild_aggregates
+from bulk_import import drop_indexes, restore_indexes
+from create_professional_db import create_account_versions, create_tables, drop_version_triggers
+from ledger import format_minor
+
+# --- Configuration ---
+SCALE_BRANCHES = 25
+SCALE_CUSTOMERS = 10_000
+SCALE_TRANSACTIONS = 1_000_000
+HISTORY_DAYS = 365
+START_DATE = datetime(2024, 1, 1)
+CHUNK_ROWS = 100_000
+CACHE_SIZE_KIB = 256 * 1024
+
+CARD_SHARE = 0.7         # accounts with an ATM card
+LOAN_SHARE = 0.15        # accounts with a loan
+SALARY_SHARE = 0.06      # share of events that are salary credits
+TRANSFER_SHARE = 0.12    # share of events that are transfers (two rows each)
+DEPOSIT_SHARE = 0.04     # share of events that are cash deposits
+
+FIRST_NAMES = ["Aarav", "Aditi", "Akash", "Ananya", "Arjun", "Deepa", "Divya", "Ganesh", "Harini", "Ishaan",
+               "Kavya", "Kiran", "Lakshmi", "Manoj", "Meera", "Nikhil", "Pooja", "Priya", "Rahul", "Ramesh",
+               "Rohan", "Sahana", "Sanjay", "Shreya", "Sneha", "Suresh", "Tejaswini", "Varun", "Vidya", "Yash"]
+LAST_NAMES = ["Bhat", "Gowda", "Hegde", "Iyer", "Joshi", "Kamath", "Kulkarni", "Menon", "Nair", "Naidu",
+              "Patil", "Rao", "Reddy", "Shetty", "Sharma", "Shenoy", "Srinivas", "Verma"]
+CITIES = ["Bengaluru", "Mysuru", "Mangaluru", "Hubballi", "Chennai", "Hyderabad", "Pune", "Mumbai"]
+
+# (narration, min rupees, max rupees, weight)
+SPENDING = [
+    ("Grocery - BigBasket", 200, 4000, 18),
+    ("UPI - Swiggy", 150, 1200, 16),
+    ("UPI - Zomato", 150, 1200, 12),
+    ("Shopping - Amazon", 300, 15000, 10),
+    ("Shopping - Mall", 500, 8000, 6),
+    ("Fuel - HPCL", 500, 4000, 9),
+    ("Electricity bill - BESCOM", 600, 4500, 4),
+    ("Mobile recharge", 199, 999, 6),
+    ("Rent", 8000, 35000, 3),
+    ("ATM withdrawal", 500, 10000, 10),
+    ("Medical - Apollo Pharmacy", 100, 6000, 4),
+    ("Travel - IRCTC", 400, 6000, 2),
+]
+
+
+def scaled(base, scale):
+    return max(1, int(base * scale))
+
+
+def connect_for_load(path):
+    # isolation_level=None: chunks are committed explicitly
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    return conn
+
+
+def insert_chunked(conn, sql, rows):
+    # rows may be a generator; it is consumed CHUNK_ROWS at a time
+    count, chunk = 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            conn.execute("BEGIN")
+            conn.executemany(sql, chunk)
+            conn.execute("COMMIT")
+            count += len(chunk)
+            chunk.clear()
+    if chunk:
+        conn.execute("BEGIN")
+        conn.executemany(sql, chunk)
+        conn.execute("COMMIT")
+        count += len(chunk)
+    return count
+
+
+# --- Reference data ---
+
+def generate_reference(conn, rng, scale):
+    # Branches, account types, customers, accounts, cards and loans.
+    # Returns [account_id, balance, salary, weight] per account (ids start at 1).
+    branches = scaled(SCALE_BRANCHES, scale)
+    insert_chunked(conn, "INSERT INTO branches (branch_id, name, address, ifsc) VALUES (?, ?, ?, ?)", (
+        (b, f"{CITIES[b % len(CITIES)]} Branch {b}", f"Branch road {b}, {CITIES[b % len(CITIES)]}", f"SYNB{b:07d}")
+        for b in range(1, branches + 1)
+    ))
+    insert_chunked(conn, "INSERT INTO account_types (type_id, name, min_balance, interest_rate) VALUES (?, ?, ?, ?)", [
+        (1, "Savings", 100000, 3.5),
+        (2, "Current", 0, 0.0),
+        (3, "Salary", 0, 3.0),
+    ])
+
+    customers = scaled(SCALE_CUSTOMERS, scale)
+    customer_rows, account_rows, accounts = [], [], []
+    for c in range(1, customers + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        joined = START_DATE - timedelta(days=rng.randint(30, 3650))
+        customer_rows.append((c, f"{first} {last}", f"{first.lower()}.{last.lower()}{c}@example.com",
+                              f"9{rng.randrange(10 ** 9):09d}",
+                              f"{rng.randint(1955, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                              joined.isoformat(sep=" ")))
+        salary = rng.randint(150, 2500) * 10000   # 15,000 - 2,50,000 rupees a month, in paise
+        branch = rng.randint(1, branches)
+        for n in range(rng.choice((1, 1, 1, 2, 2, 3))):
+            account_id = len(accounts) + 1
+            opening = rng.randint(10, 2000) * 10000
+            account_rows.append((account_id, c, branch, 3 if n == 0 else rng.choice((1, 2)),
+                                 f"SYN{account_id:010d}", opening, joined.isoformat(sep=" "),
+                                 "Active", f"{rng.randrange(10000):04d}"))
+            # Only the first account receives the salary; the weight skews activity
+            accounts.append([account_id, opening, salary if n == 0 else 0, rng.choice((1, 1, 2, 3, 5, 8))])
+
+    insert_chunked(conn, "INSERT INTO customers (customer_id, full_name, email, phone, dob, created_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", customer_rows)
+    insert_chunked(conn, "INSERT INTO accounts (account_id, customer_id, branch_id, account_type_id, account_no, "
+                         "balance, opened_on, status, pin) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", account_rows)
+
+    cards, loans = [], []
+    for account_id, _, _, _ in accounts:
+        if rng.random() < CARD_SHARE:
+            card_id = len(cards) + 1
+            cards.append((card_id, account_id, f"{4000000000000000 + card_id}", f"{rng.randrange(1000):03d}",
+                          f"{rng.randint(2026, 2031)}-{rng.randint(1, 12):02d}", f"{rng.randrange(10000):04d}"))
+        if rng.random() < LOAN_SHARE:
+            amount = rng.randint(5, 300) * 1000000   # 50,000 - 30,00,000 rupees
+            issued = START_DATE - timedelta(days=rng.randint(0, 1800))
+            remaining = int(amount * rng.random())
+            loans.append((account_id, amount, rng.choice((8.5, 9.5, 10.75, 12.0, 14.5)), rng.choice((12, 36, 60, 120, 240)),
+                          remaining, "Active" if remaining else "Closed", issued.isoformat(sep=" ")))
+    insert_chunked(conn, "INSERT INTO atm_cards (card_id, account_id, card_no, cvv, expiry, pin) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", cards)
+    insert_chunked(conn, "INSERT INTO loans (account_id, loan_amount, interest_rate, term_months, remaining_amount, "
+                         "status, issued_on) VALUES (?, ?, ?, ?, ?, ?, ?)", loans)
+    return accounts, {"branches": branches, "customers": customers, "accounts": len(accounts),
+                      "atm_cards": len(cards), "loans": len(loans)}
+
+
+# --- Transaction stream ---
+
+def generate_transactions(rng, accounts, target, transfers):
+    # Yields transactions rows in time (and so txn_id) order until `target`
+    # rows were produced; appends fund_transfers rows to `transfers`.
+    # Balances in `accounts` are updated as it goes.
+    pool = [i for i, account in enumerate(accounts) for _ in range(account[3])]
+    earners = [i for i, account in enumerate(accounts) if account[2]]
+    categories = [s for s in SPENDING for _ in range(s[3])]
+    # A transfer is two rows at one timestamp, so events are fewer than rows
+    step = HISTORY_DAYS * 86400 * (1 + TRANSFER_SHARE) / target
+    salary_cut = SALARY_SHARE
+    transfer_cut = salary_cut + TRANSFER_SHARE
+    deposit_cut = transfer_cut + DEPOSIT_SHARE
+    produced = 0
+    offset = 0.0
+
+    while produced < target:
+        offset += step * 2 * rng.random()
+        # Same format as the ledger writes (datetime.isoformat)
+        created_at = (START_DATE + timedelta(seconds=int(offset))).isoformat()
+        roll = rng.random()
+
+        if roll < salary_cut:
+            account = accounts[earners[rng.randrange(len(earners))]] if earners else accounts[pool[rng.randrange(len(pool))]]
+            amount = account[2] or rng.randint(100, 5000) * 100
+            account[1] += amount
+            yield (account[0], "credit", amount, account[1], "Salary credited", created_at)
+            produced += 1
+            continue
+
+        account = accounts[pool[rng.randrange(len(pool))]]
+
+        if roll < transfer_cut and target - produced >= 2 and len(accounts) > 1:
+            to = accounts[pool[rng.randrange(len(pool))]]
+            amount = rng.randint(1, 500) * 10000
+            if to is not account and account[1] >= amount:
+                account[1] -= amount
+                to[1] += amount
+                yield (account[0], "debit", amount, account[1], f"Transfer to SYN{to[0]:010d}", created_at)
+                yield (to[0], "credit", amount, to[1], f"Transfer from SYN{account[0]:010d}", created_at)
+                transfers.append((account[0], to[0], amount, created_at, "Completed", "Transfer"))
+                produced += 2
+                continue
+
+        if roll >= deposit_cut:
+            narration, low, high, _ = categories[rng.randrange(len(categories))]
+            amount = rng.randint(low * 100, high * 100)
+            if account[1] >= amount:
+                account[1] -= amount
+                yield (account[0], "debit", amount, account[1], narration, created_at)
+                produced += 1
+                continue
+
+        # Cash deposit (also what a spend the account cannot afford turns into)
+        amount = rng.randint(5, 500) * 10000
+        account[1] += amount
+        yield (account[0], "credit", amount, account[1], "Cash deposit", created_at)
+        produced += 1
+
+
+# --- Build ---
+
+def generate(path, scale=1.0, seed=42, log=print):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    conn = connect_for_load(path)
+    create_tables(conn)
+    if conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]:
+        conn.close()
+        raise SystemExit(f"{path} already has data; use --overwrite or another --db.")
+
+    accounts, counts = generate_reference(conn, rng, scale)
+    log(f"Reference data: {counts['branches']:,} branches, {counts['customers']:,} customers, "
+        f"{counts['accounts']:,} accounts, {counts['atm_cards']:,} cards, {counts['loans']:,} loans")
+
+    dropped = drop_indexes(conn, "transactions")
+    drop_aggregate_trigger(conn.cursor())
+    # A new database has nothing cached, so no versions need bumping afterwards
+    drop_version_triggers(conn.cursor())
+    target = scaled(SCALE_TRANSACTIONS, scale)
+    transfers = []
+    stream = generate_transactions(rng, accounts, target, transfers)
+    txn_sql = ("INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) "
+               "VALUES (?, ?, ?, ?, ?, ?)")
+    written = 0
+    while written < target:
+        batch = insert_chunked(conn, txn_sql, (row for _, row in zip(range(CHUNK_ROWS * 10), stream)))
+        if not batch:
+            break
+        written += batch
+        log(f"  {written:,} / {target:,} transactions ({written / (time.perf_counter() - start):,.0f} rows/s)")
+    insert_chunked(conn, "INSERT INTO fund_transfers (from_account, to_account, amount, created_at, status, remark) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", transfers)
+
+    # Final balances: each account ends on its last balance_after
+    insert_chunked(conn, "UPDATE accounts SET balance = ? WHERE account_id = ?",
+                   ((balance, account_id) for account_id, balance, _, _ in accounts))
+
+    log("Rebuilding indexes, aggregates and statistics...")
+    restore_indexes(conn, dropped)
+    create_account_versions(conn.cursor())
+    rebuild_aggregates(conn)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA locking_mode = NORMAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+
+    counts.update(transactions=written, fund_transfers=len(transfers),
+                  total_balance=format_minor(sum(a[1] for a in accounts)))
+    log(f"Built {path} in {time.perf_counter() - start:.1f}s: {written:,} transactions, "
+        f"{len(transfers):,} transfers, total balance {counts['total_balance']}")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic bank_professional database")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help=f"1.0 = {SCALE_CUSTOMERS:,} customers and {SCALE_TRANSACTIONS:,} transactions")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="bank_synthetic.db")
+    parser.add_argument("--overwrite", action="store_true", help="replace the database file if it exists")
+    args = parser.parse_args(argv)
+
+    if args.overwrite:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    generate(args.db, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
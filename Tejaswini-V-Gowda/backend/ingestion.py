@@ -0,0 +1,236 @@
+# ingestion.py
+# Background ingestion of uploaded documents into the retrieval index.
+#
+# An upload is spooled to a temporary file and handed to a single background
+# worker. The worker streams it page by page (PDF) or block by block (text)
+# through extraction -> chunking -> embedding and adds each small batch of
+# chunks to the live retrieval index, so new knowledge becomes searchable
+# while the file is still being processed. Only one batch of text is in
+# memory at a time, and the worker pauses between batches so chat requests
+# on the same server are not starved.
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from retrieval import UPLOAD_DIR, chunk_paragraphs, get_retrieval_index
+
+# --- Configuration ---
+INGEST_WORKERS = 1           # uploads are processed one at a time
+MAX_PENDING_JOBS = 8         # further uploads are refused until the queue drains
+EMBED_BATCH = 16             # chunks embedded and indexed per step
+BATCH_PAUSE_SECONDS = 0.02   # yield the CPU/GIL to chat requests between batches
+READ_BLOCK_BYTES = 64 * 1024
+MAX_PARAGRAPH_CHARS = 16 * 1024   # text without blank lines is cut up at this size
+SPOOL_BLOCK_BYTES = 1024 * 1024
+
+TEXT_EXTENSIONS = ('.txt', '.md')
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class IngestionError(Exception):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, filename, path, size):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.status = "queued"       # queued -> running -> done | failed
+        self.progress = 0.0          # 0..1
+        self.chunks = 0
+        self.message = ""
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+# --- Extraction (generators: one page / block of text at a time) ---
+
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s")
+
+
+def _cut_point(text, limit):
+    # Where to cut an over-long paragraph: the last line break before limit,
+    # else the last sentence end, else the last space, else limit itself
+    head = text[:limit]
+    cut = head.rfind("\n")
+    if cut <= 0:
+        ends = [m.end() for m in _SENTENCE_END_RE.finditer(head)]
+        cut = ends[-1] if ends else head.rfind(" ")
+    return cut if cut > 0 else limit
+
+
+def extract_text_file(path, job):
+    # Reads fixed-size blocks and yields complete paragraphs only; a file with
+    # no blank lines is yielded in pieces of at most MAX_PARAGRAPH_CHARS
+    pending = ""
+    done = 0
+    with open(path, encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            done += len(block.encode('utf-8', errors='replace'))
+            job.progress = min(0.99, done / (job.size or 1))
+            pending += block
+            parts = re.split(r"\n\s*\n", pending)
+            pending = parts.pop()
+            for part in parts:
+                yield part
+            while len(pending) > MAX_PARAGRAPH_CHARS:
+                cut = _cut_point(pending, MAX_PARAGRAPH_CHARS)
+                yield pending[:cut]
+                pending = pending[cut:]
+    if pending.strip():
+        yield pending
+
+
+def extract_pdf(path, job):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise IngestionError("PDF support needs the 'pypdf' package.")
+    # PdfReader parses pages lazily, so only the current page's text is in memory
+    reader = PdfReader(path)
+    total = len(reader.pages) or 1
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text() or ""
+        job.progress = min(0.99, number / total)
+        yield text
+
+
+def extract_image(path, job):
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        raise IngestionError("Image text extraction needs the 'pytesseract' and 'Pillow' packages.")
+    with Image.open(path) as image:
+        text = pytesseract.image_to_string(image)
+    job.progress = 0.99
+    yield text
+
+
+def extract(path, job):
+    ext = os.path.splitext(job.filename)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        return extract_text_file(path, job)
+    if ext in PDF_EXTENSIONS:
+        return extract_pdf(path, job)
+    if ext in IMAGE_EXTENSIONS:
+        return extract_image(path, job)
+    raise IngestionError(f"Unsupported file type: {ext or 'unknown'}")
+
+
+def paragraphs_of(pages):
+    for page in pages:
+        for paragraph in re.split(r"\n\s*\n", page):
+            paragraph = " ".join(paragraph.split())
+            if paragraph:
+                yield paragraph
+
+
+# --- Worker ---
+
+class IngestionService:
+    def __init__(self, index=None, workers=INGEST_WORKERS, max_pending=MAX_PENDING_JOBS):
+        self._index = index
+        self.max_pending = max_pending
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+
+    @property
+    def index(self):
+        return self._index or get_retrieval_index()
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if not job.finished)
+
+    def submit(self, fileobj, filename):
+        # Copies the upload to disk in blocks and queues it; returns the job
+        with self._lock:
+            if sum(1 for job in self.jobs.values() if not job.finished) >= self.max_pending:
+                raise IngestionError("Too many uploads are being processed. Please try again shortly.")
+
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(fileobj, out, SPOOL_BLOCK_BYTES)
+        job = IngestionJob(filename, path, os.path.getsize(path))
+        with self._lock:
+            self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        index = self.index
+        doc = os.path.basename(job.filename)
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        text_path = os.path.join(UPLOAD_DIR, f"{os.path.splitext(doc)[0]}-{job.id[:8]}.txt")
+        try:
+            # The extracted text is kept in data/uploads so the index can be
+            # rebuilt from it; it is written as it streams, never held whole
+            with open(text_path, 'w', encoding='utf-8') as text_out:
+                batch = []
+                for chunk in chunk_paragraphs(self._tee(paragraphs_of(extract(job.path, job)), text_out)):
+                    batch.append(chunk)
+                    if len(batch) >= EMBED_BATCH:
+                        self._index_batch(index, doc, batch, job)
+                        batch = []
+                if batch:
+                    self._index_batch(index, doc, batch, job)
+            if job.chunks == 0:
+                raise IngestionError("No text could be extracted from this file.")
+            index.save()
+            job.status = "done"
+            job.message = f"Indexed {job.chunks} passages from {doc}."
+        except Exception as e:
+            job.status = "failed"
+            job.message = str(e)
+            # Passages already indexed stay searchable, so keep their text
+            if job.chunks == 0 and os.path.exists(text_path):
+                os.remove(text_path)
+        finally:
+            job.progress = 1.0
+            job.finished_at = time.time()
+            os.remove(job.path)
+
+    @staticmethod
+    def _tee(paragraphs, out):
+        for paragraph in paragraphs:
+            out.write(paragraph + "\n\n")
+            yield paragraph
+
+    @staticmethod
+    def _index_batch(index, doc, batch, job):
+        index.add_chunks(doc, batch)
+        job.chunks += len(batch)
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ingestion_service():
+    # One worker per process (Streamlit keeps imported modules across reruns)
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = IngestionService()
+        return _service
@@ -0,0 +1,192 @@
+# ledger.py
+# Double-entry posting for bank_professional.db (create_professional_db.py).
+#
+# Money is stored as integer minor units (paise: 1 rupee = 100), never REAL,
+# so balances add up exactly. A transfer is one atomic unit: the debit leg,
+# the credit leg (each with the balance_after it produced), the fund_transfers
+# row and both balance updates commit together or not at all.
+#
+# post_transfers() posts a whole batch inside one BEGIN IMMEDIATE transaction:
+# the balances involved are read once, the transfers are applied in memory in
+# order, and the rows are written with executemany. Transfers that would
+# overdraw an account are skipped and reported; the rest of the batch posts.
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# --- Configuration ---
+MINOR_UNITS = 100          # paise per rupee
+IN_CLAUSE_CHUNK = 500      # account ids per "WHERE account_id IN (...)" query
+MAX_MINOR = 2 ** 63 - 1    # largest value an SQLite INTEGER column holds
+
+
+class LedgerError(Exception):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+# --- Amounts ---
+
+def to_minor(amount):
+    # "1,250.50" / Decimal / int rupees -> 125050 paise
+    if isinstance(amount, float):
+        amount = repr(amount)
+    try:
+        value = Decimal(str(amount).replace(',', ''))
+    except InvalidOperation:
+        raise LedgerError(f"Not an amount: {amount!r}")
+    # Decimal parses "NaN" and "Infinity"; int() of them raises ValueError
+    if not value.is_finite():
+        raise LedgerError(f"Not an amount: {amount!r}")
+    try:
+        minor = int((value * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except ArithmeticError:
+        raise LedgerError(f"Amount out of range: {amount!r}")    # decimal Overflow, e.g. "1e999999"
+    if abs(minor) > MAX_MINOR:
+        raise LedgerError(f"Amount out of range: {amount!r}")
+    return minor
+
+
+def format_minor(minor):
+    sign = "-" if minor < 0 else ""
+    rupees, paise = divmod(abs(int(minor)), MINOR_UNITS)
+    return f"{sign}{rupees:,}.{paise:02d}"
+
+
+# --- Posting ---
+
+def _fetch_accounts(conn, account_ids):
+    # {account_id: [balance, status, account_no]} in a few IN (...) queries
+    ids = list(account_ids)
+    accounts = {}
+    for start in range(0, len(ids), IN_CLAUSE_CHUNK):
+        chunk = ids[start:start + IN_CLAUSE_CHUNK]
+        rows = conn.execute(
+            f"SELECT account_id, balance, status, account_no FROM accounts WHERE account_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        for account_id, balance, status, account_no in rows:
+            # Databases migrated from REAL columns hand back floats like 7500000.0
+            accounts[account_id] = [int(balance or 0), status, account_no or str(account_id)]
+    return accounts
+
+
+def _apply(accounts, transfer, now, legs, transfers):
+    from_id, to_id, amount = transfer["from_account"], transfer["to_account"], transfer["amount"]
+    if amount <= 0:
+        raise LedgerError("Transfer amount must be positive.")
+    if from_id == to_id:
+        raise LedgerError("Cannot transfer to the same account.")
+    for account_id in (from_id, to_id):
+        if account_id not in accounts:
+            raise LedgerError(f"Unknown account {account_id}.")
+        if accounts[account_id][1] != "Active":
+            raise LedgerError(f"Account {account_id} is {accounts[account_id][1]}.")
+    if accounts[from_id][0] < amount:
+        raise InsufficientFunds(f"Account {from_id} has insufficient funds.")
+
+    created_at = transfer.get("created_at") or now
+    remark = transfer.get("remark")
+    accounts[from_id][0] -= amount
+    accounts[to_id][0] += amount
+    legs.append((from_id, "debit", amount, accounts[from_id][0],
+                 transfer.get("narration") or f"Transfer to {accounts[to_id][2]}", created_at))
+    legs.append((to_id, "credit", amount, accounts[to_id][0],
+                 transfer.get("narration") or f"Transfer from {accounts[from_id][2]}", created_at))
+    transfers.append((from_id, to_id, amount, created_at, remark))
+
+
+def post_transfers(conn, transfers):
+    # transfers: dicts with from_account, to_account, amount (paise) and
+    # optional remark / narration / created_at. One atomic transaction.
+    # Returns (posted, rejected) where rejected is [(index, LedgerError), ...].
+    if conn.in_transaction:
+        raise LedgerError("post_transfers needs a connection with no open transaction.")
+    now = datetime.now().isoformat()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        involved = {t["from_account"] for t in transfers} | {t["to_account"] for t in transfers}
+        accounts = _fetch_accounts(conn, involved)
+        legs, transfer_rows, rejected = [], [], []
+        touched = set()
+        for index, transfer in enumerate(transfers):
+            try:
+                _apply(accounts, transfer, now, legs, transfer_rows)
+                touched.update((transfer["from_account"], transfer["to_account"]))
+            except LedgerError as e:
+                rejected.append((index, e))
+
+        conn.executemany(
+            "INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            legs
+        )
+        conn.executemany(
+            "INSERT INTO fund_transfers (from_account, to_account, amount, created_at, remark) VALUES (?, ?, ?, ?, ?)",
+            transfer_rows
+        )
+        # Final balance per account, not one UPDATE per leg
+        conn.executemany(
+            "UPDATE accounts SET balance = ? WHERE account_id = ?",
+            [(accounts[account_id][0], account_id) for account_id in touched]
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(transfer_rows), rejected
+
+
+def post_transfer(conn, from_account, to_account, amount, remark=None):
+    # Single transfer; raises LedgerError / InsufficientFunds instead of skipping
+    posted, rejected = post_transfers(conn, [
+        {"from_account": from_account, "to_account": to_account, "amount": amount, "remark": remark}
+    ])
+    if rejected:
+        raise rejected[0][1]
+    return posted
+
+
+def post_entry(conn, account_id, txn_type, amount, narration, created_at=None):
+    # One-legged posting against the outside world (salary credit, card spend)
+    if txn_type not in ("credit", "debit"):
+        raise LedgerError("txn_type must be 'credit' or 'debit'.")
+    if amount <= 0:
+        raise LedgerError("Amount must be positive.")
+    if conn.in_transaction:
+        raise LedgerError("post_entry needs a connection with no open transaction.")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT balance, status FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+        if row is None:
+            raise LedgerError(f"Unknown account {account_id}.")
+        balance = int(row[0] or 0)
+        if txn_type == "debit" and balance < amount:
+            raise InsufficientFunds(f"Account {account_id} has insufficient funds.")
+        balance = balance + amount if txn_type == "credit" else balance - amount
+        conn.execute("UPDATE accounts SET balance = ? WHERE account_id = ?", (balance, account_id))
+        conn.execute(
+            "INSERT INTO transactions (account_id, txn_type, amount, balance_after, narration, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (account_id, txn_type, amount, balance, narration, created_at or datetime.now().isoformat())
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return balance
+
+
+def check_balances(conn):
+    # Accounts whose balance differs from their last balance_after: [(account_id, balance, balance_after)]
+    return conn.execute("""
+        SELECT a.account_id, a.balance, t.balance_after
+        FROM accounts a
+        JOIN transactions t ON t.txn_id = (
+            SELECT MAX(txn_id) FROM transactions WHERE account_id = a.account_id
+        )
+        WHERE a.balance != t.balance_after
+    """).fetchall()
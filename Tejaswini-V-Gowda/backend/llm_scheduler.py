@@ -0,0 +1,306 @@
+# llm_scheduler.py
+# Admission control in front of the Ollama server for every chat and embed
+# call made by this process (main.py, bank_main.py, api.py, retrieval).
+#
+# A single model server handles only a few generations at once; every extra
+# concurrent request slows all of them down, so a burst of users makes every
+# answer late. Here at most MAX_CONCURRENT calls are in flight. Further calls
+# wait in one queue per user, and free slots go round-robin across users, so
+# one user firing off several questions cannot starve everyone else. The
+# queue is bounded. Once MAX_QUEUED calls are waiting, or a user already has
+# MAX_QUEUED_PER_USER of them, or a call has waited QUEUE_TIMEOUT_SECONDS,
+# LLMBusy is raised and the caller answers "busy, try again" (HTTP 503 in
+# the API). The queue never grows without limit.
+#
+# Ollama's /api/embed takes a list of inputs, so embed calls for the same
+# model that arrive within BATCH_WINDOW_SECONDS are merged into one request
+# that takes one slot. /api/chat has no batch form; chat calls are scheduled
+# one by one.
+#
+# Callers use scheduled_client(user) / async_scheduled_client(user) in place
+# of ollama_client.get_client() / get_async_client(); the wrappers have the
+# same chat, chat_stream and embed methods. Queue depth, admissions,
+# rejections and wait times are in get_scheduler().metrics().
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from ollama_client import OLLAMA_HOST, get_async_client, get_client
+
+# --- Configuration ---
+MAX_CONCURRENT = 2           # calls in flight to the model server (match OLLAMA_NUM_PARALLEL)
+MAX_QUEUED = 32              # waiting calls across all users before LLMBusy
+MAX_QUEUED_PER_USER = 2      # waiting calls per user before LLMBusy
+QUEUE_TIMEOUT_SECONDS = 30   # longest wait for a slot before LLMBusy
+BATCH_WINDOW_SECONDS = 0.01  # how long an embed call waits for others to join it
+BATCH_MAX_INPUTS = 64        # a batch is sent at once when it reaches this many inputs
+RETRY_AFTER_SECONDS = 2      # suggested client back-off when busy
+BUSY_MESSAGE = "The assistant is busy right now. Please try again in a few seconds."
+
+
+class LLMBusy(Exception):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("user", "wake", "queued_at", "granted")
+
+    def __init__(self, user, wake):
+        self.user = user
+        self.wake = wake
+        self.queued_at = time.perf_counter()
+        self.granted = False
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queued=MAX_QUEUED,
+                 max_queued_per_user=MAX_QUEUED_PER_USER, queue_timeout=QUEUE_TIMEOUT_SECONDS,
+                 batch_window=BATCH_WINDOW_SECONDS, batch_max_inputs=BATCH_MAX_INPUTS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.batch_window = batch_window
+        self.batch_max_inputs = batch_max_inputs
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()    # user -> deque of _Waiter, in round-robin order
+        self._depth = 0
+        self._active = 0
+        self._batches = {}              # model -> embed batch still taking requests
+        self.stats = {
+            "admitted": 0,
+            "rejected": 0,         # refused because the queue was full
+            "timed_out": 0,        # gave up after QUEUE_TIMEOUT_SECONDS
+            "max_depth": 0,
+            "wait_seconds": 0.0,   # total time admitted calls spent queued
+            "max_wait_seconds": 0.0,
+            "batches": 0,          # embed requests sent
+            "batched_inputs": 0,   # texts embedded by them
+            "batched_calls": 0,    # embed calls they served
+        }
+
+    # --- Queue ---
+
+    def _admit_locked(self, waited):
+        self._active += 1
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+
+    def _enqueue(self, user, wake):
+        # None when a slot is free and nobody is waiting, else the queued _Waiter
+        with self._lock:
+            if self._active < self.max_concurrent and not self._depth:
+                self._admit_locked(0.0)
+                return None
+            # user None is shared work (e.g. embeddings), bounded by the global limit only
+            if (self._depth >= self.max_queued or user is not None
+                    and len(self._queues.get(user, ())) >= self.max_queued_per_user):
+                self.stats["rejected"] += 1
+                raise LLMBusy(BUSY_MESSAGE)
+            waiter = _Waiter(user, wake)
+            self._queues.setdefault(user, deque()).append(waiter)
+            self._depth += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], self._depth)
+            return waiter
+
+    def _dispatch_locked(self):
+        # Round robin: the user at the front gets one slot, then goes to the back
+        while self._active < self.max_concurrent and self._queues:
+            user, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self._depth -= 1
+            waiter.granted = True
+            self._admit_locked(time.perf_counter() - waiter.queued_at)
+            waiter.wake()
+
+    def _abandon(self, waiter):
+        # Timeout or cancellation: True if the waiter left the queue without a slot
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiters = self._queues[waiter.user]
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[waiter.user]
+            self._depth -= 1
+            return True
+
+    def _time_out(self, waiter):
+        if self._abandon(waiter):
+            with self._lock:
+                self.stats["timed_out"] += 1
+            raise LLMBusy(BUSY_MESSAGE)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch_locked()
+
+    @contextmanager
+    def slot(self, user=None):
+        # Blocking: holds one model slot for the body of the with block
+        event = threading.Event()
+        waiter = self._enqueue(user, event.set)
+        if waiter is not None and not event.wait(self.queue_timeout):
+            self._time_out(waiter)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, user=None):
+        # Asyncio twin of slot(); waiting does not block the event loop
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(user, wake)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._time_out(waiter)
+            except asyncio.CancelledError:
+                # Client went away: leave the queue, or hand back a slot just granted
+                if not self._abandon(waiter):
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    # --- Embed micro-batching ---
+
+    def embed(self, client, model, texts, user=None):
+        # client.embed(model, texts), shared with other calls arriving within the batch window
+        request = {"texts": list(texts), "done": threading.Event(), "vectors": None, "error": None}
+        with self._lock:
+            batch = self._batches.get(model)
+            leader = batch is None
+            if leader:
+                batch = self._batches[model] = {"requests": [], "inputs": 0, "full": threading.Event()}
+            batch["requests"].append(request)
+            batch["inputs"] += len(request["texts"])
+            if batch["inputs"] >= self.batch_max_inputs:
+                # Closed to newcomers; the leader sends it now
+                del self._batches[model]
+                batch["full"].set()
+
+        if not leader:
+            request["done"].wait()
+        else:
+            batch["full"].wait(self.batch_window)
+            with self._lock:
+                if self._batches.get(model) is batch:
+                    del self._batches[model]
+                requests = batch["requests"]
+                self.stats["batches"] += 1
+                self.stats["batched_inputs"] += batch["inputs"]
+                self.stats["batched_calls"] += len(requests)
+            try:
+                with self.slot(user):
+                    vectors = client.embed(model, [text for r in requests for text in r["texts"]])
+                start = 0
+                for r in requests:
+                    r["vectors"] = vectors[start:start + len(r["texts"])]
+                    start += len(r["texts"])
+            except Exception as e:
+                for r in requests:
+                    r["error"] = e
+            finally:
+                for r in requests:
+                    r["done"].set()
+
+        if request["error"] is not None:
+            raise request["error"]
+        return request["vectors"]
+
+    # --- Metrics ---
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self.stats)
+            snapshot.update(
+                depth=self._depth,
+                active=self._active,
+                waiting_users=len(self._queues),
+                max_concurrent=self.max_concurrent,
+            )
+        admitted = snapshot["admitted"]
+        snapshot["avg_wait_seconds"] = snapshot["wait_seconds"] / admitted if admitted else 0.0
+        return snapshot
+
+
+# --- Scheduled clients ---
+
+class ScheduledClient:
+    # OllamaClient whose calls are admitted by the scheduler on behalf of one user
+    def __init__(self, scheduler, client, user=None):
+        self.scheduler = scheduler
+        self.client = client
+        self.user = user
+
+    def chat(self, model, messages, **kwargs):
+        with self.scheduler.slot(self.user):
+            return self.client.chat(model, messages, **kwargs)
+
+    def chat_stream(self, model, messages, **kwargs):
+        # The slot is held until the stream ends or the consumer stops reading
+        with self.scheduler.slot(self.user):
+            yield from self.client.chat_stream(model, messages, **kwargs)
+
+    def embed(self, model, texts, keep_alive=None):
+        return self.scheduler.embed(self.client, model, texts, self.user)
+
+
+class AsyncScheduledClient:
+    def __init__(self, scheduler, client, user=None):
+        self.scheduler = scheduler
+        self.client = client
+        self.user = user
+
+    async def chat(self, model, messages, **kwargs):
+        async with self.scheduler.aslot(self.user):
+            return await self.client.chat(model, messages, **kwargs)
+
+    async def chat_stream(self, model, messages, **kwargs):
+        async with self.scheduler.aslot(self.user):
+            async for token in self.client.chat_stream(model, messages, **kwargs):
+                yield token
+
+    async def embed(self, model, texts, keep_alive=None):
+        async with self.scheduler.aslot(self.user):
+            return await self.client.embed(model, texts, keep_alive)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    # One scheduler per process: the limit is on this process's calls to the server
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
+
+
+def scheduled_client(user=None, host=OLLAMA_HOST):
+    return ScheduledClient(get_scheduler(), get_client(host), user)
+
+
+def async_scheduled_client(user=None, host=OLLAMA_HOST):
+    return AsyncScheduledClient(get_scheduler(), get_async_client(host), user)
@@ -1,109 +1,106 @@
 # bank_app.py
 
+import os
 import streamlit as st
 import sqlite3
-import bcrypt
-import json
-import requests
+import time
 from datetime import datetime
+from context_window import message_tokens, new_summary_state, load_summary_state
+from response_cache import get_response_cache
+from llm_scheduler import get_scheduler
+from faq import get_faq_index
+from account_cache import get_account_cache
+from chat_service import (
+    OLLAMA_HOST, OLLAMA_MODEL, SYSTEM_PROMPT,
+    context_messages, direct_answer, generate_ollama_response, stream_cached_response,
+)
+from warmup import start_warmup, warmup_stats
+import chat_store
+from connections import get_connection
+from create_professional_db import DB as PROFESSIONAL_DB
+from account_queries import has_table
+from aggregates import latest_months
+from ledger import LedgerError, format_minor, to_minor
+from transaction_history import HISTORY_PAGE_SIZE, PinLocked, fetch_history, format_history, unlock_account
+from auth import AuthBusy, get_password_hasher
 
 # --- Configuration ---
 DB_NAME = 'bank_chatbot.db'
-OLLAMA_URL = 'http://localhost:11434/api/generate'
-OLLAMA_MODEL = 'llama3' # Change this to your model name
+# The Ollama host and model are set in chat_service.py
+# Render answers token by token instead of waiting for the full completion
+STREAM_RESPONSES = True
+SIDEBAR_PAGE_SIZE = 20 # past conversations listed per "Load more"
+# Transaction history is read from the core-banking schema (create_professional_db.py)
+HISTORY_DB = PROFESSIONAL_DB
 
 # --- Database Helpers ---
-def get_db_connection():
-    return sqlite3.connect(DB_NAME)
+def get_db_connection(readonly=False):
+    # Pooled, WAL-mode connection (see connections.py); conn.close() returns it to the pool
+    return get_connection(DB_NAME, readonly)
 
 def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt)
+    # bcrypt runs on the shared bounded pool in auth.py, not the script thread
+    return get_password_hasher().hash(password)
 
 def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    return get_password_hasher().verify(password, hashed)
 
-# --- Ollama / AI Logic ---
+# --- Login Sessions ---
+# A login lasts as long as this session's server-side state: a websocket
+# reconnect keeps it, a full page reload asks for the password again.
+# Reusable bearer tokens (auth.issue_token) are only handed to API clients.
 
-# In a real RAG setup, this context would be retrieved from a vector database.
-# For simplicity, we hardcode banking knowledge here.
-BANKING_KNOWLEDGE = (
-    "A standard transaction fee is $1.00. "
-    "The maximum daily ATM withdrawal limit is $500. "
-    "Loan interest rates start at 4.5%. "
-    "Overdraft fees are $35. "
-)
+def logout():
+    st.session_state.clear()
 
-def generate_ollama_response(user_prompt, chat_history):
-    # This acts as your RAG/Guardrail logic
-    system_prompt = (
-        "You are a helpful and secure bank chatbot. "
-        "Your current knowledge base is: " + BANKING_KNOWLEDGE + " "
-        "Answer the user's question based on your banking knowledge and previous conversation. "
-        "If the question is completely unrelated to banking, respond strictly with: 'I can only assist with bank-related inquiries, such as transactions, accounts, and loan information.' "
+# --- Ollama / AI Logic ---
+# Prompt building, streaming and caching live in chat_service.py so the
+# API (api.py) answers exactly like this app does.
+
+def get_context_messages(history):
+    context, st.session_state["context_summary"] = context_messages(
+        history, st.session_state["context_summary"], st.session_state["user_id"]
     )
-    
-    # Simple history formatting (Ollama expects a list of messages)
-    history_messages = [
-        {"role": "system", "content": system_prompt},
-        # Add past messages
-        *[{"role": msg['role'], "content": msg['content']} for msg in chat_history],
-        {"role": "user", "content": user_prompt}
-    ]
-
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": history_messages,
-        "stream": False # Set to True if you want streaming response
-    }
+    return context
 
-    try:
-        response = requests.post(OLLAMA_URL, json=payload)
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        return response.json()['message']['content']
-    except requests.exceptions.RequestException as e:
-        return f"Sorry, the AI service is unavailable. Error: {e}"
+def record_latency(timings):
+    # Keep the last 50 turns of latency so TTFT can be compared across models
+    log = st.session_state.setdefault("latency_log", [])
+    log.append(timings)
+    del log[:-50]
 
 # --- Chat History Management ---
 
-def save_chat_session(user_id, topic, messages):
+def save_chat_session(user_id, topic, messages, summary_state=None):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Convert list of messages to JSON string for storage
-    messages_json = json.dumps(messages)
+    chat_store.ensure_schema(conn)
     
-    cursor.execute(
-        "INSERT INTO chat_history (user_id, topic, messages) VALUES (?, ?, ?)",
-        (user_id, topic, messages_json)
-    )
+    # Metadata row in chat_history, one row per message in chat_messages
+    session_id = chat_store.create_session(conn, user_id, topic, summary_state or new_summary_state())
+    chat_store.append_messages(conn, session_id, messages, 0)
     conn.commit()
     conn.close()
 
-def load_chat_sessions(user_id):
+def load_chat_session_list(user_id, pages):
+    # Sidebar listing: id/topic/timestamp only, one keyset page at a time
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, topic, messages FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC", 
-        (user_id,)
-    )
-    sessions = []
-    for row in cursor.fetchall():
-        # Convert messages from JSON string back to list
-        try:
-            messages = json.loads(row[2])
-        except (json.JSONDecodeError, TypeError):
-            messages = []
-            
-        sessions.append({
-            'id': row[0],
-            'topic': row[1],
-            'messages': messages
-        })
+    chat_store.ensure_schema(conn)
+    sessions, has_more = chat_store.list_sessions_pages(conn, user_id, pages, SIDEBAR_PAGE_SIZE)
     conn.close()
-    return sessions
+    return sessions, has_more
+
+def open_chat_session(session_id):
+    # Message bodies and the rolling summary are only read when a chat is opened
+    conn = get_db_connection()
+    messages = chat_store.load_messages(conn, session_id)
+    summary_state = load_summary_state(conn, session_id)
+    conn.close()
+    return messages, summary_state
 # bank_app.py (continued)
 
+# Model load and system-prompt prefill happen once per process, before the first question
+start_warmup(OLLAMA_MODEL, SYSTEM_PROMPT, OLLAMA_HOST)
+
 # --- Session State Initialization ---
 if "logged_in" not in st.session_state:
     st.session_state["logged_in"] = False
@@ -117,6 +114,20 @@ if "messages" not in st.session_state:
 # Stores the current chat name for saving
 if "current_chat_topic" not in st.session_state:
     st.session_state["current_chat_topic"] = "New Banking Chat"
+# Rolling summary of turns that fell out of the context window
+if "context_summary" not in st.session_state:
+    st.session_state["context_summary"] = new_summary_state()
+# Number of "Past Conversations" pages shown in the sidebar
+if "sidebar_pages" not in st.session_state:
+    st.session_state["sidebar_pages"] = 1
+# Transaction history: the unlocked account, its filters and the keyset
+# cursor of every page shown so far (the last one is the current page)
+if "history_account" not in st.session_state:
+    st.session_state["history_account"] = None
+if "history_filters" not in st.session_state:
+    st.session_state["history_filters"] = {}
+if "history_cursors" not in st.session_state:
+    st.session_state["history_cursors"] = [None]
 # Controls the main view (Dashboard vs. Banking Activities)
 if "current_view" not in st.session_state:
     st.session_state["current_view"] = "Dashboard"
@@ -152,6 +163,8 @@ def register_page():
                     st.success("Registration successful! Please log in.")
                 except sqlite3.IntegrityError:
                     st.error("Username already exists.")
+                except AuthBusy as e:
+                    st.error(str(e))
                 finally:
                     conn.close()
 
@@ -172,7 +185,12 @@ def login_page():
 
             if user_data:
                 user_id, hashed_pw = user_data
-                if check_password(password, hashed_pw):
+                try:
+                    valid = check_password(password, hashed_pw)
+                except AuthBusy as e:
+                    st.error(str(e))
+                    return
+                if valid:
                     st.session_state["logged_in"] = True
                     st.session_state["username"] = username
                     st.session_state["user_id"] = user_id
@@ -186,21 +204,14 @@ def login_page():
 # --- Banking Activities Pages ---
 
 def show_balance():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT balance FROM accounts WHERE user_id = ?", (st.session_state["user_id"],))
-    balance = cursor.fetchone()[0]
-    conn.close()
+    # Memory lookup; reloaded only after a write to this user's account (account_cache.py)
+    balance = get_account_cache(DB_NAME).get(st.session_state["user_id"])["balance"]
     
     st.subheader("💰 Account Balance")
     st.metric(label="Current Balance", value=f"${balance:,.2f}")
     
 def show_loan_info():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT loan_status FROM accounts WHERE user_id = ?", (st.session_state["user_id"],))
-    loan_status = cursor.fetchone()[0]
-    conn.close()
+    loan_status = get_account_cache(DB_NAME).get(st.session_state["user_id"])["loan_status"]
     
     st.subheader("🏦 Loan Information")
     st.info(f"Your current loan status: **{loan_status}**")
@@ -212,13 +223,116 @@ def show_atm_info():
     st.write("Closest ATM: 123 Main St (Open 24/7).")
     st.caption("Daily withdrawal limit is $500.")
 
+def load_history_page(account_id, filters, before):
+    conn = get_connection(HISTORY_DB, readonly=True)
+    page = fetch_history(conn, account_id, filters, before, HISTORY_PAGE_SIZE)
+    conn.close()
+    return page
+
+def unlock_history_account():
+    with st.form("history_account_form"):
+        account_no = st.text_input("Account Number")
+        pin = st.text_input("PIN", type="password")
+        if st.form_submit_button("Show Transactions"):
+            conn = get_connection(HISTORY_DB, readonly=True)
+            try:
+                account = unlock_account(conn, account_no, pin, st.session_state["user_id"])
+            except PinLocked as e:
+                st.error(str(e))
+                return
+            finally:
+                conn.close()
+            if account is None:
+                st.error("Incorrect account number or PIN.")
+                return
+            st.session_state["history_account"] = account
+            st.session_state["history_cursors"] = [None]
+            st.rerun()
+
+def history_filters():
+    # Filters from the widgets; amounts are typed in rupees and compared in paise
+    col1, col2, col3, col4, col5 = st.columns(5)
+    date_from = col1.date_input("From", value=None)
+    date_to = col2.date_input("To", value=None)
+    txn_type = col3.selectbox("Type", ["All", "credit", "debit"])
+    min_amount = col4.text_input("Min amount")
+    max_amount = col5.text_input("Max amount")
+    filters = {"date_from": date_from, "date_to": date_to,
+               "txn_type": txn_type if txn_type != "All" else None}
+    try:
+        filters["min_amount"] = to_minor(min_amount) if min_amount.strip() else None
+        filters["max_amount"] = to_minor(max_amount) if max_amount.strip() else None
+    except LedgerError as e:
+        st.error(str(e))
+        return None
+    return filters
+
+def load_month_summary(account_id):
+    # Latest two months from the aggregates (aggregates.py): two primary-key rows
+    conn = get_connection(HISTORY_DB, readonly=True)
+    months = latest_months(conn, account_id, 2) if has_table(conn, "monthly_totals") else []
+    conn.close()
+    return months
+
+def open_spending_source():
+    # (connection, account_id) for the account unlocked under Transactions, else None
+    account = st.session_state["history_account"]
+    if account is None:
+        return None
+    return get_connection(HISTORY_DB, readonly=True), account[0]
+
+def show_month_summary(account_id):
+    months = load_month_summary(account_id)
+    if not months:
+        return
+    latest, previous = months[0], (months[1] if len(months) > 1 else None)
+    col1, col2, col3 = st.columns(3)
+    col1.metric(f"Spent in {latest['month']}", f"₹{format_minor(latest['debits'])}",
+                delta=f"₹{format_minor(latest['debits'] - previous['debits'])}" if previous else None,
+                delta_color="inverse")
+    col2.metric(f"Received in {latest['month']}", f"₹{format_minor(latest['credits'])}")
+    if latest["end_balance"] is not None:
+        col3.metric("Balance at month end", f"₹{format_minor(latest['end_balance'])}")
+
 def show_transaction():
     st.subheader("💸 Transactions")
-    # In a real app, this would query a transactions table
-    st.dataframe([
-        {"Date": "2024-12-01", "Type": "Deposit", "Amount": "+$500.00"},
-        {"Date": "2024-12-03", "Type": "ATM Withdrawal", "Amount": "-$100.00"},
-    ])
+    if not os.path.exists(HISTORY_DB):
+        st.info(f"No core-banking data yet; run create_professional_db.py to create {HISTORY_DB}.")
+        return
+    account = st.session_state["history_account"]
+    if account is None:
+        unlock_history_account()
+        return
+    account_id, account_no = account
+    st.caption(f"Account {account_no}")
+    show_month_summary(account_id)
+
+    filters = history_filters()
+    if filters is None:
+        return
+    # New filters start again from the newest page
+    if filters != st.session_state["history_filters"]:
+        st.session_state["history_filters"] = filters
+        st.session_state["history_cursors"] = [None]
+
+    cursors = st.session_state["history_cursors"]
+    rows, next_cursor = load_history_page(account_id, filters, cursors[-1])
+    if rows:
+        st.dataframe(format_history(rows), use_container_width=True)
+    else:
+        st.info("No transactions match these filters.")
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button("⬅️ Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)}")
+    if col3.button("Older ➡️", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    if st.button("Use another account"):
+        st.session_state["history_account"] = None
+        st.rerun()
     
 # --- Main Chatbot Interface ---
 def chatbot_interface():
@@ -240,13 +354,45 @@ def chatbot_interface():
 
         # Generate and display AI response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Pass *full* history to Ollama for context
-                full_history = st.session_state["messages"] 
-                response = generate_ollama_response(prompt, full_history) 
-            
-            st.markdown(response)
-            
+            # Account questions are answered from the database and routine
+            # FAQ questions from the precompiled index; neither needs the LLM
+            start = time.perf_counter()
+            conn = get_db_connection(readonly=True)
+            spending_source = open_spending_source()
+            direct, source = direct_answer(prompt, conn, st.session_state["user_id"], spending_source)
+            conn.close()
+            if spending_source is not None:
+                spending_source[0].close()
+            if direct is not None:
+                response = direct
+                elapsed = time.perf_counter() - start
+                record_latency({
+                    "ttft": elapsed, "total": elapsed, "prompt_tokens": 0,
+                    "routed": source == "routed", "faq": source == "faq",
+                })
+                st.markdown(response)
+            else:
+                # Bounded context from the turns *before* this prompt (the
+                # prompt itself is added once by build_chat_messages). Built
+                # only here: folding older turns may call the summarizer model
+                context = get_context_messages(st.session_state["messages"][:-1])
+                prompt_tokens = sum(message_tokens(m) for m in context)
+                if STREAM_RESPONSES:
+                    timings = {"prompt_tokens": prompt_tokens}
+                    # st.write_stream renders tokens as they arrive and returns the full text
+                    response = st.write_stream(stream_cached_response(prompt, context, timings, st.session_state["user_id"]))
+                    record_latency(timings)
+                    st.caption(f"First token in {timings['ttft']:.2f}s · full answer in {timings['total']:.2f}s")
+                else:
+                    with st.spinner("Thinking..."):
+                        start = time.perf_counter()
+                        response = generate_ollama_response(prompt, context, st.session_state["user_id"])
+                        elapsed = time.perf_counter() - start
+                        # Without streaming the first token arrives with the last one
+                        record_latency({"ttft": elapsed, "total": elapsed, "prompt_tokens": prompt_tokens})
+
+                    st.markdown(response)
+
             # Add AI message to history
             st.session_state["messages"].append({"role": "assistant", "content": response})
 
@@ -254,7 +400,7 @@ def chatbot_interface():
 
 def main_dashboard():
     st.sidebar.title(f"Welcome, {st.session_state['username']}")
-    st.sidebar.button("Logout", on_click=lambda: st.session_state.clear() or st.rerun())
+    st.sidebar.button("Logout", on_click=logout)
 
     # Sidebar Navigation for Banking Activities
     st.sidebar.header("🏦 Banking Activities")
@@ -278,6 +424,50 @@ def main_dashboard():
     
     # AI Platform / Chat History Sidebar
     st.sidebar.header("🧠 AI Tools & History")
+
+    # Latency of recent answers (time-to-first-token is what users feel)
+    latency_log = st.session_state.get("latency_log", [])
+    if latency_log:
+        ttfts = sorted(t["ttft"] for t in latency_log)
+        max_prompt = max(t.get("prompt_tokens", 0) for t in latency_log)
+        st.sidebar.caption(
+            f"Median first token: {ttfts[len(ttfts) // 2]:.2f}s over {len(ttfts)} answers · "
+            f"largest history sent: {max_prompt} tokens"
+        )
+
+    # How much model time the FAQ index and response cache are saving
+    cache_stats = get_response_cache().stats
+    faq_stats = get_faq_index().stats
+    routed = sum(1 for t in latency_log if t.get("routed"))
+    st.sidebar.caption(
+        f"Answered from your account data: {routed} · "
+        f"FAQ answers: {faq_stats['hits']} · "
+        f"Answer cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+        f"{cache_stats['misses']} misses, {cache_stats['coalesced']} coalesced · "
+        f"{cache_stats['saved_seconds']:.1f}s of generation saved"
+    )
+
+    # Sign-in pool load (bcrypt runs off the script threads, see auth.py)
+    auth_stats = get_password_hasher().summary()
+    st.sidebar.caption(
+        f"Sign-ins: {auth_stats['completed']} checked, {auth_stats['pending']} waiting, "
+        f"avg queue wait {auth_stats['avg_wait_ms']:.0f} ms, {auth_stats['rejected'] + auth_stats['timed_out']} turned away"
+    )
+
+    # Model queue (llm_scheduler.py), shared by every session of this server
+    llm_stats = get_scheduler().metrics()
+    st.sidebar.caption(
+        f"Model calls: {llm_stats['active']}/{llm_stats['max_concurrent']} running, "
+        f"{llm_stats['depth']} waiting, avg wait {llm_stats['avg_wait_seconds'] * 1000:.0f} ms "
+        f"(max {llm_stats['max_wait_seconds']:.1f}s), "
+        f"{llm_stats['rejected'] + llm_stats['timed_out']} turned away"
+    )
+    warm = warmup_stats().get(OLLAMA_MODEL, {})
+    if warm.get("cold_seconds") is not None:
+        st.sidebar.caption(
+            f"Model warm-up: first call {warm['cold_seconds']:.2f}s, warm {warm['warm_seconds']:.2f}s · "
+            f"{warm['pings']} keep-warm pings"
+        )
     
     # "New Chat" button logic (Saves current chat and starts a new one)
     if st.sidebar.button("➕ New Banking Chat"):
@@ -286,27 +476,37 @@ def main_dashboard():
             save_chat_session(
                 st.session_state["user_id"], 
                 st.session_state["current_chat_topic"], 
-                st.session_state["messages"]
+                st.session_state["messages"],
+                st.session_state["context_summary"]
             )
             
         # 2. Reset session state for a new chat
         st.session_state["messages"] = []
+        st.session_state["context_summary"] = new_summary_state()
         st.session_state["current_chat_topic"] = f"New Banking Chat ({datetime.now().strftime('%H:%M')})"
         st.rerun()
     
     # History Loading
     st.sidebar.subheader("Past Conversations")
     
-    chat_sessions = load_chat_sessions(st.session_state["user_id"])
+    chat_sessions, has_more = load_chat_session_list(
+        st.session_state["user_id"], st.session_state["sidebar_pages"]
+    )
     
     for session in chat_sessions:
         # Button to load a past session
         if st.sidebar.button(f"🗓️ {session['topic']}", key=f"session_{session['id']}"):
             # Load the selected chat session
-            st.session_state["messages"] = session['messages']
+            messages, summary_state = open_chat_session(session['id'])
+            st.session_state["messages"] = messages
             st.session_state["current_chat_topic"] = session['topic']
+            st.session_state["context_summary"] = summary_state
             st.rerun()
 
+    if has_more and st.sidebar.button("Load more", key="load_more_sessions"):
+        st.session_state["sidebar_pages"] += 1
+        st.rerun()
+
 
 # --- Main Application Loop ---
 
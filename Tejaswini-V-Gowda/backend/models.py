@@ -1,57 +1,127 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
-from sqlalchemy.orm import declarative_base, relationship
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from sqlalchemy.orm import relationship
 
-Base = declarative_base()
+from database import Base
 
+# Mapped onto the schema created by create_professional_db.py
+# (bank_professional.db); column names follow that file exactly.
+# Relationships are loaded explicitly in repository.py (selectinload),
+# never one row at a time from a loop. Money columns are integer paise
+# (see ledger.py).
 
-# -------------------- USER TABLE -------------------- #
-class User(Base):
-    __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    email = Column(String, unique=True, nullable=False)
+# -------------------- BRANCH TABLE -------------------- #
+class Branch(Base):
+    __tablename__ = "branches"
 
-    accounts = relationship("Account", back_populates="user")
-    loans = relationship("Loan", back_populates="user")
+    branch_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(Text, nullable=False)
+    address = Column(Text)
+    ifsc = Column(Text, unique=True)
+
+    accounts = relationship("Account", back_populates="branch")
+
+
+# -------------------- CUSTOMER TABLE -------------------- #
+class Customer(Base):
+    __tablename__ = "customers"
+
+    customer_id = Column(Integer, primary_key=True, autoincrement=True)
+    full_name = Column(Text, nullable=False)
+    email = Column(Text, unique=True)
+    phone = Column(Text)
+    dob = Column(Text)
+    created_at = Column(Text)
+
+    accounts = relationship("Account", back_populates="customer")
+
+
+# -------------------- ACCOUNT TYPE TABLE -------------------- #
+class AccountType(Base):
+    __tablename__ = "account_types"
+
+    type_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(Text, nullable=False)
+    min_balance = Column(Integer, default=0)
+    interest_rate = Column(Float, default=0)
 
 
 # -------------------- ACCOUNT TABLE -------------------- #
 class Account(Base):
     __tablename__ = "accounts"
 
-    id = Column(Integer, primary_key=True)
-    account_number = Column(String, unique=True, nullable=False)
-    balance = Column(Float, default=0.0)
-
-    user_id = Column(Integer, ForeignKey("users.id"))
-    user = relationship("User", back_populates="accounts")
-
+    account_id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("customers.customer_id"), nullable=False)
+    branch_id = Column(Integer, ForeignKey("branches.branch_id"))
+    account_type_id = Column(Integer, ForeignKey("account_types.type_id"))
+    account_no = Column(Text, unique=True)
+    balance = Column(Integer, default=0)
+    opened_on = Column(Text)
+    status = Column(Text, default="Active")
+    pin = Column(Text)
+
+    customer = relationship("Customer", back_populates="accounts")
+    branch = relationship("Branch", back_populates="accounts")
+    account_type = relationship("AccountType")
+    cards = relationship("AtmCard", back_populates="account")
+    loans = relationship("Loan", back_populates="account")
     transactions = relationship("Transaction", back_populates="account")
 
 
-# -------------------- TRANSACTION TABLE -------------------- #
-class Transaction(Base):
-    __tablename__ = "transactions"
+# -------------------- ATM CARD TABLE -------------------- #
+class AtmCard(Base):
+    __tablename__ = "atm_cards"
 
-    id = Column(Integer, primary_key=True)
-    amount = Column(Float, nullable=False)
-    type = Column(String)  # deposit / withdraw / transfer
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    card_id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("accounts.account_id"), nullable=False)
+    card_no = Column(Text, unique=True)
+    cvv = Column(Text)
+    expiry = Column(Text)
+    status = Column(Text, default="Active")
+    pin = Column(Text)
 
-    account_id = Column(Integer, ForeignKey("accounts.id"))
-    account = relationship("Account", back_populates="transactions")
+    account = relationship("Account", back_populates="cards")
 
 
 # -------------------- LOAN TABLE -------------------- #
 class Loan(Base):
     __tablename__ = "loans"
 
-    id = Column(Integer, primary_key=True)
-    loan_type = Column(String)
-    amount = Column(Float)
+    loan_id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("accounts.account_id"), nullable=False)
+    loan_amount = Column(Integer, nullable=False)
     interest_rate = Column(Float)
+    term_months = Column(Integer)
+    remaining_amount = Column(Integer)
+    status = Column(Text, default="Active")
+    issued_on = Column(Text)
+
+    account = relationship("Account", back_populates="loans")
+
+
+# -------------------- TRANSACTION TABLE -------------------- #
+class Transaction(Base):
+    __tablename__ = "transactions"
+
+    txn_id = Column(Integer, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("accounts.account_id"), nullable=False)
+    txn_type = Column(String, nullable=False)  # credit / debit
+    amount = Column(Integer, nullable=False)
+    balance_after = Column(Integer)
+    narration = Column(Text)
+    created_at = Column(Text)
+
+    account = relationship("Account", back_populates="transactions")
+
+
+# -------------------- FUND TRANSFER TABLE -------------------- #
+class FundTransfer(Base):
+    __tablename__ = "fund_transfers"
 
-    user_id = Column(Integer, ForeignKey("users.id"))
-    user = relationship("User", back_populates="loans")
+    transfer_id = Column(Integer, primary_key=True, autoincrement=True)
+    from_account = Column(Integer, ForeignKey("accounts.account_id"), nullable=False)
+    to_account = Column(Integer, ForeignKey("accounts.account_id"), nullable=False)
+    amount = Column(Integer, nullable=False)
+    created_at = Column(Text)
+    status = Column(Text, default="Completed")
+    remark = Column(Text)
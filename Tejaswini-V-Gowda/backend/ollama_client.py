@@ -0,0 +1,232 @@
+# ollama_client.py
+# Shared Ollama HTTP client used by main.py and bank_main.py.
+#
+# One pooled, keep-alive session per process (so TCP setup is not paid on
+# every chat turn), connect/read timeouts (so a hung model call cannot hold a
+# Streamlit worker forever), bounded retries with jittered exponential
+# backoff, and `keep_alive` so the model stays resident between turns.
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Configuration ---
+OLLAMA_HOST = 'http://localhost:11434'
+CONNECT_TIMEOUT = 3.05   # seconds to establish the TCP connection
+READ_TIMEOUT = 120       # seconds between bytes; long enough for a cold model load
+MAX_RETRIES = 3          # retries after the first attempt
+BACKOFF_BASE = 0.5       # first retry waits up to 0.5s, then 1s, 2s, ...
+BACKOFF_MAX = 8.0
+POOL_SIZE = 10           # keep-alive connections kept open to the server
+KEEP_ALIVE = '30m'       # how long Ollama keeps the model loaded after a call
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class OllamaError(Exception):
+    """Raised when Ollama answers with an error payload or retries run out."""
+
+
+def backoff_delays(max_retries=MAX_RETRIES, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    # "Full jitter" backoff: spreads retries from many sessions apart
+    for attempt in range(max_retries):
+        yield random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _chat_payload(model, messages, stream, keep_alive, options):
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": keep_alive,
+    }
+    if options:
+        payload["options"] = options
+    return payload
+
+
+def _parse_stream_line(line):
+    # Ollama streams NDJSON: {"message": {"content": "..."}, "done": false}
+    chunk = json.loads(line)
+    if "error" in chunk:
+        raise OllamaError(chunk["error"])
+    return chunk.get("message", {}).get("content", ""), chunk.get("done", False)
+
+
+# --- Synchronous client (Streamlit scripts) ---
+
+class OllamaClient:
+    def __init__(self, host=OLLAMA_HOST, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 keep_alive=KEEP_ALIVE, pool_size=POOL_SIZE):
+        self.host = host.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+
+        self.session = requests.Session()
+        # Retries are handled in _post so streaming calls are only retried
+        # before the first byte arrives.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _post(self, path, payload, stream=False):
+        delays = backoff_delays(self.max_retries)
+        while True:
+            try:
+                response = self.session.post(
+                    self.host + path, json=payload, timeout=self.timeout, stream=stream
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                response.close()
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} from Ollama", response=response
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            delay = next(delays, None)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    def chat(self, model, messages, keep_alive=None, options=None):
+        payload = _chat_payload(model, messages, False, keep_alive or self.keep_alive, options)
+        data = self._post('/api/chat', payload).json()
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data['message']['content']
+
+    def chat_stream(self, model, messages, keep_alive=None, options=None):
+        payload = _chat_payload(model, messages, True, keep_alive or self.keep_alive, options)
+        with self._post('/api/chat', payload, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                token, done = _parse_stream_line(line)
+                if token:
+                    yield token
+                if done:
+                    break
+
+    def embed(self, model, texts, keep_alive=None):
+        # One request for the whole batch; returns a list of vectors
+        payload = {"model": model, "input": list(texts), "keep_alive": keep_alive or self.keep_alive}
+        data = self._post('/api/embed', payload).json()
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data["embeddings"]
+
+    def close(self):
+        self.session.close()
+
+
+# --- Asyncio client (API / async workers) ---
+
+class AsyncOllamaClient:
+    def __init__(self, host=OLLAMA_HOST, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 keep_alive=KEEP_ALIVE, pool_size=POOL_SIZE):
+        # httpx ships with the `ollama` package listed in requirements.txt
+        import httpx
+
+        self._httpx = httpx
+        self.host = host.rstrip('/')
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+        self.client = httpx.AsyncClient(
+            base_url=self.host,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _send(self, path, payload, stream=False):
+        httpx = self._httpx
+        delays = backoff_delays(self.max_retries)
+        while True:
+            try:
+                request = self.client.build_request('POST', path, json=payload)
+                response = await self.client.send(request, stream=stream)
+                if response.status_code not in RETRY_STATUSES:
+                    if response.is_error:
+                        await response.aclose()
+                    response.raise_for_status()
+                    return response
+                await response.aclose()
+                error = httpx.HTTPStatusError(
+                    f"{response.status_code} from Ollama", request=request, response=response
+                )
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                error = e
+
+            delay = next(delays, None)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    async def chat(self, model, messages, keep_alive=None, options=None):
+        payload = _chat_payload(model, messages, False, keep_alive or self.keep_alive, options)
+        response = await self._send('/api/chat', payload)
+        data = response.json()
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data['message']['content']
+
+    async def chat_stream(self, model, messages, keep_alive=None, options=None):
+        payload = _chat_payload(model, messages, True, keep_alive or self.keep_alive, options)
+        response = await self._send('/api/chat', payload, stream=True)
+        try:
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                token, done = _parse_stream_line(line)
+                if token:
+                    yield token
+                if done:
+                    break
+        finally:
+            await response.aclose()
+
+    async def embed(self, model, texts, keep_alive=None):
+        payload = {"model": model, "input": list(texts), "keep_alive": keep_alive or self.keep_alive}
+        response = await self._send('/api/embed', payload)
+        data = response.json()
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data["embeddings"]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# --- Shared instances ---
+# Streamlit re-runs the page script on every interaction but keeps imported
+# modules, so these clients (and their open connections) survive reruns.
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host=OLLAMA_HOST):
+    with _clients_lock:
+        if host not in _clients:
+            _clients[host] = OllamaClient(host)
+        return _clients[host]
+
+
+_async_clients = {}
+
+
+def get_async_client(host=OLLAMA_HOST):
+    # httpx.AsyncClient is bound to the event loop it was first used on
+    key = (host, id(asyncio.get_running_loop()))
+    if key not in _async_clients:
+        _async_clients[key] = AsyncOllamaClient(host)
+    return _async_clients[key]
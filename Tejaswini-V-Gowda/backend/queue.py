@@ -1,10 +0,0 @@
-from collections import deque
-q = deque()
-q.append(5)
-q.append(9)
-    
-    # check if queue is empty
-if not q:
-    print("Queue is empty")
-else:
-    print("Queue is not empty")
\ No newline at end of file
@@ -0,0 +1,174 @@
+# repository.py
+# Query layer over the professional schema (models.py / database.py).
+#
+# Every lookup here costs a fixed number of SQL round-trips however many
+# accounts, loans or transactions a customer has: related rows are fetched
+# with selectinload (one "WHERE ... IN (...)" query per relationship) and
+# "recent transactions" for all accounts come from a single windowed query,
+# instead of one lazy load per account inside a loop (N+1).
+#
+#   with SessionLocal() as session:
+#       overview = get_customer_overview(session, customer_id)
+#
+# The API serves customer_summary through account_cache.CoreAccountCache,
+# which drops it whenever one of the customer's accounts is written.
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import selectinload
+
+from models import Account, Customer, Loan, Transaction
+
+RECENT_TRANSACTIONS = 5
+
+
+# --- Reads ---
+
+def _customer_query():
+    return select(Customer).options(
+        selectinload(Customer.accounts).selectinload(Account.account_type),
+        selectinload(Customer.accounts).selectinload(Account.branch),
+        selectinload(Customer.accounts).selectinload(Account.loans),
+    )
+
+
+def recent_transactions(session, account_ids, limit=RECENT_TRANSACTIONS):
+    # Newest `limit` transactions per account in one query;
+    # returns {account_id: [Transaction, ...]} newest first
+    if not account_ids:
+        return {}
+    ranked = (
+        select(
+            Transaction.txn_id,
+            func.row_number().over(
+                partition_by=Transaction.account_id,
+                order_by=(Transaction.created_at.desc(), Transaction.txn_id.desc()),
+            ).label("rank"),
+        )
+        .where(Transaction.account_id.in_(account_ids))
+        .subquery()
+    )
+    rows = session.scalars(
+        select(Transaction)
+        .join(ranked, ranked.c.txn_id == Transaction.txn_id)
+        .where(ranked.c.rank <= limit)
+        .order_by(Transaction.account_id, ranked.c.rank)
+    ).all()
+    result = {account_id: [] for account_id in account_ids}
+    for txn in rows:
+        result[txn.account_id].append(txn)
+    return result
+
+
+def get_customers_overview(session, customer_ids, limit=RECENT_TRANSACTIONS):
+    # Customers -> accounts (type, branch, loans) -> recent transactions.
+    # Six queries in total (customers, accounts, types, branches, loans,
+    # transactions), for any number of customers.
+    customers = session.scalars(
+        _customer_query().where(Customer.customer_id.in_(customer_ids))
+    ).all()
+    account_ids = [a.account_id for c in customers for a in c.accounts]
+    transactions = recent_transactions(session, account_ids, limit)
+    return [
+        {
+            "customer": customer,
+            "accounts": [
+                {
+                    "account": account,
+                    "loans": account.loans,
+                    "recent_transactions": transactions[account.account_id],
+                }
+                for account in customer.accounts
+            ],
+        }
+        for customer in customers
+    ]
+
+
+def get_customer_overview(session, customer_id, limit=RECENT_TRANSACTIONS):
+    # Dashboard / chatbot view of one customer; None if unknown
+    overview = get_customers_overview(session, [customer_id], limit)
+    return overview[0] if overview else None
+
+
+def customer_summary(session, customer_id, limit=RECENT_TRANSACTIONS):
+    # get_customer_overview as plain dicts (API responses, account_cache);
+    # amounts in paise, None if the customer is unknown
+    overview = get_customer_overview(session, customer_id, limit)
+    if overview is None:
+        return None
+    customer = overview["customer"]
+    return {
+        "customer_id": customer.customer_id,
+        "full_name": customer.full_name,
+        "accounts": [
+            {
+                "account_no": item["account"].account_no,
+                "type": item["account"].account_type.name if item["account"].account_type else None,
+                "branch": item["account"].branch.name if item["account"].branch else None,
+                "balance": item["account"].balance,
+                "status": item["account"].status,
+                "loans": [
+                    {"status": loan.status, "loan_amount": loan.loan_amount,
+                     "remaining": loan.remaining_amount, "issued_on": loan.issued_on}
+                    for loan in item["loans"]
+                ],
+                "recent_transactions": [
+                    {"txn_id": txn.txn_id, "created_at": txn.created_at, "txn_type": txn.txn_type,
+                     "amount": txn.amount, "balance_after": txn.balance_after, "narration": txn.narration}
+                    for txn in item["recent_transactions"]
+                ],
+            }
+            for item in overview["accounts"]
+        ],
+    }
+
+
+def get_account_by_number(session, account_no):
+    return session.scalars(
+        select(Account)
+        .options(selectinload(Account.loans), selectinload(Account.account_type))
+        .where(Account.account_no == account_no)
+    ).first()
+
+
+def get_active_loans(session, customer_id):
+    return session.scalars(
+        select(Loan)
+        .join(Account, Account.account_id == Loan.account_id)
+        .where(Account.customer_id == customer_id, Loan.status == "Active")
+        .order_by(Loan.issued_on.desc())
+    ).all()
+
+
+# --- Bulk writes ---
+# Both run as one executemany statement instead of a flush per object.
+
+def bulk_insert_transactions(session, rows):
+    # rows: dicts with account_id, txn_type, amount, balance_after, narration, created_at.
+    # Raw import path: transfers between accounts go through ledger.post_transfers
+    if rows:
+        session.execute(insert(Transaction), rows)
+    return len(rows)
+
+
+def bulk_update_balances(session, balances):
+    # balances: {account_id: new_balance in paise}; ORM bulk UPDATE by primary key
+    if balances:
+        session.execute(
+            update(Account),
+            [{"account_id": account_id, "balance": balance} for account_id, balance in balances.items()],
+        )
+    return len(balances)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    from ledger import format_minor
+
+    with SessionLocal() as session:
+        for entry in get_customers_overview(session, [1, 2]):
+            print(entry["customer"].full_name)
+            for item in entry["accounts"]:
+                account = item["account"]
+                print(f"  {account.account_no}: {format_minor(account.balance)} "
+                      f"({len(item['loans'])} loans, {len(item['recent_transactions'])} recent transactions)")
@@ -0,0 +1,181 @@
+# response_cache.py
+# Two-tier cache for LLM answers with request coalescing.
+#
+# Keys are sha256(normalized prompt | model | knowledge version), so changing
+# the model or the banking knowledge automatically stops old answers from
+# being served. Tier 1 is an in-process LRU with TTL; tier 2 is a SQLite table
+# shared by every Streamlit server and worker on the host. While one session
+# is generating an answer, sessions asking the same thing wait for it instead
+# of starting a second generation.
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+CACHE_DB = 'llm_cache.db'
+MEMORY_ENTRIES = 512
+TTL_SECONDS = 24 * 3600
+COALESCE_WAIT_SECONDS = 120   # give up waiting on another session after this
+
+_PUNCT_RE = re.compile(r"[^\w\s$%.]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    # "What's the ATM limit??" and "what's the atm limit" share one entry
+    text = _PUNCT_RE.sub(" ", prompt.lower())
+    return _SPACE_RE.sub(" ", text).strip(" .")
+
+
+def knowledge_version(knowledge):
+    return hashlib.sha256(knowledge.encode('utf-8')).hexdigest()[:12]
+
+
+def cache_key(prompt, model, version):
+    raw = f"{normalize_prompt(prompt)}\x1f{model}\x1f{version}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path=CACHE_DB, max_entries=MEMORY_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()   # key -> (response, expires_at, gen_seconds)
+        self._lock = threading.Lock()
+        self._inflight = {}            # key -> threading.Event set when the leader finishes
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "saved_seconds": 0.0,      # model time the hits would have cost
+        }
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                gen_seconds REAL DEFAULT 0,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    # --- Lookups ---
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._count_hit("memory_hits", entry[2])
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, expires_at, gen_seconds FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._remember(key, row[0], row[1], row[2])
+            self._count_hit("disk_hits", row[2])
+        return row[0]
+
+    def put(self, key, response, gen_seconds=0.0):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at, gen_seconds)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, gen_seconds, expires_at) VALUES (?, ?, ?, ?)",
+                (key, response, gen_seconds, expires_at)
+            )
+            self._db.commit()
+
+    def _remember(self, key, response, expires_at, gen_seconds):
+        # Caller holds self._lock
+        self._memory[key] = (response, expires_at, gen_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _count_hit(self, tier, gen_seconds):
+        self.stats[tier] += 1
+        self.stats["saved_seconds"] += gen_seconds or 0.0
+
+    # --- Coalescing ---
+
+    def claim(self, key):
+        # Returns (cached_response, is_leader). A leader must call release()
+        # when done, even on failure, so waiting sessions are woken up.
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, False
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    return None, True
+                self.stats["coalesced"] += 1
+            if not event.wait(COALESCE_WAIT_SECONDS):
+                # The leader is stuck; generate independently rather than hang
+                with self._lock:
+                    self.stats["misses"] += 1
+                return None, False
+            # Leader finished: loop to read its answer (or lead if it failed)
+
+    def release(self, key, response=None, gen_seconds=0.0):
+        if response:
+            self.put(key, response, gen_seconds)
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event:
+            event.set()
+
+    def get_or_generate(self, key, generate):
+        # Non-streaming helper: generate() returns the text or raises
+        cached, leader = self.claim(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        response = None
+        try:
+            response = generate()
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            if leader:
+                self.release(key, response, elapsed)
+            elif response:
+                self.put(key, response, elapsed)
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    # One cache per process; Streamlit keeps imported modules across reruns
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,370 @@
+# retrieval.py
+# Local retrieval engine for the chatbot's RAG context.
+#
+# Policy documents in data/policies/ are split into overlapping chunks. Each
+# chunk is indexed twice: a BM25 inverted index (exact terms such as "$35" or
+# "overdraft") and a row in a float32 embedding matrix stored as .npy and
+# opened with mmap_mode='r', so the corpus can grow to thousands of documents
+# without the whole matrix being copied into every process. search() blends
+# both scores and returns the top-k chunks, so the prompt carries only the
+# context that is relevant to the question.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+from faq import tokenize
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, 'data', 'policies')
+UPLOAD_DIR = os.path.join(BASE_DIR, 'data', 'uploads')   # text extracted by ingestion.py
+INDEX_DIR = os.path.join(BASE_DIR, 'index')
+CORPUS_EXTENSIONS = ('.md', '.txt')
+
+CHUNK_WORDS = 80         # target chunk size
+CHUNK_OVERLAP = 20       # words repeated between neighbouring chunks
+TOP_K = 4
+HYBRID_ALPHA = 0.5       # weight of BM25 vs. vector similarity
+BM25_K1 = 1.2
+BM25_B = 0.75
+EMBED_DIM = 384
+LATENCY_BUDGET_MS = 20   # per-query target; slower queries are logged
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+# --- Chunking ---
+
+def split_paragraphs(text):
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            yield paragraph
+
+
+def chunk_paragraphs(paragraphs, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    # Paragraph-aware chunking: sentences are packed into chunks of about
+    # chunk_words words, and the tail of each chunk starts the next one.
+    # Works on any iterable of paragraphs, so large files can be streamed.
+    chunk, size = [], 0
+    for paragraph in paragraphs:
+        for sentence in _SENTENCE_RE.split(paragraph):
+            words = sentence.split()
+            if size and size + len(words) > chunk_words:
+                yield " ".join(chunk)
+                tail = " ".join(chunk).split()[-overlap:] if overlap else []
+                chunk, size = [" ".join(tail)] if tail else [], len(tail)
+            chunk.append(sentence)
+            size += len(words)
+    if chunk and size > 0:
+        yield " ".join(chunk)
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    return chunk_paragraphs(split_paragraphs(text), chunk_words, overlap)
+
+
+# --- Embedders ---
+
+class HashingEmbedder:
+    # Deterministic, dependency-free embeddings: signed feature hashing of
+    # word unigrams and bigrams. Good enough to rank a policy corpus, and
+    # needs no model server; swap in OllamaEmbedder for semantic matching.
+    name = f"hashing-{EMBED_DIM}"
+
+    def __init__(self, dim=EMBED_DIM):
+        self.dim = dim
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode('utf-8'))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize_rows(matrix)
+
+
+class OllamaEmbedder:
+    def __init__(self, model='nomic-embed-text', client=None):
+        # Concurrent query embeddings are merged into one request (llm_scheduler.py)
+        from llm_scheduler import scheduled_client
+
+        self.model = model
+        self.client = client or scheduled_client()
+        self.name = f"ollama-{model}"
+
+    def embed(self, texts):
+        return _normalize_rows(np.asarray(self.client.embed(self.model, texts), dtype=np.float32))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# --- Index build ---
+
+def corpus_files(corpus_dir=CORPUS_DIR, upload_dir=UPLOAD_DIR):
+    paths = []
+    for directory in (corpus_dir, upload_dir):
+        if os.path.isdir(directory):
+            paths.extend(
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith(CORPUS_EXTENSIONS)
+            )
+    return paths
+
+
+def corpus_version(paths, embedder_name):
+    digest = hashlib.sha256(embedder_name.encode('utf-8'))
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def build_index(corpus_dir=CORPUS_DIR, index_dir=INDEX_DIR, embedder=None, batch_size=64):
+    embedder = embedder or HashingEmbedder()
+    paths = corpus_files(corpus_dir)
+    chunks = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for text in chunk_text(f.read()):
+                chunks.append({"doc": os.path.basename(path), "text": text})
+
+    dim = embedder.embed(["dimension probe"]).shape[1]
+
+    def batches():
+        for start in range(0, len(chunks), batch_size):
+            yield embedder.embed([c["text"] for c in chunks[start:start + batch_size]])
+
+    return write_index(index_dir, chunks, batches(), dim, corpus_version(paths, embedder.name), embedder.name)
+
+
+def write_index(index_dir, chunks, vector_batches, dim, version, embedder_name):
+    # Embeddings are written batch by batch straight into the .npy file, then
+    # every file is swapped in atomically so readers never see a half index
+    os.makedirs(index_dir, exist_ok=True)
+    matrix_path = os.path.join(index_dir, 'embeddings.npy')
+    matrix = np.lib.format.open_memmap(
+        matrix_path + '.tmp', mode='w+', dtype=np.float32, shape=(len(chunks), dim)
+    )
+    row = 0
+    for vectors in vector_batches:
+        matrix[row:row + len(vectors)] = vectors
+        row += len(vectors)
+    matrix.flush()
+    del matrix
+
+    with open(os.path.join(index_dir, 'chunks.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(chunks, f)
+    meta = {"version": version, "embedder": embedder_name, "dim": dim, "chunks": len(chunks)}
+    with open(os.path.join(index_dir, 'meta.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    for name in ('embeddings.npy', 'chunks.json', 'meta.json'):
+        os.replace(os.path.join(index_dir, name + '.tmp'), os.path.join(index_dir, name))
+    return meta
+
+
+# --- Search ---
+
+class RetrievalIndex:
+    # The on-disk index is the "main" segment (memory-mapped, immutable).
+    # Chunks added at runtime by ingestion.py go to an in-memory "delta"
+    # segment that is searched together with it; save() merges both on disk.
+    # The delta keeps one vector matrix per batch, so adding is not a copy of
+    # everything added before it.
+
+    def __init__(self, index_dir=INDEX_DIR, embedder=None):
+        self.index_dir = index_dir
+        self.embedder = embedder or HashingEmbedder()
+        self.latencies_ms = deque(maxlen=200)
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._swap(self._read_segment())
+
+    def _read_segment(self):
+        # Everything search() needs from the files on disk, built without the lock
+        with open(os.path.join(self.index_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(self.index_dir, 'chunks.json'), encoding='utf-8') as f:
+            chunks = json.load(f)
+        # Read-only memory map: pages are shared between processes via the OS cache
+        embeddings = np.load(os.path.join(self.index_dir, 'embeddings.npy'), mmap_mode='r')
+
+        lengths = []
+        postings = defaultdict(lambda: ([], []))
+        for chunk_id, chunk in enumerate(chunks):
+            lengths.append(self._index_tokens(postings, chunk_id, chunk["text"]))
+        postings = {
+            token: (np.asarray(ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for token, (ids, tfs) in postings.items()
+        }
+        return meta, chunks, embeddings, postings, np.asarray(lengths, dtype=np.float32)
+
+    def _swap(self, segment):
+        # Make a freshly read main segment current, with an empty delta
+        self.meta, self.chunks, self.embeddings, self.postings, self.main_doc_len = segment
+        self.version = self.meta["version"]
+        self.dim = self.meta["dim"]
+        self.delta_postings = defaultdict(lambda: ([], []))
+        self.delta_batches = []     # one vector matrix per add_chunks call, never copied
+        self.delta_lengths = []
+        self._doc_len = self.main_doc_len
+
+    @staticmethod
+    def _index_tokens(postings, chunk_id, text):
+        counts = Counter(tokenize(text))
+        for token, tf in counts.items():
+            ids, tfs = postings[token]
+            ids.append(chunk_id)
+            tfs.append(tf)
+        return sum(counts.values())
+
+    # --- Incremental updates ---
+
+    def add_chunks(self, doc, texts, vectors=None):
+        # Embedding happens before taking the lock so searches are not blocked
+        if vectors is None:
+            vectors = self.embedder.embed(texts)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._add_locked(doc, texts, vectors)
+
+    def _add_locked(self, doc, texts, vectors):
+        # Batches are kept as a list; nothing already indexed is copied again
+        for text in texts:
+            chunk_id = len(self.chunks)
+            self.chunks.append({"doc": doc, "text": text})
+            self.delta_lengths.append(self._index_tokens(self.delta_postings, chunk_id, text))
+        self.delta_batches.append(vectors)
+        self._doc_len = None
+
+    @property
+    def doc_len(self):
+        # Lengths of every chunk, rebuilt on the first query after an add
+        with self._lock:
+            if self._doc_len is None:
+                self._doc_len = np.concatenate([
+                    self.main_doc_len, np.asarray(self.delta_lengths, dtype=np.float32)
+                ])
+            return self._doc_len
+
+    def save(self):
+        # Merge the delta segment into a new on-disk index and re-map it. The
+        # write and the re-read happen outside the lock so searches keep running
+        # on the current segments; only the swap at the end holds it.
+        with self._save_lock:
+            with self._lock:
+                chunks = list(self.chunks)
+                batches = [self.embeddings] + self.delta_batches
+            paths = corpus_files()
+            version = corpus_version(paths, self.embedder.name)
+            write_index(self.index_dir, chunks, batches, self.dim, version, self.embedder.name)
+            segment = self._read_segment()
+            with self._lock:
+                # Chunks added while writing go back into the new delta
+                added = self.chunks[len(chunks):]
+                added_batches = self.delta_batches[len(batches) - 1:]
+                self._swap(segment)
+                for vectors in added_batches:
+                    batch, added = added[:len(vectors)], added[len(vectors):]
+                    self._add_locked(batch[0]["doc"], [chunk["text"] for chunk in batch], vectors)
+
+    # --- Queries ---
+
+    def bm25_scores(self, query):
+        n = len(self.chunks)
+        scores = np.zeros(n, dtype=np.float32)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / (float(self.doc_len.mean()) or 1.0))
+        for token in set(tokenize(query)):
+            ids, tfs = self.postings.get(token, (None, None))
+            delta_ids, delta_tfs = self.delta_postings.get(token, ((), ()))
+            df = (len(ids) if ids is not None else 0) + len(delta_ids)
+            if df == 0:
+                continue
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            segments = [(ids, tfs)] if ids is not None else []
+            if delta_ids:
+                segments.append((np.asarray(delta_ids, dtype=np.int32), np.asarray(delta_tfs, dtype=np.float32)))
+            for seg_ids, seg_tfs in segments:
+                scores[seg_ids] += idf * seg_tfs * (BM25_K1 + 1) / (seg_tfs + length_norm[seg_ids])
+        return scores
+
+    def search(self, query, k=TOP_K):
+        start = time.perf_counter()
+        query_vector = self.embedder.embed([query])[0]
+        with self._lock:
+            if not self.chunks:
+                return []
+            bm25 = self.bm25_scores(query)
+            vector = np.concatenate(
+                [np.asarray(self.embeddings @ query_vector)]
+                + [vectors @ query_vector for vectors in self.delta_batches]
+            )
+
+            # Scale both signals to [0, 1] before blending
+            if bm25.max() > 0:
+                bm25 = bm25 / bm25.max()
+            vector = np.clip(vector, 0, None)
+            scores = HYBRID_ALPHA * bm25 + (1 - HYBRID_ALPHA) * vector
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = [
+                {"doc": self.chunks[i]["doc"], "text": self.chunks[i]["text"], "score": float(scores[i])}
+                for i in top if scores[i] > 0
+            ]
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.latencies_ms.append(elapsed_ms)
+        if elapsed_ms > LATENCY_BUDGET_MS:
+            logger.warning("Retrieval took %.1f ms (budget %d ms) for %r", elapsed_ms, LATENCY_BUDGET_MS, query)
+        return results
+
+    def context_for(self, query, k=TOP_K):
+        return "\n\n".join(result["text"] for result in self.search(query, k))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index(embedder=None):
+    # Loaded once per process; rebuilt only when the corpus or embedder changed
+    global _index
+    with _index_lock:
+        if _index is None:
+            embedder = embedder or HashingEmbedder()
+            expected = corpus_version(corpus_files(), embedder.name)
+            try:
+                with open(os.path.join(INDEX_DIR, 'meta.json'), encoding='utf-8') as f:
+                    current = json.load(f).get("version")
+            except (OSError, ValueError):
+                current = None
+            if current != expected:
+                build_index(embedder=embedder)
+            _index = RetrievalIndex(embedder=embedder)
+        return _index
+
+
+if __name__ == '__main__':
+    meta = build_index()
+    print(f"Indexed {meta['chunks']} chunks from {CORPUS_DIR} (version {meta['version']}).")
@@ -0,0 +1,107 @@
+# router.py
+# Deterministic fast path in front of the LLM.
+#
+# Questions about the customer's *own* account ("what's my balance", "is my
+# loan approved", "show my last transactions") are answered from the same
+# cached account summaries the Banking Activities views show (account_cache.py),
+# which are reloaded only after a write to that account. Spending
+# questions ("how much did I spend on groceries last month") and recent
+# transactions are answered from the core-banking database for the account
+# unlocked in the Transactions view. Only open-ended questions reach Ollama.
+#
+# A question is routed only when it names the customer's own account data
+# ("my balance", "my last transactions", "did I spend"); a keyword alone is
+# not enough. "What is my transaction fee" or "I want to close my account"
+# mention account words but are FAQ questions, and fee / ATM questions
+# always go to the FAQ.
+
+import re
+
+from account_cache import database_path, get_account_cache, get_core_account_cache
+from account_queries import has_table
+from aggregates import answer_spending
+from intents import classify
+
+ROUTED_INTENTS = ("balance", "loan", "transactions", "spending")
+# Answered by the FAQ even when phrased about "my" account
+FAQ_INTENTS = ("fees", "atm")
+
+# "my balance" is about this customer; "minimum balance" or "my account fee" is not
+_ACCOUNT_PHRASES = {
+    "balance": re.compile(r"\b(?:my|mine)\s+(?:\w+\s+){0,2}balances?\b|\bhow\s+much\s+money\s+(?:do\s+)?i\b"),
+    "loan": re.compile(r"\bmy\s+(?:\w+\s+){0,2}loans?\b"),
+    "transactions": re.compile(
+        r"\bmy\s+(?:\w+\s+){0,2}(?:transactions?|statements?|history|debits|credits)\b"),
+    "spending": re.compile(
+        r"\b(?:i|we)\s+(?:\w+\s+)?(?:spend|spent)\b|\bmy\s+(?:\w+\s+)?(?:spending|expenses?|expenditure)\b"),
+}
+# How to unlock an account, for transaction and spending questions asked without one
+UNLOCK_HINT = "open **'Transactions'** and enter your account number and PIN first"
+_RATE_RE = re.compile(r"\b(?:rate|rates|interest|apply|eligib\w*|requirement\w*)\b", re.IGNORECASE)
+
+
+def detect_account_intent(prompt):
+    # Returns "balance", "loan", "transactions" or "spending" for account questions, else None
+    ranked = [intent for intent, _ in classify(prompt)]
+    text = prompt.lower()
+    for intent in ranked:
+        if intent not in ROUTED_INTENTS or not _ACCOUNT_PHRASES[intent].search(text):
+            continue
+        # "my transaction fee", "my ATM limit": the FAQ answers those
+        if intent != "spending" and any(i in FAQ_INTENTS for i in ranked):
+            return None
+        # Questions about loan products go to the FAQ/LLM, not the DB
+        if intent == "loan" and _RATE_RE.search(prompt):
+            return None
+        return intent
+    return None
+
+
+def format_transactions(transactions):
+    lines = [f"- {t['Date']}: {t['Description']} ({t['Amount']})" for t in transactions]
+    return "Here are your most recent transactions:\n" + "\n".join(lines)
+
+
+def route(prompt, conn, user_id, spending_source=None, unlock_hint=UNLOCK_HINT):
+    # Returns an answer built from the database, or None to fall through.
+    # spending_source: (connection to bank_professional.db, account_id) of the
+    # account unlocked in the Transactions view, or None; unlock_hint says how
+    # to unlock one in the caller's interface
+    intent = detect_account_intent(prompt)
+    if intent is None or user_id is None:
+        return None
+
+    if intent == "transactions":
+        if spending_source is None:
+            return f"To see your transactions, {unlock_hint}."
+        history_conn, account_id = spending_source
+        # Memory lookup until the account is written to (account_cache.py)
+        summary = get_core_account_cache(database_path(history_conn)).account(account_id)
+        transactions = summary["recent"] if summary else []
+        if not transactions:
+            return "There are no recorded transactions on this account yet."
+        return format_transactions(transactions)
+
+    if intent == "spending":
+        if spending_source is None:
+            return f"To see your spending, {unlock_hint}."
+        history_conn, account_id = spending_source
+        # Databases from before the aggregates need create_professional_db.py run once
+        if not has_table(history_conn, "monthly_totals"):
+            return None
+        return answer_spending(history_conn, account_id, prompt)
+
+    # The same cached summary the Banking Activities views show
+    summary = get_account_cache(database_path(conn)).get(user_id)
+
+    if intent == "balance":
+        balance = summary["balance"]
+        if balance is None:
+            return None
+        return f"Your current available balance is **${balance:,.2f}**."
+
+    if intent == "loan":
+        loan_status = summary["loan_status"]
+        if loan_status is None:
+            return None
+        return f"Your current loan status is **{loan_status}**. Ask me about interest rates for details on new loans."
@@ -0,0 +1,342 @@
+# sql_fast_path.py
+# Template cache in front of the LangChain SQL agent (bank_agent_test.py).
+#
+# The agent answers a question with several LLM round-trips: list the
+# tables, read their schema, write SQL, maybe fix it, then phrase the answer.
+# This layer removes most of that:
+#
+#   * compact_schema() describes every table in one line each, computed once
+#     per schema version and handed to the agent with the question, so it
+#     can write SQL without the list/inspect tool calls.
+#   * After the agent answers, the SQL it ran is turned into a template: the
+#     literals that also appear in the question ('Alice Smith', 'Checking',
+#     1000) become ? parameters and slots in the question's shape
+#     ("what is the current balance for {0}'s account"). The template is kept
+#     only if it runs in the SQL sandbox (sql_sandbox.py): read-only, and
+#     without full scans of large tables.
+#   * The next question with the same shape - "What is the current balance
+#     for Bob Johnson's account?" - is answered by executing the template
+#     directly with the new values, without calling the LLM at all. A value
+#     outside the values the schema lists for its column ("closed" where
+#     account_type is Checking|Savings), or a result that is a single row of
+#     NULLs, goes to the agent instead.
+#
+# Templates are stored in llm_cache.db (shared by every process on the host)
+# and keyed by a fingerprint of the schema, so a schema change retires them.
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from connections import get_connection
+from sql_sandbox import QueryRejected, run_query
+
+# --- Configuration ---
+CACHE_DB = 'llm_cache.db'   # same file as response_cache.py
+MAX_ROWS = 50               # rows returned on the fast path
+MIN_FIXED_CHARS = 12        # a shape needs this much literal text around its slots
+SAMPLE_VALUES = 5           # distinct values listed for low-cardinality text columns
+
+_SPACE_RE = re.compile(r"\s+")
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+# Single-quoted SQL strings ('' is an escaped quote) and bare numbers
+_SQL_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")
+_SLOT_RE = re.compile(r"\{(\d+)\}")
+# The column a string literal is compared with: col = '...', t.col <> '...', col IN ('...', '...'
+_COMPARED_COLUMN_RE = re.compile(
+    r'"?(\w+)"?\s*(?:==?|!=|<>|\s+in\s*\((?:\s*\'(?:[^\']|\'\')*\'\s*,)*)\s*$', re.IGNORECASE
+)
+
+
+def normalize_question(question):
+    # Case and spacing only: slot values keep their meaning in the shape
+    text = _SPACE_RE.sub(" ", question.translate(_QUOTES)).strip()
+    return text.rstrip("?!. ")
+
+
+# --- Schema ---
+
+def compact_schema(conn, known_values=None):
+    # "accounts(account_id INTEGER PK, customer_name TEXT, balance REAL, account_type TEXT: Checking|Savings)"
+    # known_values, if given, is filled with {column: {lower-cased value: value as stored}}
+    # for the listed values (column names lower-cased; same-named columns share one list)
+    lines = []
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    for (table,) in tables:
+        columns = []
+        foreign = {row[3]: f"{row[2]}.{row[4]}" for row in conn.execute(f'PRAGMA foreign_key_list("{table}")')}
+        for _, name, col_type, _, _, pk in conn.execute(f'PRAGMA table_info("{table}")'):
+            column = f"{name} {col_type or 'ANY'}"
+            if pk:
+                column += " PK"
+            if name in foreign:
+                column += f" -> {foreign[name]}"
+            if (col_type or "").upper() == "TEXT" and not pk:
+                # Short value lists let the model spell filters the way the data does
+                values = conn.execute(
+                    f'SELECT DISTINCT "{name}" FROM "{table}" WHERE "{name}" IS NOT NULL LIMIT ?',
+                    (SAMPLE_VALUES + 1,)
+                ).fetchall()
+                if 0 < len(values) <= SAMPLE_VALUES and all(len(str(v[0])) <= 20 for v in values):
+                    column += ": " + "|".join(str(v[0]) for v in values)
+                    if known_values is not None:
+                        known_values.setdefault(name.lower(), {}).update(
+                            (str(v[0]).lower(), str(v[0])) for v in values
+                        )
+            columns.append(column)
+        lines.append(f"{table}({', '.join(columns)})")
+    return "\n".join(lines)
+
+
+def schema_fingerprint(schema):
+    return hashlib.sha256(schema.encode('utf-8')).hexdigest()[:12]
+
+
+# --- Templates ---
+
+def _unquote(literal):
+    return literal.replace("''", "'")
+
+
+def make_template(question, sql):
+    # (shape, parameterized sql, slots) or None when the SQL is not a plain SELECT.
+    # slots: [[position in the shape, LIKE prefix, LIKE suffix, "str" | "int" | "float",
+    #          column an exact string is compared with or None], ...] per ?
+    sql = sql.strip().rstrip(";").strip()
+    if not sql.lower().startswith(("select", "with")) or ";" in sql:
+        return None
+    shape = normalize_question(question)
+    lowered = shape.lower()
+    found = []          # literal text in the question -> slot number
+    slots, parts, last = [], [], 0
+    for match in _SQL_LITERAL_RE.finditer(sql):
+        text, number = match.group(1), match.group(2)
+        value = _unquote(text) if text is not None else number
+        core = value.strip("%")
+        # Whole words only: "10" must not match inside "101"
+        if not core or not re.search(r"(?<!\w)" + re.escape(core.lower()) + r"(?!\w)", lowered):
+            continue
+        if core.lower() not in found:
+            found.append(core.lower())
+        kind = "str" if text is not None else ("float" if "." in number else "int")
+        prefix = value[:len(value) - len(value.lstrip("%"))]
+        suffix = value[len(value.rstrip("%")):]
+        column = None
+        if text is not None and not prefix and not suffix:
+            compared = _COMPARED_COLUMN_RE.search(sql[:match.start()])
+            column = compared.group(1).lower() if compared else None
+        slots.append([found.index(core.lower()), prefix, suffix, kind, column])
+        parts.append(sql[last:match.start()])
+        parts.append("?")
+        last = match.end()
+    parts.append(sql[last:])
+
+    # Slots in the shape, longest literal first so "Alice Smith" wins over "Alice"
+    for index, core in sorted(enumerate(found), key=lambda item: -len(item[1])):
+        lowered_shape = shape.lower()
+        hit = re.search(r"(?<!\w)" + re.escape(core) + r"(?!\w)", lowered_shape)
+        if hit:
+            shape = shape[:hit.start()] + "{" + str(index) + "}" + shape[hit.end():]
+    placed = {int(slot) for slot in _SLOT_RE.findall(shape)}
+    if placed != set(range(len(found))):
+        # One literal swallowed by a longer one ("Alice" inside "Alice Smith")
+        return None
+    if found and len(_SLOT_RE.sub("", shape).strip()) < MIN_FIXED_CHARS:
+        return None
+    return shape, "".join(parts), slots
+
+
+def _shape_pattern(shape):
+    # "balance for {0}'s account" -> regex capturing the slot values
+    pattern, last, seen = "", 0, set()
+    for match in _SLOT_RE.finditer(shape):
+        pattern += re.escape(shape[last:match.start()])
+        slot = match.group(1)
+        pattern += f"(?P=s{slot})" if slot in seen else f"(?P<s{slot}>.+?)"
+        seen.add(slot)
+        last = match.end()
+    pattern += re.escape(shape[last:])
+    return re.compile("^" + pattern + "$", re.IGNORECASE)
+
+
+def bind(slots, values, known_values=None):
+    # Slot values captured from the question -> SQL parameters; text the
+    # schema listed is spelled as stored ("savings" -> "Savings"). Raises
+    # ValueError for a value the column cannot hold, including text outside
+    # a listed column's values ("closed" for account_type Checking|Savings).
+    known_values = known_values or {}
+    params = []
+    for slot in slots:
+        index, prefix, suffix, kind = slot[:4]
+        column = slot[4] if len(slot) > 4 else None     # templates stored before columns were recorded
+        value = values[index].strip()
+        if kind == "int":
+            value = int(value.replace(",", ""))
+        elif kind == "float":
+            value = float(value.replace(",", ""))
+        else:
+            domain = known_values.get(column)
+            if domain is not None and value.lower() not in domain:
+                raise ValueError(f"{value!r} is not a known {column}")
+            stored = domain.get(value.lower(), value) if domain else value
+            value = f"{prefix}{stored}{suffix}"
+        params.append(value)
+    return params
+
+
+def is_null_aggregate(rows):
+    # One row of NULLs: what SUM/AVG/MAX return when no row matched
+    return len(rows) == 1 and all(value is None for value in rows[0])
+
+
+def format_rows(columns, rows):
+    # Plain-text answer for the fast path (the agent's wording needs the LLM)
+    if not rows:
+        return "No matching records."
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{columns[0]}: {rows[0][0]}"
+    lines = [", ".join(f"{c}: {v}" for c, v in zip(columns, row)) for row in rows]
+    return "\n".join(lines)
+
+
+class SQLFastPath:
+    def __init__(self, db_path, cache_db=CACHE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._templates = []    # [(pattern, shape, sql, slots)], most used first
+        self.stats = {"hits": 0, "misses": 0, "learned": 0, "rejected": 0}
+
+        conn = get_connection(db_path, readonly=True)
+        self.known_values = {}
+        self.schema = compact_schema(conn, self.known_values)
+        conn.close()
+        self.fingerprint = schema_fingerprint(self.schema)
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(cache_db, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sql_templates (
+                fingerprint TEXT NOT NULL,
+                shape TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                slots TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (fingerprint, shape)
+            )
+        """)
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT shape, sql, slots FROM sql_templates WHERE fingerprint = ? ORDER BY hits DESC",
+            (self.fingerprint,)
+        ).fetchall()
+        self._templates = [(_shape_pattern(shape), shape, sql, json.loads(slots)) for shape, sql, slots in rows]
+
+    def agent_input(self, question):
+        # Question for the agent with the schema inline, so it can skip the inspection tools
+        return (f"Database schema (SQLite):\n{self.schema}\n\n"
+                f"Answer with one SELECT query against these tables.\n\nQuestion: {question}")
+
+    def lookup(self, question):
+        # (shape, sql, params) for a known question shape, else None
+        text = normalize_question(question)
+        with self._lock:
+            templates = list(self._templates)
+        for pattern, shape, sql, slots in templates:
+            match = pattern.match(text)
+            if match is None:
+                continue
+            values = {int(name[1:]): value for name, value in match.groupdict().items()}
+            try:
+                return shape, sql, bind(slots, values, self.known_values)
+            except ValueError:
+                continue
+        return None
+
+    def execute(self, sql, params):
+        # Through the sandbox: a template can never write, scan a large table or run long
+        result = run_query(self.db_path, sql, params, max_rows=MAX_ROWS)
+        return result["columns"], result["rows"]
+
+    def learn(self, question, sql):
+        # Store the agent's SQL as a template if it parameterizes and runs; returns the shape
+        template = make_template(question, sql)
+        if template is None:
+            self.stats["rejected"] += 1
+            return None
+        shape, template_sql, slots = template
+        pattern = _shape_pattern(shape)
+        match = pattern.match(normalize_question(question))
+        if match is None:
+            self.stats["rejected"] += 1
+            return None
+        values = {int(name[1:]): value for name, value in match.groupdict().items()}
+        try:
+            self.execute(template_sql, bind(slots, values, self.known_values))
+        except (sqlite3.Error, QueryRejected, ValueError):
+            self.stats["rejected"] += 1
+            return None
+
+        with self._lock:
+            self._templates = [t for t in self._templates if t[1] != shape]
+            self._templates.append((pattern, shape, template_sql, slots))
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sql_templates (fingerprint, shape, sql, slots, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.fingerprint, shape, template_sql, json.dumps(slots), time.time())
+            )
+            self._db.commit()
+        self.stats["learned"] += 1
+        return shape
+
+    def _count_hit(self, shape):
+        self.stats["hits"] += 1
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE sql_templates SET hits = hits + 1 WHERE fingerprint = ? AND shape = ?",
+                (self.fingerprint, shape)
+            )
+            self._db.commit()
+
+    def answer(self, question, run_agent):
+        # run_agent(agent_input) -> (answer text, SQL it executed or None).
+        # Returns {"answer", "source": "template" | "agent", "sql", "seconds"}.
+        start = time.perf_counter()
+        found = self.lookup(question)
+        if found is not None:
+            shape, sql, params = found
+            try:
+                columns, rows = self.execute(sql, params)
+            except (sqlite3.Error, QueryRejected):
+                rows = None     # e.g. a value the column cannot hold; let the agent try
+            # "SUM(balance): None" is not an answer either; the agent may read the question better
+            if rows is not None and not is_null_aggregate(rows):
+                self._count_hit(shape)
+                return {"answer": format_rows(columns, rows), "source": "template",
+                        "sql": sql, "params": params, "seconds": time.perf_counter() - start}
+
+        self.stats["misses"] += 1
+        answer, sql = run_agent(self.agent_input(question))
+        if sql:
+            self.learn(question, sql)
+        return {"answer": answer, "source": "agent", "sql": sql, "params": [],
+                "seconds": time.perf_counter() - start}
+
+
+def agent_sql(result):
+    # Last successful sql_db_query call in an AgentExecutor result
+    # (needs return_intermediate_steps=True)
+    sql = None
+    for action, observation in result.get("intermediate_steps", []):
+        if getattr(action, "tool", None) != "sql_db_query":
+            continue
+        if str(observation).lstrip().lower().startswith("error"):
+            continue
+        tool_input = action.tool_input
+        sql = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+    return sql
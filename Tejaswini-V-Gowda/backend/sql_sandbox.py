@@ -0,0 +1,212 @@
+# sql_sandbox.py
+# Bounded execution of model-written SQL (bank_agent_test.py, sql_fast_path.py).
+#
+# The toolkit's own sql_db_query tool runs any statement on a read-write
+# engine and pastes the whole result into the prompt, so one
+# "SELECT * FROM transactions" on a large database fills memory and the
+# context window. Here a query:
+#
+#   * runs on a read-only connection (mode=ro) behind an authorizer that
+#     allows reads only, so "WITH ... DELETE" fails as well;
+#   * is planned first with EXPLAIN QUERY PLAN, and refused if it would scan
+#     a whole table of more than MAX_SCAN_ROWS rows - a LIMIT or an aggregate
+#     does not change that, so the model gets the indexed columns back and is
+#     told to filter on one;
+#   * is read through the cursor in small batches and stopped at MAX_ROWS
+#     rows, MAX_BYTES of text or TIMEOUT_SECONDS of wall-clock time (a
+#     progress handler interrupts SQLite mid-statement). Values are clipped
+#     to MAX_VALUE_CHARS as they are read, so MAX_BYTES is what the rows
+#     really hold, and SQLite's length limit stops a single value such as
+#     randomblob(100000000) from being built at all;
+#   * comes back to the model as a short text summary that says whether, and
+#     why, it was cut off.
+
+import re
+import sqlite3
+import time
+
+from connections import get_connection
+
+# --- Configuration ---
+MAX_ROWS = 50               # rows handed back to the model
+MAX_BYTES = 8_000           # text handed back to the model
+MAX_VALUE_CHARS = 200       # longer text and blobs are clipped as they are read
+MAX_VALUE_BYTES = 1_000_000 # SQLite refuses to build a bigger string or blob
+MAX_SCAN_ROWS = 50_000      # full scans of bigger tables are refused
+TIMEOUT_SECONDS = 3.0       # wall-clock limit per query, planning included
+PROGRESS_OPS = 10_000       # SQLite VM steps between deadline checks
+FETCH_ROWS = 100            # rows pulled from the cursor at a time
+
+# Reads only: no writes, PRAGMA, ATTACH or transaction control
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                    getattr(sqlite3, "SQLITE_RECURSIVE", 33)}
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+# FROM / JOIN <table> [AS] <alias>, to map the plan's aliases back to tables
+_TABLE_REF_RE = re.compile(r'\b(?:from|join)\s+"?(\w+)"?(?:\s+(?:as\s+)?"?(\w+)"?)?', re.IGNORECASE)
+_NOT_ALIASES = {"where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+                "group", "order", "limit", "having", "union", "except", "intersect", "window"}
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _table_rows(conn, table, limit):
+    # Row estimate: ANALYZE's count when there is one, else a count that stops at limit
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        row = None      # never analyzed
+    if row and row[0]:
+        return int(row[0].split()[0])
+    return conn.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM "{table}" LIMIT ?)', (limit + 1,)).fetchone()[0]
+
+
+def _indexed_columns(conn, table):
+    # Leading columns of the table's indexes and its primary key - what a filter can use
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5] == 1]
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        first = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()
+        if first and first[2] and first[2] not in columns:
+            columns.append(first[2])
+    return columns
+
+
+def check_plan(conn, sql, params=(), max_scan_rows=MAX_SCAN_ROWS):
+    # Raise QueryRejected if the plan scans a whole table bigger than max_scan_rows
+    tables = {row[0].lower(): row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = dict(tables)
+    for table, alias in _TABLE_REF_RE.findall(sql):
+        if alias and alias.lower() not in _NOT_ALIASES and table.lower() in tables:
+            aliases[alias.lower()] = tables[table.lower()]
+    # The model's SQL is prepared under the authorizer; the lookups below are not
+    conn.set_authorizer(_authorize)
+    try:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    finally:
+        conn.set_authorizer(None)
+    for row in plan:
+        match = _SCAN_RE.match(row[3])
+        if match is None or match.group(1).lower() not in aliases:
+            continue    # SEARCH, SCAN CONSTANT ROW, a CTE or subquery
+        table = aliases[match.group(1).lower()]
+        rows = _table_rows(conn, table, max_scan_rows)
+        if rows > max_scan_rows:
+            indexed = ", ".join(_indexed_columns(conn, table)) or "none"
+            raise QueryRejected(
+                f"query reads every row of {table} (over {max_scan_rows:,} rows). "
+                f"Filter on an indexed column ({indexed}); a LIMIT or an aggregate still reads every row."
+            )
+
+
+def _clip(value):
+    # Rows keep at most MAX_VALUE_CHARS of any text or blob
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + "..."
+    if isinstance(value, bytes) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + b"..."
+    return value
+
+
+def _render(value):
+    text = "NULL" if value is None else str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS] + "..."
+
+
+def run_query(db_path, sql, params=(), max_rows=MAX_ROWS, max_bytes=MAX_BYTES,
+              timeout=TIMEOUT_SECONDS, max_scan_rows=MAX_SCAN_ROWS):
+    # One read-only SELECT under the limits above.
+    # Returns {"columns", "rows", "truncated": None | reason, "bytes", "seconds"};
+    # raises QueryRejected, or sqlite3.Error for SQL that does not run.
+    sql = sql.strip().rstrip(";").strip()
+    if not sql.lower().startswith(("select", "with")):
+        raise QueryRejected("only a single SELECT query is allowed.")
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    conn = get_connection(db_path, readonly=True)
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_OPS)
+    # Connection.setlimit is Python 3.11+; older versions keep SQLite's 1 GB default
+    length_limit = conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, MAX_VALUE_BYTES) if hasattr(conn, "setlimit") else None
+    cursor, columns, rows, size, truncated = None, [], [], 0, None
+    try:
+        try:
+            check_plan(conn, sql, params, max_scan_rows)
+            conn.set_authorizer(_authorize)
+            cursor = conn.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            size = len(" | ".join(columns)) + 1
+            while truncated is None:
+                batch = cursor.fetchmany(FETCH_ROWS)
+                if not batch:
+                    break
+                for row in batch:
+                    if len(rows) >= max_rows:
+                        truncated = "row limit"
+                        break
+                    row = tuple(_clip(v) for v in row)
+                    # Measured on the whole value kept (a blob prints about 4x its length)
+                    line = len(" | ".join("NULL" if v is None else str(v) for v in row).encode("utf-8")) + 1
+                    if size + line > max_bytes:
+                        truncated = "size limit"
+                        break
+                    rows.append(row)
+                    size += line
+        except sqlite3.OperationalError as e:
+            if time.monotonic() <= deadline:
+                raise
+            if not columns:
+                raise QueryRejected(f"query did not finish within {timeout:g} seconds.") from e
+            truncated = "time limit"     # keep the rows read so far
+    finally:
+        if cursor is not None:
+            cursor.close()      # reset the statement: a half-read one pins the WAL snapshot
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+        if length_limit is not None:
+            conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, length_limit)
+        conn.close()
+    return {"columns": columns, "rows": rows, "truncated": truncated, "bytes": size,
+            "seconds": time.perf_counter() - start}
+
+
+def summarize(result):
+    # Text for the model: header, rows and a note when the result was cut off
+    rows = result["rows"]
+    lines = [" | ".join(result["columns"])]
+    lines.extend(" | ".join(_render(v) for v in row) for row in rows)
+    if result["truncated"]:
+        lines.append(f"({len(rows)} rows shown, stopped at the {result['truncated']}; "
+                     f"narrow the filter on an indexed column for a complete answer)")
+    else:
+        lines.append(f"({len(rows)} rows)")
+    return "\n".join(lines)
+
+
+def query_tool(db_path):
+    # Drop-in replacement for the toolkit's sql_db_query tool (same name and
+    # argument, so sql_fast_path.agent_sql still finds the SQL it ran)
+    from langchain_core.tools import StructuredTool
+
+    def sql_db_query(query: str) -> str:
+        try:
+            return summarize(run_query(db_path, query))
+        except (QueryRejected, sqlite3.Error) as e:
+            return f"Error: {e}"
+
+    return StructuredTool.from_function(
+        func=sql_db_query,
+        name="sql_db_query",
+        description=(
+            "Execute one read-only SQLite SELECT query and get back at most "
+            f"{MAX_ROWS} rows. Queries that read every row of a table with over "
+            f"{MAX_SCAN_ROWS:,} rows are refused, even with a LIMIT or an aggregate; "
+            "filter on an indexed column instead. If the query is wrong, an "
+            "error is returned - rewrite it and try again."
+        ),
+    )
@@ -0,0 +1,149 @@
+# transaction_history.py
+# Transaction history for one account of bank_professional.db
+# (create_professional_db.py), newest first, with filters.
+#
+# Pages are keyset pages: the cursor is the (created_at, txn_id) of the last
+# row shown, and the next page continues strictly below it. With the index
+# idx_txn_account_time on (account_id, created_at, txn_id) every page - the
+# first, or the thousandth - is a short backwards range scan of one account's
+# index entries. OFFSET is never used: it would walk and throw away every
+# earlier row on each page.
+#
+# Unlocking an account takes its number and PIN. PINs are short, so
+# unlock_account() counts failures per account number and per signed-in user.
+# After MAX_PIN_FAILURES failures, each further one locks both out for
+# LOCKOUT_SECONDS, doubling up to MAX_LOCKOUT_SECONDS.
+
+import hmac
+import threading
+import time
+from datetime import date, timedelta
+
+from ledger import format_minor
+
+# --- Configuration ---
+HISTORY_PAGE_SIZE = 50
+TXN_TYPES = ("credit", "debit")
+MAX_PIN_FAILURES = 5        # failures allowed before lockouts start
+LOCKOUT_SECONDS = 30        # first lockout; doubles with every further failure
+MAX_LOCKOUT_SECONDS = 3600
+MAX_TRACKED = 100_000       # failure records kept; stale ones are pruned past this
+
+
+class PinLocked(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after     # seconds until the lockout ends
+
+
+def find_account(conn, account_no, pin):
+    # (account_id, account_no) when the number and PIN match, else None
+    row = conn.execute(
+        "SELECT account_id, account_no, pin FROM accounts WHERE account_no = ?", (account_no.strip(),)
+    ).fetchone()
+    stored = str(row[2]) if row is not None and row[2] is not None else ""
+    # Constant-time compare; a missing account costs the same as a wrong PIN
+    if not hmac.compare_digest(stored.encode('utf-8'), str(pin).strip().encode('utf-8')) or not stored:
+        return None
+    return row[0], row[1]
+
+
+# --- PIN attempts ---
+
+_failures = {}      # ("account", number) / ("user", id) -> [failures, locked_until, last_failure]
+_failures_lock = threading.Lock()
+
+
+def _record_failure(key, now):
+    entry = _failures.setdefault(key, [0, 0.0, now])
+    entry[0] += 1
+    entry[2] = now
+    if entry[0] >= MAX_PIN_FAILURES:
+        wait = LOCKOUT_SECONDS * 2 ** (entry[0] - MAX_PIN_FAILURES)
+        entry[1] = now + min(wait, MAX_LOCKOUT_SECONDS)
+
+
+def _prune(now):
+    for key in [k for k, e in _failures.items() if now - e[2] > MAX_LOCKOUT_SECONDS and e[1] <= now]:
+        del _failures[key]
+
+
+def unlock_account(conn, account_no, pin, user_id, now=None):
+    # find_account() with attempt limiting; raises PinLocked while either the
+    # account number or the user is locked out
+    now = time.time() if now is None else now
+    keys = (("account", account_no.strip()), ("user", user_id))
+    with _failures_lock:
+        locked_until = max((_failures[k][1] for k in keys if k in _failures), default=0.0)
+    if locked_until > now:
+        wait = int(locked_until - now) + 1
+        raise PinLocked(f"Too many incorrect attempts. Try again in {wait} seconds.", wait)
+
+    account = find_account(conn, account_no, pin)
+    with _failures_lock:
+        if account is None:
+            if len(_failures) >= MAX_TRACKED:
+                _prune(now)
+            for key in keys:
+                _record_failure(key, now)
+        else:
+            for key in keys:
+                _failures.pop(key, None)
+    return account
+
+
+def _where(account_id, filters, before):
+    # Filters: date_from / date_to (date or "YYYY-MM-DD", inclusive),
+    # txn_type ("credit" / "debit"), min_amount / max_amount (paise)
+    clauses, params = ["account_id = ?"], [account_id]
+    if filters.get("date_from"):
+        clauses.append("created_at >= ?")
+        params.append(str(filters["date_from"]))
+    if filters.get("date_to"):
+        # created_at carries a time of day, so the bound is the next midnight
+        clauses.append("created_at < ?")
+        params.append(str(date.fromisoformat(str(filters["date_to"])) + timedelta(days=1)))
+    if filters.get("txn_type") in TXN_TYPES:
+        clauses.append("txn_type = ?")
+        params.append(filters["txn_type"])
+    if filters.get("min_amount") is not None:
+        clauses.append("amount >= ?")
+        params.append(filters["min_amount"])
+    if filters.get("max_amount") is not None:
+        clauses.append("amount <= ?")
+        params.append(filters["max_amount"])
+    if before is not None:
+        clauses.append("(created_at, txn_id) < (?, ?)")
+        params.extend(before)
+    return " AND ".join(clauses), params
+
+
+def fetch_history(conn, account_id, filters=None, before=None, limit=HISTORY_PAGE_SIZE):
+    # One page of transactions, newest first.
+    # Returns (rows, cursor for the next page or None).
+    where, params = _where(account_id, filters or {}, before)
+    rows = conn.execute(
+        "SELECT txn_id, created_at, txn_type, amount, balance_after, narration FROM transactions "
+        f"WHERE {where} ORDER BY created_at DESC, txn_id DESC LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    page = [
+        {"txn_id": r[0], "created_at": r[1], "txn_type": r[2], "amount": r[3],
+         "balance_after": r[4], "narration": r[5]}
+        for r in rows[:limit]
+    ]
+    cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return page, cursor
+
+
+def format_history(rows):
+    # Rows for st.dataframe, amounts in rupees
+    return [
+        {
+            "Date": r["created_at"].replace("T", " ")[:16],
+            "Description": r["narration"] or "",
+            "Amount": ("+" if r["txn_type"] == "credit" else "-") + format_minor(r["amount"]),
+            "Balance": format_minor(r["balance_after"]) if r["balance_after"] is not None else "",
+        }
+        for r in rows
+    ]
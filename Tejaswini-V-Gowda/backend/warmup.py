@@ -0,0 +1,159 @@
+# warmup.py
+# Model warm-up at startup and keep-warm pings while the chat is idle.
+#
+# The first chat after a deploy (or after Ollama unloads an idle model)
+# waits for the model to load and then for the whole system prompt to be
+# prefilled. start_warmup() runs one ModelWarmer per model in a daemon
+# thread:
+#
+#   * at startup it sends a one-token request on the real system prompt
+#     with keep_alive=WARM_KEEP_ALIVE, so the model is loaded and the
+#     prompt's prefix is already processed before the first user arrives.
+#     The system prompts in chat_service.py, bank_main.py and
+#     frontend/streamlit_app.py are constants (retrieved context goes in the
+#     user turn), so every chat shares that prefix byte for byte and the
+#     server can reuse it;
+#   * it sends the same request again and records both times. The first is
+#     the cold start (load + prefill) when the model was not resident, the
+#     second is what a warm model costs;
+#   * then, whenever no model call went through the scheduler for
+#     KEEP_WARM_INTERVAL_SECONDS, it pings again. This keeps the model
+#     resident and re-arms the long keep_alive that ordinary chat calls
+#     shorten.
+#
+# Pings go through llm_scheduler.py like any other call and never wait
+# behind users: a ping that finds the queue busy is skipped.
+#
+#   python warmup.py --unload      # measure cold vs warm once and exit
+
+import argparse
+import sys
+import threading
+import time
+
+import requests
+
+from llm_scheduler import LLMBusy, get_scheduler, scheduled_client
+from ollama_client import OLLAMA_HOST, OllamaError, get_client
+
+# --- Configuration ---
+WARM_KEEP_ALIVE = '24h'            # how long Ollama keeps the model after a warm-up or ping
+KEEP_WARM_INTERVAL_SECONDS = 600   # idle time before a keep-warm ping
+PING_PROMPT = "Reply with OK."
+PING_OPTIONS = {"num_predict": 1, "temperature": 0}
+
+
+class ModelWarmer:
+    def __init__(self, model, system_prompt, host=OLLAMA_HOST, interval=KEEP_WARM_INTERVAL_SECONDS):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.host = host
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            "cold_seconds": None,     # first warm-up request: load + prefill if not resident
+            "warm_seconds": None,     # the same request again, model and prefix warm
+            "warmed_at": None,
+            "pings": 0,
+            "skipped": 0,             # pings not sent because users were waiting
+            "failed": 0,
+            "last_ping_seconds": None,
+        }
+
+    def ping(self):
+        # One-token answer on the real system prompt; returns seconds taken
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": PING_PROMPT},
+        ]
+        start = time.perf_counter()
+        scheduled_client(None, self.host).chat(
+            self.model, messages, keep_alive=WARM_KEEP_ALIVE, options=PING_OPTIONS
+        )
+        return time.perf_counter() - start
+
+    def warm_up(self):
+        self.stats["cold_seconds"] = self.ping()
+        self.stats["warm_seconds"] = self.ping()
+        self.stats["warmed_at"] = time.time()
+
+    def _keep_warm(self):
+        try:
+            self.warm_up()
+        except (LLMBusy, OllamaError, requests.exceptions.RequestException):
+            self.stats["failed"] += 1
+        seen = get_scheduler().metrics()["admitted"]
+        while not self._stop.wait(self.interval):
+            metrics = get_scheduler().metrics()
+            if metrics["admitted"] != seen:
+                # Users kept the model busy this interval; no ping needed
+                seen = metrics["admitted"]
+                continue
+            if metrics["active"] or metrics["depth"]:
+                self.stats["skipped"] += 1
+                continue
+            try:
+                self.stats["last_ping_seconds"] = self.ping()
+                self.stats["pings"] += 1
+            except (LLMBusy, OllamaError, requests.exceptions.RequestException):
+                self.stats["failed"] += 1
+            seen = get_scheduler().metrics()["admitted"]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._keep_warm, name=f"warmup-{self.model}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_warmers = {}
+_warmers_lock = threading.Lock()
+
+
+def start_warmup(model, system_prompt, host=OLLAMA_HOST):
+    # Once per process and model; Streamlit reruns and extra calls return the running warmer
+    with _warmers_lock:
+        warmer = _warmers.get((host, model))
+        if warmer is None:
+            warmer = _warmers[(host, model)] = ModelWarmer(model, system_prompt, host)
+            warmer.start()
+        return warmer
+
+
+def warmup_stats():
+    with _warmers_lock:
+        return {model: dict(warmer.stats) for (_, model), warmer in _warmers.items()}
+
+
+def unload(model, host=OLLAMA_HOST):
+    # An empty chat with keep_alive 0 makes Ollama drop the model from memory
+    get_client(host).chat(model, [], keep_alive="0s")
+
+
+def main(argv=None):
+    from chat_service import OLLAMA_MODEL, SYSTEM_PROMPT
+
+    parser = argparse.ArgumentParser(description="Warm up the chat model and report cold vs warm latency.")
+    parser.add_argument("--model", default=OLLAMA_MODEL)
+    parser.add_argument("--host", default=OLLAMA_HOST)
+    parser.add_argument("--unload", action="store_true", help="unload the model first to measure a real cold start")
+    args = parser.parse_args(argv)
+
+    warmer = ModelWarmer(args.model, SYSTEM_PROMPT, args.host)
+    try:
+        if args.unload:
+            unload(args.model, args.host)
+        warmer.warm_up()
+    except (OllamaError, requests.exceptions.RequestException) as e:
+        print(f"Warm-up failed: {e}")
+        return 1
+    cold, warm = warmer.stats["cold_seconds"], warmer.stats["warm_seconds"]
+    print(f"{args.model}: cold {cold:.2f}s, warm {warm:.2f}s ({cold / warm:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,12 @@
+import os
+import sys
+
 import streamlit as st
 
+# Shared intent matcher lives in ../backend
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from intents import top_intent
+
 # ================== PAGE CONFIG (ONLY ONCE) ==================
 st.set_page_config(
     page_title="BankBot",
@@ -83,27 +90,27 @@ def dashboard_page():
     )
 
     if user_input:
-        q = user_input.lower().strip()
         st.session_state.chat.append(("user", user_input))
+        intent = top_intent(user_input)
 
         # ---------- GREETINGS ----------
-        if q in ["hi", "hello", "hey", "good morning", "good evening"]:
+        if intent == "greeting":
             reply = (
                 "👋 Hello! I’m your professional banking assistant.\n\n"
                 "You can ask about **balance, transactions, loans, or ATM info**."
             )
 
         # ---------- BANKING QUESTIONS ----------
-        elif any(word in q for word in ["balance", "account"]):
+        elif intent == "balance":
             reply = "💰 Your current balance is ₹50,000"
 
-        elif any(word in q for word in ["transaction", "debit", "credit"]):
+        elif intent in ("transactions", "spending"):
             reply = "📑 Recent transaction: ₹2,500 debited"
 
-        elif "loan" in q:
+        elif intent == "loan":
             reply = "🏦 Active loan: ₹1,50,000 at 11% annual interest"
 
-        elif "atm" in q:
+        elif intent == "atm":
             reply = "📍 Nearest ATM: Main Road, Bangalore"
 
         # ---------- NON-BANKING ----------
@@ -1,5 +1,29 @@
+import os
+import sys
+import uuid
+
 import streamlit as st
 
+# Backend modules live in ../backend
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from faq import get_faq_index
+from ingestion import IngestionError, get_ingestion_service
+from ollama_client import OllamaError
+from llm_scheduler import LLMBusy, scheduled_client
+from retrieval import get_retrieval_index
+from warmup import start_warmup
+import requests
+
+OLLAMA_MODEL = "llama3"
+RETRIEVAL_TOP_K = 3
+# Constant, so the model server can reuse the prefilled prefix (warmup.py
+# prefills it at startup); the retrieved context goes in the user turn
+SYSTEM_PROMPT = (
+    "You are BankBot, a banking FAQ assistant. Each question comes with context "
+    "passages; answer using them. If the question is not about banking, say you "
+    "can only help with banking."
+)
+
 # Page config
 st.set_page_config(
     page_title="BankBot – FAQ Assistant",
@@ -7,16 +31,68 @@ st.set_page_config(
     layout="wide"
 )
 
+# Model load and system-prompt prefill happen once per process, before the first question
+start_warmup(OLLAMA_MODEL, SYSTEM_PROMPT)
+
+# Uploads handed to the ingestion worker in this session: file id -> job id
+if "ingest_jobs" not in st.session_state:
+    st.session_state.ingest_jobs = {}
+# No sign-in here: each browser session gets its own place in the model queue
+if "queue_user" not in st.session_state:
+    st.session_state.queue_user = uuid.uuid4().hex
+
+
+@st.fragment(run_every=1.0)
+def ingestion_progress():
+    # Re-renders only this block every second while documents are indexed
+    service = get_ingestion_service()
+    for job_id in st.session_state.ingest_jobs.values():
+        job = service.jobs.get(job_id)
+        if job is None:
+            continue
+        if job.status == "failed":
+            st.error(f"{job.filename}: {job.message}")
+        elif job.status == "done":
+            st.success(job.message)
+        else:
+            st.progress(job.progress, text=f"{job.filename}: {job.status}, {job.chunks} passages indexed")
+
+
+def stream_answer(question):
+    # Retrieved policy passages (including uploaded documents) + Ollama stream
+    context = get_retrieval_index().context_for(question, RETRIEVAL_TOP_K)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
+    ]
+    try:
+        yield from scheduled_client(st.session_state.queue_user).chat_stream(OLLAMA_MODEL, messages)
+    except LLMBusy as e:
+        yield str(e)
+    except (requests.exceptions.RequestException, OllamaError) as e:
+        yield f"Sorry, the AI service is unavailable. Error: {e}"
+
+
 # ---------- SIDEBAR ----------
 with st.sidebar:
     st.title("🏦 BankBot")
 
     st.subheader("📁 Upload File")
-    st.file_uploader(
+    uploaded_file = st.file_uploader(
         "Upload a file",
         type=["pdf", "txt", "jpg", "png", "jpeg"],
         accept_multiple_files=False
     )
+    # Streamlit reruns the script on every interaction; submit each upload once
+    if uploaded_file is not None:
+        upload_key = getattr(uploaded_file, "file_id", uploaded_file.name)
+        if upload_key not in st.session_state.ingest_jobs:
+            try:
+                job = get_ingestion_service().submit(uploaded_file, uploaded_file.name)
+                st.session_state.ingest_jobs[upload_key] = job.id
+            except IngestionError as e:
+                st.error(str(e))
+    ingestion_progress()
 
     st.button("➕ New Chat")
 
@@ -67,10 +143,14 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
 
-    # Placeholder bot response
+    # FAQ answers are instant; everything else is streamed from Ollama
     with st.chat_message("assistant"):
-        st.write("Generating answer from Ollama...")
+        reply = get_faq_index().answer(user_input)
+        if reply is None:
+            reply = st.write_stream(stream_answer(user_input))
+        else:
+            st.write(reply)
 
     st.session_state.messages.append(
-        {"role": "assistant", "content": "Generating answer from Ollama..."}
+        {"role": "assistant", "content": reply}
     )